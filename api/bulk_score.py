@@ -0,0 +1,105 @@
+"""
+Offline bulk scoring of questionnaire answers.
+
+Reads one JSON answer object per line and writes one JSON result per line in
+the same order, scoring in batches across a process pool that shares the
+compiled knowledge base (see ``api.core.sharded_scoring``). Only one batch is
+held in memory at a time.
+
+Usage:
+    python -m api.bulk_score answers.jsonl results.jsonl --workers 8 --limit 10
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from api.core.config import Config
+from api.core.kb_index import build_condition_index
+from api.core.kb_loader import read_knowledge_base
+from api.core.keywords import KeywordMappings
+from api.core.sharded_scoring import ShardedScorer
+
+
+def read_answers(path):
+    """Yields the answer objects of a JSONL file, skipping blank lines."""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def bulk_score(
+    input_path,
+    output_path,
+    workers=None,
+    shards=None,
+    batch_size=1000,
+    limit=None,
+    min_score=None,
+):
+    """
+    Scores every answer object in ``input_path`` into ``output_path``.
+
+    Each output line is ``{"suggestions": [{"condition", "score",
+    "category"}, ...]}`` like the /suggest_conditions response.
+
+    Returns:
+        int: Number of patients scored.
+    """
+    config = Config.from_env()
+    keyword_map = KeywordMappings(config.BONUS_SPECIFIC_KEYWORD)
+    conditions = read_knowledge_base()
+    condition_index = build_condition_index(conditions)
+
+    count = 0
+    with ShardedScorer(config, keyword_map, conditions, workers, shards) as scorer, open(
+        output_path, "w", encoding="utf-8"
+    ) as out:
+        for results in scorer.score_stream(
+            read_answers(input_path), batch_size, limit, min_score
+        ):
+            suggestions = [
+                {
+                    "condition": name,
+                    "score": round(score, 1),
+                    "category": condition_index[name]["category"],
+                }
+                for name, score in results
+            ]
+            out.write(json.dumps({"suggestions": suggestions}) + "\n")
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="JSONL file of questionnaire answers")
+    parser.add_argument("output", help="JSONL file to write the rankings to")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--shards", type=int, default=None, help="condition shards")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--min-score", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    count = bulk_score(
+        args.input,
+        args.output,
+        args.workers,
+        args.shards,
+        args.batch_size,
+        args.limit,
+        args.min_score,
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"Scored {count} patients in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f}/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Offline calibration of the scoring weights.
+
+Reads labeled cases (one ``{"answers": {...}, "diagnosis": "<condition
+name>"}`` object per line), precomputes their scoring features once and
+searches the ``WEIGHT_*`` / ``BONUS_*`` values for the best top-1 or top-5
+diagnosis accuracy (see ``api.core.calibration``).
+
+Usage:
+    python -m api.calibrate cases.jsonl --search random --samples 5000
+    python -m api.calibrate cases.jsonl --search grid --grid WEIGHT_SYMPTOM=0.5,1,2
+    python -m api.calibrate cases.jsonl --search coordinate
+"""
+
+import argparse
+import sys
+import time
+
+from api.core.calibration import (
+    CalibrationSet,
+    coordinate_search,
+    grid_search,
+    random_search,
+    read_labeled_cases,
+)
+from api.core.kb_loader import read_knowledge_base
+
+
+def parse_grid(specs):
+    """Parses ``FIELD=v1,v2,...`` arguments into a grid dict."""
+    grid = {}
+    for spec in specs:
+        field, sep, values = spec.partition("=")
+        if not sep or not values:
+            raise ValueError(f"Expected FIELD=v1,v2,... but got {spec!r}")
+        grid[field.strip()] = [float(value) for value in values.split(",")]
+    return grid
+
+
+def calibrate(
+    cases_path,
+    search="random",
+    samples=1000,
+    grid=None,
+    seed=None,
+    objective="top1",
+    max_rounds=10,
+):
+    """
+    Runs one calibration search over the cases in ``cases_path``.
+
+    Returns:
+        tuple: ``(calibration set, results)``, results best first.
+    """
+    conditions = read_knowledge_base()
+    calibration_set = CalibrationSet(read_labeled_cases(cases_path), conditions)
+    if search == "grid":
+        results = grid_search(calibration_set, grid or {}, objective=objective)
+    elif search == "random":
+        results = random_search(calibration_set, samples, seed=seed, objective=objective)
+    elif search == "coordinate":
+        results = coordinate_search(
+            calibration_set, objective=objective, max_rounds=max_rounds
+        )[::-1]
+    else:
+        raise ValueError(f"Unknown search: {search!r}")
+    return calibration_set, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("cases", help="JSONL file of labeled cases")
+    parser.add_argument("--search", choices=("grid", "random", "coordinate"), default="random")
+    parser.add_argument("--samples", type=int, default=1000, help="random search samples")
+    parser.add_argument(
+        "--grid", action="append", default=[], metavar="FIELD=v1,v2,...",
+        help="grid search values for one field (repeatable)",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--objective", choices=("top1", "top5"), default="top1")
+    parser.add_argument("--rounds", type=int, default=10, help="coordinate search rounds")
+    parser.add_argument("--top", type=int, default=5, help="results to print")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    calibration_set, results = calibrate(
+        args.cases,
+        args.search,
+        args.samples,
+        parse_grid(args.grid),
+        args.seed,
+        args.objective,
+        args.rounds,
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"{len(calibration_set)} cases ({calibration_set.unknown_labels} with unknown "
+        f"diagnoses skipped), {len(results)} weightings in {elapsed:.1f}s",
+        file=sys.stderr,
+    )
+    for result in results[: args.top]:
+        weights = " ".join(f"{name}={value:g}" for name, value in result.weights.items())
+        print(f"top1={result.top1:.3f} top5={result.top5:.3f} {weights}")
+
+
+if __name__ == "__main__":
+    main()
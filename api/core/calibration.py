@@ -0,0 +1,365 @@
+"""
+Offline calibration of the scoring weights against labeled cases.
+
+Every score is linear in the ``Config`` weights: a condition's score is the
+sum over categories of ``WEIGHT_<category> x matched keywords``, plus
+``BONUS_HISTORY_NAME_MATCH`` if the history bonus applies, plus the specific
+keyword bonuses it earns, each a fixed amount plus a multiple of
+``BONUS_SPECIFIC_KEYWORD``. ``CalibrationSet`` computes those per-condition
+features for every labeled case once; scoring the cases under many weight
+vectors is then a single matrix product per chunk, so thousands of candidate
+weightings are compared in seconds instead of re-running ``calculate_scores``.
+
+Rankings follow ``calculate_scores`` exactly, including name-keyed results
+for duplicated condition names and ties kept in knowledge base order.
+"""
+
+import dataclasses
+import itertools
+import json
+
+import numpy as np
+
+from .config import Config
+from .keywords import KeywordMappings
+from .scoring_service import SCORING_CATEGORIES, option_selected
+from .vectorized_scoring import VectorizedScoringEngine, csr_matmat
+
+# Config fields tuned by calibration, in feature column order.
+CALIBRATION_FIELDS = tuple(weight_attr for _, weight_attr, _ in SCORING_CATEGORIES) + (
+    "BONUS_HISTORY_NAME_MATCH",
+    "BONUS_SPECIFIC_KEYWORD",
+)
+
+# Upper bound on floats held by one chunk of (cases x conditions x weightings) scores.
+CHUNK_ELEMENTS = 1 << 22
+
+
+@dataclasses.dataclass(frozen=True)
+class CalibrationResult:
+    """Accuracy of one weighting over a calibration set."""
+
+    weights: dict
+    top1: float
+    top5: float
+
+    def config(self, base=None):
+        """Returns ``base`` (default: ``Config()``) with these weights applied."""
+        return dataclasses.replace(base or Config(), **self.weights)
+
+
+def read_labeled_cases(path):
+    """
+    Yields ``(answers, diagnosis)`` pairs from a JSONL case file.
+
+    Each line is ``{"answers": {...}, "diagnosis": "<condition name>"}``;
+    blank lines are skipped.
+    """
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                case = json.loads(line)
+                yield case["answers"], case["diagnosis"]
+
+
+class CalibrationSet:
+    """
+    Precomputed scoring features of labeled cases.
+
+    Args:
+        cases: Iterable of ``(patient answers, confirmed diagnosis name)``.
+        conditions: Parsed conditions.
+        keyword_map (KeywordMappings): Keyword mappings; their bonus values
+            are recomputed for each ``BONUS_SPECIFIC_KEYWORD``.
+        config (Config): Non-weight settings such as ``KEYWORD_MATCHING``
+            (default: ``Config()``); its weights are ignored.
+
+    ``features[case, row]`` holds one value per ``CALIBRATION_FIELDS`` entry
+    followed by the row's fixed specific keyword bonus, which every weighting
+    adds as is.
+
+    Cases whose diagnosis is not a condition name in ``conditions`` cannot be
+    ranked; they are dropped and counted in ``unknown_labels``.
+    """
+
+    def __init__(self, cases, conditions, keyword_map=None, config=None):
+        keyword_map = keyword_map or KeywordMappings(Config().BONUS_SPECIFIC_KEYWORD)
+        self.conditions = conditions
+        self.engine = VectorizedScoringEngine(config or Config(), keyword_map)
+        self.engine.build_index(conditions)
+        compiled = self.engine.compiled_kb(conditions)
+        # Specific keyword bonuses are linear in the base bonus: split each
+        # into its fixed part and its multiple of the base.
+        fixed = type(keyword_map)(0.0).specific_keyword_bonus_map
+        unit = type(keyword_map)(1.0).specific_keyword_bonus_map
+        self._bonus_parts = np.array(
+            [
+                [unit[kw][2] - fixed[kw][2], fixed[kw][2]]
+                for kw, _, _, _ in compiled.bonus_entries
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+
+        slots = {}
+        for row, condition in enumerate(conditions):
+            slots.setdefault(condition["name"], compiled.name_ids[row])
+        self.num_names = compiled.num_names
+        self.name_ids = compiled.name_ids
+        counts = np.bincount(compiled.name_ids, minlength=compiled.num_names)
+        self._unique_rows = np.flatnonzero(counts[compiled.name_ids] == 1)
+        # Rows of each duplicated name, in knowledge base order.
+        self._duplicate_groups = [
+            np.flatnonzero(compiled.name_ids == slot) for slot in np.flatnonzero(counts > 1)
+        ]
+
+        features = []
+        labels = []
+        self.unknown_labels = 0
+        for answers, diagnosis in cases:
+            slot = slots.get(diagnosis)
+            if slot is None:
+                self.unknown_labels += 1
+                continue
+            features.append(self._case_features(compiled, answers))
+            labels.append(slot)
+        # Feature values are small counts and bonus amounts, exact in float32.
+        self.features = (
+            np.stack(features).astype(np.float32)
+            if features
+            else np.zeros((0, len(conditions), len(CALIBRATION_FIELDS) + 1), dtype=np.float32)
+        )
+        self.labels = np.array(labels, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _case_features(self, compiled, patient_input):
+        """Returns the ``(num_conditions, len(CALIBRATION_FIELDS) + 1)`` features of one case."""
+        keyword_map = self.engine.keyword_map
+        num_categories = len(SCORING_CATEGORIES)
+        selected = np.zeros((len(compiled.column_weights), num_categories))
+        for pos, (field, _, _) in enumerate(SCORING_CATEGORIES):
+            kw_ids = keyword_map.resolve_field_array(field, patient_input.get(field))
+            selected[compiled.column_lookup[pos, kw_ids], pos] = 1.0
+
+        bonus_selected = np.array(
+            [
+                option_selected(patient_input.get(input_cat_key), req_input_opt)
+                for _, input_cat_key, req_input_opt, _ in compiled.bonus_entries
+            ],
+            dtype=bool,
+        )
+        bonus_parts = self._bonus_parts * bonus_selected[:, None]
+
+        features = np.zeros((compiled.num_conditions, len(CALIBRATION_FIELDS) + 1))
+        features[:, :num_categories] = csr_matmat(compiled.indptr, compiled.indices, selected)
+        history_rows = self.engine.history_rows(patient_input, self.conditions)
+        if history_rows:
+            features[list(history_rows), num_categories] = 1.0
+        features[:, num_categories + 1 :] = csr_matmat(
+            compiled.bonus_indptr, compiled.bonus_indices, bonus_parts
+        )
+        return features
+
+    def _name_scores(self, scores):
+        """
+        Reduces per-row scores to per-name scores and tie-break positions.
+
+        Args:
+            scores: ``(cases, conditions, weightings)`` array.
+
+        Returns:
+            tuple: ``(name scores, positions)`` of shape ``(cases, names,
+            weightings)``: the last positive row's score and the first
+            positive row, as ``calculate_scores`` keys results by name.
+        """
+        num_cases, num_rows, num_weightings = scores.shape
+        name_scores = np.zeros((num_cases, self.num_names, num_weightings))
+        positions = np.full(name_scores.shape, num_rows, dtype=np.int64)
+        unique = self._unique_rows
+        name_scores[:, self.name_ids[unique]] = scores[:, unique]
+        positions[:, self.name_ids[unique]] = unique[:, None]
+        for rows in self._duplicate_groups:
+            slot = self.name_ids[rows[0]]
+            score = np.zeros((num_cases, num_weightings))
+            first = np.full((num_cases, num_weightings), num_rows, dtype=np.int64)
+            for row in rows:
+                positive = scores[:, row] > 0
+                score = np.where(positive, scores[:, row], score)
+                first = np.where(positive & (first == num_rows), row, first)
+            name_scores[:, slot] = score
+            positions[:, slot] = first
+        return name_scores, positions
+
+    def ranks(self, weight_matrix):
+        """
+        Ranks every case's diagnosis under each weighting.
+
+        Args:
+            weight_matrix: ``(weightings, len(CALIBRATION_FIELDS))`` array.
+
+        Returns:
+            np.ndarray: int64 ``(cases, weightings)`` 1-based rank of the
+            diagnosis in the ``calculate_scores`` result, 0 when the diagnosis
+            scores nothing and is not ranked at all.
+        """
+        weight_matrix = np.atleast_2d(np.asarray(weight_matrix, dtype=np.float64))
+        # The fixed bonus column has weight 1 in every weighting.
+        weight_matrix = np.hstack([weight_matrix, np.ones((len(weight_matrix), 1))])
+        num_cases, num_rows, _ = self.features.shape
+        ranks = np.zeros((num_cases, len(weight_matrix)), dtype=np.int64)
+        chunk = max(1, CHUNK_ELEMENTS // max(1, num_rows * len(weight_matrix)))
+        for start in range(0, num_cases, chunk):
+            features = self.features[start : start + chunk].astype(np.float64)
+            labels = self.labels[start : start + chunk]
+            name_scores, positions = self._name_scores(features @ weight_matrix.T)
+            cases = np.arange(len(labels))
+            target = name_scores[cases, labels][:, None, :]
+            target_position = positions[cases, labels][:, None, :]
+            ahead = (name_scores > 0) & (
+                (name_scores > target)
+                | ((name_scores == target) & (positions < target_position))
+            )
+            ranked = target[:, 0, :] > 0
+            ranks[start : start + chunk] = np.where(ranked, 1 + ahead.sum(axis=1), 0)
+        return ranks
+
+    def evaluate(self, weight_matrix):
+        """
+        Scores weightings by diagnosis accuracy.
+
+        Returns:
+            tuple: ``(top1, top5)`` float arrays, one entry per weighting.
+        """
+        ranks = self.ranks(weight_matrix)
+        if not len(ranks):
+            return np.zeros(ranks.shape[1]), np.zeros(ranks.shape[1])
+        hit = ranks > 0
+        return (
+            (hit & (ranks <= 1)).mean(axis=0),
+            (hit & (ranks <= 5)).mean(axis=0),
+        )
+
+
+def config_weights(config):
+    """Returns ``config``'s calibrated fields as a weight vector."""
+    return np.array([getattr(config, name) for name in CALIBRATION_FIELDS], dtype=np.float64)
+
+
+def _results(calibration_set, weight_matrix, objective, chunk=1024):
+    top1 = []
+    top5 = []
+    for start in range(0, len(weight_matrix), chunk):
+        chunk_top1, chunk_top5 = calibration_set.evaluate(weight_matrix[start : start + chunk])
+        top1.append(chunk_top1)
+        top5.append(chunk_top5)
+    top1 = np.concatenate(top1) if top1 else np.zeros(0)
+    top5 = np.concatenate(top5) if top5 else np.zeros(0)
+    results = [
+        CalibrationResult(
+            dict(zip(CALIBRATION_FIELDS, weights.tolist())), float(t1), float(t5)
+        )
+        for weights, t1, t5 in zip(weight_matrix, top1, top5)
+    ]
+    return sorted(results, key=_objective_key(objective), reverse=True)
+
+
+def _objective_key(objective):
+    if objective == "top1":
+        return lambda result: (result.top1, result.top5)
+    if objective == "top5":
+        return lambda result: (result.top5, result.top1)
+    raise ValueError(f"Unknown calibration objective: {objective!r}")
+
+
+def grid_search(calibration_set, grid, base=None, objective="top1"):
+    """
+    Evaluates every combination of the candidate values in ``grid``.
+
+    Args:
+        calibration_set (CalibrationSet): Labeled cases.
+        grid: dict of calibrated field -> candidate values; fields not in
+            the grid keep their ``base`` value.
+        base (Config): Starting weights (default: ``Config()``).
+        objective: "top1" or "top5".
+
+    Returns:
+        list: ``CalibrationResult`` per combination, best first.
+    """
+    _check_fields(grid)
+    start = config_weights(base or Config())
+    fields = list(grid)
+    combos = list(itertools.product(*(grid[field] for field in fields)))
+    weight_matrix = np.tile(start, (len(combos), 1))
+    for col, field in enumerate(fields):
+        weight_matrix[:, CALIBRATION_FIELDS.index(field)] = [combo[col] for combo in combos]
+    return _results(calibration_set, weight_matrix, objective)
+
+
+def random_search(calibration_set, samples, bounds=None, seed=None, base=None, objective="top1"):
+    """
+    Evaluates ``samples`` weightings drawn uniformly within ``bounds``.
+
+    Args:
+        bounds: dict of calibrated field -> ``(low, high)``; unlisted fields
+            range over ``[0, 2 x base value]``.
+
+    Returns:
+        list: ``CalibrationResult`` per sample (plus ``base``), best first.
+    """
+    bounds = bounds or {}
+    _check_fields(bounds)
+    start = config_weights(base or Config())
+    low = np.array([bounds.get(f, (0.0, 2 * v))[0] for f, v in zip(CALIBRATION_FIELDS, start)])
+    high = np.array([bounds.get(f, (0.0, 2 * v))[1] for f, v in zip(CALIBRATION_FIELDS, start)])
+    rng = np.random.default_rng(seed)
+    weight_matrix = np.vstack([start, rng.uniform(low, high, (samples, len(start)))])
+    return _results(calibration_set, weight_matrix, objective)
+
+
+def coordinate_search(
+    calibration_set, candidates=None, base=None, objective="top1", max_rounds=10
+):
+    """
+    Improves one field at a time until no single-field change helps.
+
+    Each round tries every candidate value of every field (all values of a
+    field in one evaluation) and keeps the best change.
+
+    Args:
+        candidates: dict of calibrated field -> candidate values; defaults to
+            ``0, 0.5, ..., 5`` for every field.
+
+    Returns:
+        list: ``CalibrationResult`` after each round, starting with ``base``;
+        the last entry is the best weighting found.
+    """
+    candidates = candidates or {
+        field: np.arange(0.0, 5.25, 0.5) for field in CALIBRATION_FIELDS
+    }
+    _check_fields(candidates)
+    key = _objective_key(objective)
+    current = _results(calibration_set, config_weights(base or Config())[None, :], objective)[0]
+    history = [current]
+    for _ in range(max_rounds):
+        improved = False
+        for field in candidates:
+            best = grid_search(
+                calibration_set,
+                {field: candidates[field]},
+                current.config(base),
+                objective,
+            )[0]
+            if key(best) > key(current):
+                current = best
+                improved = True
+        history.append(current)
+        if not improved:
+            break
+    return history
+
+
+def _check_fields(fields):
+    unknown = set(fields) - set(CALIBRATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Not a calibrated field: {', '.join(sorted(unknown))}")
@@ -1,3 +1,5 @@
+import dataclasses
+import os
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -17,6 +19,48 @@ class Config:
     BONUS_HISTORY_NAME_MATCH: float = 1.0
     BONUS_SPECIFIC_KEYWORD: float = 4.0
 
+    # Scoring backend: "index" (ScoringEngine) or "vectorized"
+    # (VectorizedScoringEngine). Can be overridden with the SCORING_BACKEND env
+    # var (see Config.from_env).
+    SCORING_BACKEND: str = "index"
+    # With limit/min_score, the vectorized backend scores only the conditions
+    # that can still reach the top k (MaxScore pruning over keyword upper
+    # bounds) once the knowledge base has at least this many conditions.
+    TOP_K_PRUNING_MIN_CONDITIONS: int = 5000
+    # How keywords match red flags: "word" (whole words, exact) or "stemmed"
+    # (stemmed token sequences, so "itch" also matches "itching").
+    KEYWORD_MATCHING: str = "word"
+    # Maximum number of patients accepted by /suggest_conditions/batch
+    MAX_BATCH_SIZE: int = 1000
+
+    # Result cache in front of the scoring engine (size 0 disables it)
+    RESULT_CACHE_SIZE: int = 1024
+    RESULT_CACHE_TTL_SECONDS: float = 600.0
+
+    # Incremental scoring sessions (/sessions)
+    SESSION_STORE_SIZE: int = 10000
+    SESSION_TTL_SECONDS: float = 1800.0
+
+    # Scoring runs on a bounded thread pool off the event loop; requests
+    # beyond SCORING_WORKERS running + SCORING_QUEUE_LIMIT waiting get a 503
+    # with a Retry-After of SCORING_RETRY_AFTER_SECONDS.
+    SCORING_WORKERS: int = 4
+    SCORING_QUEUE_LIMIT: int = 64
+    SCORING_RETRY_AFTER_SECONDS: int = 1
+
+    # /diagnose multiplies each symptom score by 1 + FUSION_IMAGE_WEIGHT x the
+    # image model's probability for the condition's category.
+    FUSION_IMAGE_WEIGHT: float = 1.0
+
+    # knowledge_base.txt is polled this often and hot-reloaded when it
+    # changes (0 disables). Can be overridden with the KB_WATCH_INTERVAL_SECONDS
+    # env var (see Config.from_env).
+    KB_WATCH_INTERVAL_SECONDS: float = 2.0
+    # Worker processes for parsing the knowledge base when its snapshot is
+    # stale; 1 parses in process. Large texts only, see parallel_kb_loader.
+    # Can be overridden with the KB_PARSE_WORKERS env var (see Config.from_env).
+    KB_PARSE_WORKERS: int = 1
+
     MODEL_PATH: str = ""
     CLASS_NAMES_PATH: str = ""
 
@@ -24,5 +68,27 @@ class Config:
     def __post_init__(self):
         # Get the API directory path
         api_dir = Path(__file__).parent.parent
-        self.MODEL_PATH = str(api_dir / "ml_models" / "quantized_dynamic_range_model.tflite")
-        self.CLASS_NAMES_PATH = str(api_dir / "data" / "class_names.txt")
+        if not self.MODEL_PATH:
+            self.MODEL_PATH = str(api_dir / "ml_models" / "quantized_dynamic_range_model.tflite")
+        if not self.CLASS_NAMES_PATH:
+            self.CLASS_NAMES_PATH = str(api_dir / "data" / "class_names.txt")
+
+    @classmethod
+    def from_env(cls, environ=None, **values):
+        """
+        Returns a Config with the ENV_OVERRIDES fields read from the environment.
+
+        Explicit ``values`` take precedence over the environment. Only the
+        application and command line entry points read the environment; a
+        plain ``Config(...)`` (or ``dataclasses.replace``) never does.
+        """
+        environ = os.environ if environ is None else environ
+        for field in dataclasses.fields(cls):
+            if field.name in ENV_OVERRIDES and field.name in environ:
+                values.setdefault(field.name, field.type(environ[field.name]))
+        return cls(**values)
+
+
+# Config fields that Config.from_env reads from environment variables of the
+# same name.
+ENV_OVERRIDES = ("SCORING_BACKEND", "KB_WATCH_INTERVAL_SECONDS", "KB_PARSE_WORKERS")
@@ -0,0 +1,96 @@
+"""
+Fusion of image classifier predictions with symptom scores.
+
+The image model predicts one of the classes in ``class_names.txt``; those
+classes are the category headings of the knowledge base. ``CategoryFusion``
+maps every class to its knowledge base category once, resolves it to one
+class index per condition, and then boosts a patient's symptom score array
+by the predicted probability of each condition's category in a single
+vectorized step.
+"""
+
+import re
+
+import numpy as np
+
+
+def normalize_category(name):
+    """Lowercases a class or category name and collapses whitespace."""
+    return re.sub(r"\s+", " ", name).strip().lower()
+
+
+class CategoryFusion:
+    """
+    Image class <-> knowledge base category mapping with a fused ranking.
+
+    Args:
+        class_names: Image classifier class names, in model output order.
+        image_weight (float): Strength of the image boost (see ``fuse``).
+    """
+
+    def __init__(self, class_names, image_weight=1.0):
+        self.class_names = list(class_names)
+        self.image_weight = image_weight
+        self._class_by_category = {
+            normalize_category(name): idx for idx, name in enumerate(self.class_names)
+        }
+        self._row_classes = None
+
+    def row_classes(self, conditions):
+        """
+        Returns the image class index of every condition's category.
+
+        Conditions whose category has no image class map to -1. The array is
+        cached for the last condition list seen.
+        """
+        cached = self._row_classes
+        if cached is not None and cached[0] is conditions:
+            return cached[1]
+        classes = np.array(
+            [
+                self._class_by_category.get(normalize_category(c["category"]), -1)
+                for c in conditions
+            ],
+            dtype=np.int64,
+        )
+        self._row_classes = (conditions, classes)
+        return classes
+
+    def unmapped_categories(self, conditions):
+        """Returns the knowledge base categories without an image class."""
+        return sorted(
+            {
+                c["category"]
+                for c in conditions
+                if normalize_category(c["category"]) not in self._class_by_category
+            }
+        )
+
+    def fuse(self, symptom_scores, class_probabilities, conditions):
+        """
+        Boosts symptom scores by the image probability of each condition's category.
+
+        Each score is multiplied by ``1 + image_weight * p``, where ``p`` is
+        the predicted probability of the condition's category (0 when the
+        category has no image class). Only conditions with symptom evidence
+        can rank; the image reorders them.
+
+        Args:
+            symptom_scores: Per-condition scores (``ScoringEngine.score_vector``).
+            class_probabilities: Model output, one probability per class.
+            conditions: The parsed conditions the scores refer to.
+
+        Returns:
+            np.ndarray: The fused float64 score per condition.
+        """
+        row_classes = self.row_classes(conditions)
+        probabilities = np.asarray(class_probabilities, dtype=np.float64)
+        if len(probabilities) != len(self.class_names):
+            raise ValueError(
+                f"Expected {len(self.class_names)} class probabilities, "
+                f"got {len(probabilities)}."
+            )
+        # Index -1 picks the appended zero for unmapped categories.
+        row_probabilities = np.append(probabilities, 0.0)[row_classes]
+        scores = np.asarray(symptom_scores, dtype=np.float64)
+        return scores * (1.0 + self.image_weight * row_probabilities)
@@ -12,7 +12,9 @@ import tensorflow as tf
 import numpy as np
 from PIL import Image
 from typing import List, Dict, Any, Optional
+import io
 import logging
+import threading
 from pathlib import Path
 
 from .config import Config
@@ -56,6 +58,8 @@ class TFLiteInferenceService:
         self.class_names: List[str] = []
         self.input_details: Optional[List[Dict[str, Any]]] = None
         self.output_details: Optional[List[Dict[str, Any]]] = None
+        # A TFLite interpreter must not run two inferences at once.
+        self._lock = threading.Lock()
         
     def load_model_and_classes(self) -> bool:
         """
@@ -122,6 +126,27 @@ class TFLiteInferenceService:
             logger.error(f"Failed to load model or class names: {str(e)}")
             return False
     
+    @staticmethod
+    def load_image(data: bytes) -> Image.Image:
+        """
+        Decode raw image file bytes (JPEG, PNG, ...) into a PIL Image.
+        
+        Args:
+            data (bytes): Encoded image file contents
+            
+        Returns:
+            Image.Image: The decoded image
+            
+        Raises:
+            ValueError: If the bytes are not a readable image
+        """
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return image
+        except Exception as e:
+            raise ValueError(f"Invalid image data: {str(e)}")
+    
     def preprocess_image(self, image: Image.Image) -> np.ndarray:
         """
         Preprocess a PIL Image for TFLite model inference using Xception preprocessing.
@@ -165,24 +190,23 @@ class TFLiteInferenceService:
             logger.error(f"Image preprocessing failed: {str(e)}")
             raise ValueError(f"Failed to preprocess image: {str(e)}")
     
-    def predict(self, image: Image.Image, top_k: int = 3) -> List[Dict[str, Any]]:
+    def predict_probabilities(self, image: Image.Image) -> np.ndarray:
         """
-        Run inference on a preprocessed image and return top predictions.
+        Run inference on an image and return the full model output.
         
         Args:
             image (Image.Image): PIL Image for prediction
-            top_k (int): Number of top predictions to return (default: 3)
             
         Returns:
-            List[Dict[str, Any]]: List of top predictions with class names and confidence scores
+            np.ndarray: One confidence per class, in ``class_names`` order
         """
-        try:
-            if self.interpreter is None or self.input_details is None or self.output_details is None:
-                raise RuntimeError("Model not loaded. Call load_model_and_classes() first.")
-            
-            # Preprocess the image
-            processed_image = self.preprocess_image(image)
-            
+        if self.interpreter is None or self.input_details is None or self.output_details is None:
+            raise RuntimeError("Model not loaded. Call load_model_and_classes() first.")
+        
+        # Preprocess the image
+        processed_image = self.preprocess_image(image)
+        
+        with self._lock:
             # Set the input tensor
             self.interpreter.set_tensor(self.input_details[0]['index'], processed_image)
             
@@ -191,22 +215,47 @@ class TFLiteInferenceService:
             
             # Get the output
             output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
-            predictions = output_data[0]  # Remove batch dimension
+        return output_data[0].copy()  # Remove batch dimension
+    
+    def top_predictions(self, predictions: np.ndarray, top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Format the ``top_k`` most confident classes of a model output.
+        
+        Args:
+            predictions (np.ndarray): Output of ``predict_probabilities``
+            top_k (int): Number of top predictions to return (default: 3)
             
-            # Get top-k predictions
-            top_indices = np.argsort(predictions)[-top_k:][::-1]
+        Returns:
+            List[Dict[str, Any]]: List of top predictions with class names and confidence scores
+        """
+        top_indices = np.argsort(predictions)[-top_k:][::-1]
+        
+        results = []
+        for i, idx in enumerate(top_indices):
+            confidence = float(predictions[idx])
+            class_name = self.class_names[idx] if idx < len(self.class_names) else f"Class_{idx}"
             
-            results = []
-            for i, idx in enumerate(top_indices):
-                confidence = float(predictions[idx])
-                class_name = self.class_names[idx] if idx < len(self.class_names) else f"Class_{idx}"
-                
-                results.append({
-                    "rank": i + 1,
-                    "class_name": class_name,
-                    "confidence": confidence,
-                    "confidence_percentage": round(confidence * 100, 2)
-                })
+            results.append({
+                "rank": i + 1,
+                "class_name": class_name,
+                "confidence": confidence,
+                "confidence_percentage": round(confidence * 100, 2)
+            })
+        return results
+    
+    def predict(self, image: Image.Image, top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Run inference on a preprocessed image and return top predictions.
+        
+        Args:
+            image (Image.Image): PIL Image for prediction
+            top_k (int): Number of top predictions to return (default: 3)
+            
+        Returns:
+            List[Dict[str, Any]]: List of top predictions with class names and confidence scores
+        """
+        try:
+            results = self.top_predictions(self.predict_probabilities(image), top_k)
             
             logger.info(f"Prediction completed. Top prediction: {results[0]['class_name']} ({results[0]['confidence_percentage']:.2f}%)")
             
@@ -0,0 +1,285 @@
+"""
+Precomputed lookup structures over the parsed knowledge base.
+
+The scoring engine matches questionnaire keywords against each condition's
+``red_flags_text``, either as whole words (``"word"``, a regex per keyword) or
+as stemmed token sequences (``"stemmed"``, see ``TokenIndex``). Whether a
+keyword matches a condition only depends on the knowledge base and the
+keyword mappings, so the matches are computed once when the knowledge base is
+loaded instead of on every request.
+"""
+
+import collections
+import functools
+import hashlib
+import re
+
+
+def keyword_pattern(keyword):
+    """Returns the whole-word, case-insensitive pattern used to match a keyword."""
+    return re.compile(r"\b" + re.escape(keyword) + r"\b", re.IGNORECASE)
+
+
+# Keyword matching modes accepted by build_keyword_index (Config.KEYWORD_MATCHING).
+KEYWORD_MATCHING_MODES = ("word", "stemmed")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Suffixes removed by ``stem``, longest first.
+STEM_SUFFIXES = ("ing", "ed", "es", "s", "y")
+
+# Singular nouns ending in "es" that ``stem`` leaves whole.
+UNINFLECTED_WORDS = frozenset({"herpes", "rabies", "scabies"})
+
+# Red flags are separated by "|" (and often ","); n-grams never span them.
+FLAG_SEPARATOR_PATTERN = re.compile(r"[|,]")
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token):
+    """
+    Light suffix-stripping stemmer for red-flag vocabulary.
+
+    Strips one inflectional suffix and a trailing "e", so "itch", "itchy" and
+    "itching" share a stem, as do "scale", "scaly", "scales" and "scaling".
+    "ed" is kept after "e" ("bleed") and "es" only stripped after a sibilant
+    ("rashes"; "hives" loses just the "s"). Stems keep at least three letters.
+    """
+    if token in UNINFLECTED_WORDS:
+        return token
+    for suffix in STEM_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == "s" and token.endswith(("ss", "us", "is")):
+                continue
+            if suffix == "ed" and token.endswith("eed"):
+                continue
+            if suffix == "es" and not token.endswith(("ses", "xes", "zes", "ches", "shes")):
+                continue
+            token = token[: -len(suffix)]
+            # "scabbing" -> "scab"
+            if suffix in ("ing", "ed") and token[-1] == token[-2] and token[-1] not in "lsz":
+                token = token[:-1]
+            break
+    # "scale" -> "scal", but "hive" is not "hiv".
+    if token.endswith("e") and len(token) > 3 and token[-2] != "v":
+        token = token[:-1]
+    return token
+
+
+def stem_tokens(text):
+    """Returns the stems of the lowercased word tokens of ``text``."""
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class TokenIndex:
+    """
+    Stemmed token n-grams of every condition's red flags.
+
+    Each red flag of every condition (``red_flags_text`` split on "|" and
+    ",") is tokenized and stemmed once into interned stem ids; every n-gram of
+    up to ``max_ngram`` ids within a flag is then kept in a hash table mapping
+    it to the conditions containing it. A keyword of n words matches a
+    condition when its stem n-gram is present in one of its flags, so "itch"
+    also matches "itching", a multi-word keyword is a single lookup, and
+    "bright | red patches" does not match "bright red".
+
+    Args:
+        conditions: Parsed conditions.
+        max_ngram (int): Longest keyword, in tokens, that can be looked up.
+    """
+
+    def __init__(self, conditions, max_ngram=1):
+        self.max_ngram = max_ngram
+        self.stem_ids = {}
+        rows_by_ngram = collections.defaultdict(list)
+        for row, condition in enumerate(conditions):
+            grams = set()
+            for flag in FLAG_SEPARATOR_PATTERN.split(condition["red_flags_text"]):
+                ids = [
+                    self.stem_ids.setdefault(token, len(self.stem_ids))
+                    for token in stem_tokens(flag)
+                ]
+                grams.update(
+                    tuple(ids[i : i + n])
+                    for n in range(1, max_ngram + 1)
+                    for i in range(len(ids) - n + 1)
+                )
+            for gram in grams:
+                rows_by_ngram[gram].append(row)
+        self._rows_by_ngram = {gram: tuple(rows) for gram, rows in rows_by_ngram.items()}
+
+    def rows_for(self, keyword):
+        """Returns the rows (ascending) whose red flags contain ``keyword``'s stems."""
+        gram = tuple(self.stem_ids.get(token, -1) for token in stem_tokens(keyword))
+        if not gram or len(gram) > self.max_ngram:
+            return ()
+        return self._rows_by_ngram.get(gram, ())
+
+
+def build_keyword_index(conditions, keywords, matching="word"):
+    """
+    Builds an inverted index from keyword to matching conditions.
+
+    Args:
+        conditions: Parsed conditions as returned by ``parse_knowledge_base``.
+        keywords: Iterable of keywords to index (duplicates are ignored).
+        matching: "word" matches keywords as whole words of ``red_flags_text``;
+            "stemmed" matches their stemmed tokens (see ``TokenIndex``).
+
+    Returns:
+        dict: keyword -> tuple of indices into ``conditions`` whose
+        ``red_flags_text`` contains the keyword, in knowledge-base order.
+        Keywords without matches map to an empty tuple.
+    """
+    if matching == "stemmed":
+        keywords = list(dict.fromkeys(keywords))
+        max_ngram = max((len(stem_tokens(kw)) for kw in keywords), default=1)
+        token_index = TokenIndex(conditions, max(max_ngram, 1))
+        return {keyword: token_index.rows_for(keyword) for keyword in keywords}
+    if matching != "word":
+        raise ValueError(f"Unknown keyword matching mode: {matching!r}")
+
+    index = {}
+    for keyword in keywords:
+        if keyword in index:
+            continue
+        pattern = keyword_pattern(keyword)
+        needle = keyword.lower()
+        index[keyword] = tuple(
+            i
+            for i, condition in enumerate(conditions)
+            # red_flags_text is lowercased, so a plain substring test is a
+            # cheap necessary condition before running the regex.
+            if needle in condition["red_flags_text"]
+            and pattern.search(condition["red_flags_text"])
+        )
+    return index
+
+
+def build_bonus_table(conditions, specific_keyword_bonus_map, matching="word"):
+    """
+    Precomputes which conditions each specific keyword bonus can apply to.
+
+    Args:
+        conditions: Parsed conditions.
+        specific_keyword_bonus_map: ``KeywordMappings.specific_keyword_bonus_map``.
+        matching: Keyword matching mode, see ``build_keyword_index``.
+
+    Returns:
+        list: ``((specific keyword, input key, required option, bonus), rows)``
+        per bonus entry in map order, where ``rows`` are the indices of the
+        conditions whose red flags contain the specific keyword.
+    """
+    entries = [
+        (specific_kw, input_cat_key, req_input_opt, bonus_val)
+        for specific_kw, (
+            input_cat_key,
+            req_input_opt,
+            bonus_val,
+        ) in specific_keyword_bonus_map.items()
+    ]
+    index = build_keyword_index(conditions, [entry[0] for entry in entries], matching)
+    return [(entry, index[entry[0]]) for entry in entries]
+
+
+class ConditionNameIndex:
+    """
+    Resolves reported past diagnoses to the conditions earning the history bonus.
+
+    A condition earns the bonus when a reported diagnosis is a substring of its
+    lowercased name or its name is a substring of the diagnosis. Instead of
+    comparing a diagnosis against every name, candidates are found through a
+    trigram index over the distinct names and then verified. Results are
+    memoized per distinct diagnosis, since answers come from a fixed option
+    list.
+
+    Args:
+        conditions: Parsed conditions.
+        memo_size (int): Number of distinct diagnoses whose matches are kept.
+    """
+
+    NGRAM = 3
+
+    def __init__(self, conditions, memo_size=4096):
+        rows_by_name = collections.defaultdict(list)
+        for idx, condition in enumerate(conditions):
+            rows_by_name[condition["name"].lower()].append(idx)
+        self._rows_by_name = {name: tuple(rows) for name, rows in rows_by_name.items()}
+
+        n = self.NGRAM
+        # Trigram -> names containing it, for "diagnosis in name".
+        self._names_by_gram = collections.defaultdict(set)
+        # Leading trigram -> names, for "name in diagnosis".
+        self._names_by_prefix = collections.defaultdict(list)
+        # Names too short to have a trigram are always checked directly.
+        self._short_names = []
+        for name in self._rows_by_name:
+            if len(name) < n:
+                self._short_names.append(name)
+                continue
+            for i in range(len(name) - n + 1):
+                self._names_by_gram[name[i : i + n]].add(name)
+            self._names_by_prefix[name[:n]].append(name)
+
+        self.matches = functools.lru_cache(maxsize=memo_size)(self._matches)
+
+    def _matching_names(self, reported):
+        n = self.NGRAM
+        if len(reported) < n:
+            # Too short to index; rare enough to scan.
+            candidates = [name for name in self._rows_by_name if reported in name]
+        else:
+            grams = {reported[i : i + n] for i in range(len(reported) - n + 1)}
+            sets = sorted(
+                (self._names_by_gram.get(gram, set()) for gram in grams), key=len
+            )
+            candidates = [name for name in sets[0] if reported in name]
+
+        found = set(candidates)
+        found.update(name for name in self._short_names if name in reported)
+        for i in range(len(reported) - n + 1):
+            for name in self._names_by_prefix.get(reported[i : i + n], ()):
+                if reported.startswith(name, i):
+                    found.add(name)
+        return found
+
+    def _matches(self, reported):
+        """Returns the sorted condition rows matching a lowercased diagnosis."""
+        return tuple(
+            sorted(
+                idx
+                for name in self._matching_names(reported)
+                for idx in self._rows_by_name[name]
+            )
+        )
+
+    def rows_for(self, reported_names):
+        """Returns the set of condition rows matching any of ``reported_names``."""
+        rows = set()
+        for reported in reported_names:
+            rows.update(self.matches(reported))
+        return rows
+
+
+def build_condition_index(conditions):
+    """
+    Maps each condition name to its record for O(1) metadata lookups.
+
+    When a name appears more than once the first record wins, matching a
+    linear search over the list.
+    """
+    index = {}
+    for condition in conditions:
+        index.setdefault(condition["name"], condition)
+    return index
+
+
+def knowledge_base_fingerprint(conditions):
+    """Returns a short content hash of the fields that scoring depends on."""
+    digest = hashlib.sha1()
+    for condition in conditions:
+        digest.update(condition["name"].encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(condition["red_flags_text"].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
@@ -1,133 +1,180 @@
+import asyncio
+import bisect
+import hashlib
 import json
+import marshal
+import mmap
+import os
 import re
+import struct
+import sys
+import tempfile
 from pathlib import Path
 import aiofiles
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # go up from api/core/
 print(BASE_DIR)
 knowledge_base_file = BASE_DIR / "data" / "knowledge_base.txt"
+# Pre-parsed copy of knowledge_base_file, see read_snapshot / write_snapshot.
+knowledge_base_snapshot_file = BASE_DIR / "data" / "knowledge_base.snapshot"
 
+# Snapshot layout: magic, header (format version, parser version, Python
+# major/minor, marshal version), sha256 of the source text, sha256 of the
+# payload, then the marshalled condition list. Bump PARSER_VERSION whenever
+# parse_knowledge_base changes its output so existing snapshots go stale.
+SNAPSHOT_MAGIC = b"KBSNAP\0\0"
+SNAPSHOT_FORMAT_VERSION = 1
+PARSER_VERSION = 2
+_SNAPSHOT_HEADER = struct.Struct("<8sHHBBH32s32s")
 
-def parse_knowledge_base(text):
-    """Parses the raw text into a list of condition dictionaries."""
-    # (Code is identical to the previous version)
-    conditions = []
-    pattern = re.compile(
-        r"\[Condition:\s*(.*?)\]\n(.*?)(?=\n\s*\[Condition:|\Z)",
-        re.DOTALL | re.IGNORECASE,
+
+CONDITION_PATTERN = re.compile(
+    r"\[Condition:\s*(.*?)\]\n(.*?)(?=\n\s*\[Condition:|\Z)",
+    re.DOTALL | re.IGNORECASE,
+)
+CATEGORY_PATTERN = re.compile(r"^\s*(\d+)\.\s+(.*?)\s*$", re.MULTILINE)
+# Byte-string versions for scanning memory-mapped files (iter_knowledge_base).
+# Their \s, \d and case folding are ASCII-only.
+_CONDITION_BYTES_PATTERN = re.compile(
+    CONDITION_PATTERN.pattern.encode(), CONDITION_PATTERN.flags & ~re.UNICODE
+)
+_CATEGORY_BYTES_PATTERN = re.compile(
+    CATEGORY_PATTERN.pattern.encode(), CATEGORY_PATTERN.flags & ~re.UNICODE
+)
+_FLAG_SPLIT_PATTERN = re.compile(r"[,\n|]")  # Split by comma, newline, or pipe
+_FLAG_CLEANUP_PATTERN = re.compile(r"^[\[\(']*(.*?)[\]\)']*\s*$")
+
+
+def category_sections(text):
+    """
+    Scans the numbered category headings of ``text`` once.
+
+    Returns:
+        tuple: ``(positions, names)``, see ``merge_category_headings``.
+    """
+    return merge_category_headings(
+        (match.start(), match.group(1), match.group(2).strip())
+        for match in CATEGORY_PATTERN.finditer(text)
     )
-    category_pattern = re.compile(r"^\s*(\d+)\.\s+(.*?)\s*$", re.MULTILINE)
 
-    categories = {
-        match.group(1): match.group(2).strip()
-        for match in category_pattern.finditer(text)
-    }
-    category_positions = {
-        match.start(): match.group(1) for match in category_pattern.finditer(text)
-    }
-    sorted_cat_positions = sorted(category_positions.keys())
-
-    current_category_num = None
-
-    for match in pattern.finditer(text):
-        condition_name = match.group(1).strip()
-        details_text = match.group(2).strip()
-        condition_start_pos = match.start()
-
-        # Determine category based on position
-        determined_category = "Unknown"  # Default
-        for i, pos in enumerate(sorted_cat_positions):
-            next_pos_index = i + 1
-            next_pos = (
-                sorted_cat_positions[next_pos_index]
-                if next_pos_index < len(sorted_cat_positions)
-                else float("inf")
-            )
-            if pos <= condition_start_pos < next_pos:
-                determined_category_num = category_positions[pos]
-                determined_category = categories.get(determined_category_num, "Unknown")
-                break
-
-        red_flags = []
-        rule = ""
-        ddx = []
-        flags_raw_text = ""
-
-        lines = details_text.split("\n")
-        in_flags_section = False
-        flags_buffer = ""  # Buffer to collect flag text across lines
-
-        for line in lines:
-            stripped_line = line.strip()
-            line_lower = stripped_line.lower()
-
-            if line_lower.startswith("- red flags:"):
-                in_flags_section = True
-                # Start collecting flags, handle text after colon on the same line
+
+def merge_category_headings(headings):
+    """
+    Resolves ``(offset, number, name)`` headings, in text order, into sections.
+
+    Returns:
+        tuple: ``(positions, names)``, the sorted start offsets of the
+        headings and the category name of the section each one opens. When a
+        number is used for more than one heading, its last name wins.
+    """
+    headings = list(headings)
+    names_by_number = {number: name for _, number, name in headings}
+    return (
+        [pos for pos, _, _ in headings],
+        [names_by_number[number] for _, number, _ in headings],
+    )
+
+
+def category_at(positions, names, offset):
+    """Returns the category of the section containing ``offset`` (see ``category_sections``)."""
+    index = bisect.bisect_right(positions, offset) - 1
+    return names[index] if index >= 0 else "Unknown"
+
+
+def parse_condition(condition_id, name, category, details_text):
+    """Parses the text after one ``[Condition: ...]`` tag into a condition dictionary."""
+    red_flags = []
+    rule = ""
+    ddx = []
+    flags_raw_text = ""
+
+    lines = details_text.split("\n")
+    in_flags_section = False
+    flags_buffer = ""  # Buffer to collect flag text across lines
+
+    for line in lines:
+        stripped_line = line.strip()
+        line_lower = stripped_line.lower()
+
+        if line_lower.startswith("- red flags:"):
+            in_flags_section = True
+            # Start collecting flags, handle text after colon on the same line
+            try:
+                flags_buffer += line.split(":", 1)[1].strip() + " "
+            except IndexError:
+                pass  # No text after colon on this line
+            continue  # Move to the next line
+
+        # Check for end markers BEFORE processing potential flag lines
+        if line_lower.startswith("- rule:") or line_lower.startswith("- ddx:"):
+            in_flags_section = False  # Stop collecting flags
+            # Process rule or ddx AFTER flags section ends
+            if line_lower.startswith("- rule:"):
                 try:
-                    flags_buffer += line.split(":", 1)[1].strip() + " "
+                    rule = stripped_line.split(":", 1)[1].strip()
                 except IndexError:
-                    pass  # No text after colon on this line
-                continue  # Move to the next line
-
-            # Check for end markers BEFORE processing potential flag lines
-            if line_lower.startswith("- rule:") or line_lower.startswith("- ddx:"):
-                in_flags_section = False  # Stop collecting flags
-                # Process rule or ddx AFTER flags section ends
-                if line_lower.startswith("- rule:"):
-                    try:
-                        rule = stripped_line.split(":", 1)[1].strip()
-                    except IndexError:
-                        rule = ""  # Handle empty rule
-                elif line_lower.startswith("- ddx:"):
-                    try:
-                        ddx_str = stripped_line.split(":", 1)[1].strip()
-                        ddx = [d.strip() for d in ddx_str.split(",") if d.strip()]
-                    except IndexError:
-                        ddx_str = ""
-                        ddx = []
-                continue  # Move to next line after processing rule/ddx start
-
-            # If we are still in the flags section, append the line content
-            if in_flags_section and stripped_line:
-                # Append the content, remove leading hyphens if present
-                flag_content = (
-                    stripped_line[1:].strip()
-                    if stripped_line.startswith("-")
-                    else stripped_line
-                )
-                flags_buffer += flag_content + " "
-
-        # Assign the collected buffer to flags_raw_text after the loop
-        flags_raw_text = flags_buffer.strip()
-
-        # Process flags_raw_text into a list
-        potential_flags = re.split(
-            r"[,\n|]", flags_raw_text
-        )  # Split by comma, newline, or pipe
-        processed_flags = set()
-        for flag in potential_flags:
-            cleaned_flag = flag.strip()
-            # Basic cleanup of leading/trailing brackets/parentheses etc.
-            cleaned_flag = re.sub(
-                r"^[\[\(']*(.*?)[\]\)']*\s*$", r"\1", cleaned_flag
-            ).strip()
-            if cleaned_flag:
-                processed_flags.add(cleaned_flag)
-
-        conditions.append(
-            {
-                "name": condition_name,
-                "category": determined_category,  # Use determined category
-                "red_flags_list": list(processed_flags),
-                "red_flags_text": " | ".join(
-                    processed_flags
-                ).lower(),  # Join with pipes for text matching
-                "num_flags": len(processed_flags),
-                "rule": rule,
-                "ddx": ddx,
-            }
+                    rule = ""  # Handle empty rule
+            elif line_lower.startswith("- ddx:"):
+                try:
+                    ddx_str = stripped_line.split(":", 1)[1].strip()
+                    ddx = [d.strip() for d in ddx_str.split(",") if d.strip()]
+                except IndexError:
+                    ddx_str = ""
+                    ddx = []
+            continue  # Move to next line after processing rule/ddx start
+
+        # If we are still in the flags section, append the line content
+        if in_flags_section and stripped_line:
+            # Append the content, remove leading hyphens if present
+            flag_content = (
+                stripped_line[1:].strip()
+                if stripped_line.startswith("-")
+                else stripped_line
+            )
+            flags_buffer += flag_content + " "
+
+    # Assign the collected buffer to flags_raw_text after the loop
+    flags_raw_text = flags_buffer.strip()
+
+    # Process flags_raw_text into a list
+    potential_flags = _FLAG_SPLIT_PATTERN.split(flags_raw_text)
+    # Deduplicated in order of first appearance (a set's order would differ
+    # between processes with the string hash seed).
+    processed_flags = {}
+    for flag in potential_flags:
+        cleaned_flag = flag.strip()
+        # Basic cleanup of leading/trailing brackets/parentheses etc.
+        cleaned_flag = _FLAG_CLEANUP_PATTERN.sub(r"\1", cleaned_flag).strip()
+        if cleaned_flag:
+            processed_flags[cleaned_flag] = None
+
+    return {
+        "id": condition_id,  # position in the knowledge base
+        "name": name,
+        "category": category,
+        "red_flags_list": list(processed_flags),
+        "red_flags_text": " | ".join(
+            processed_flags
+        ).lower(),  # Join with pipes for text matching
+        "num_flags": len(processed_flags),
+        "rule": rule,
+        "ddx": ddx,
+    }
+
+
+def parse_knowledge_base(text):
+    """Parses the raw text into a list of condition dictionaries."""
+    positions, names = category_sections(text)
+    conditions = [
+        parse_condition(
+            condition_id,
+            match.group(1).strip(),
+            # Determine category based on position
+            category_at(positions, names, match.start()),
+            match.group(2).strip(),
         )
+        for condition_id, match in enumerate(CONDITION_PATTERN.finditer(text))
+    ]
 
     if not conditions:
         print("Warning: No conditions parsed. Check knowledge base format and content.")
@@ -135,19 +182,240 @@ def parse_knowledge_base(text):
     return conditions
 
 
-async def load_knowledge():
+def iter_knowledge_base(path=knowledge_base_file):
+    """
+    Yields the conditions of the knowledge base file at ``path`` one at a time.
+
+    Streaming ``parse_knowledge_base`` for very large generated knowledge
+    bases: the file is memory-mapped rather than read, and only the category
+    headings (one pass) and the current condition block are held in memory,
+    so peak memory does not grow with the file size unless the caller keeps
+    the records. Records are identical to ``parse_knowledge_base`` for files
+    whose condition tags and category headings use ASCII whitespace and
+    digits.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            print("Warning: No conditions parsed. Check knowledge base format and content.")
+            return
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    matches = match = None
+    try:
+        positions, names = merge_category_headings(
+            (match.start(), match.group(1), match.group(2).decode("utf-8").strip())
+            for match in _CATEGORY_BYTES_PATTERN.finditer(buffer)
+        )
+
+        condition_id = -1
+        matches = _CONDITION_BYTES_PATTERN.finditer(buffer)
+        for condition_id, match in enumerate(matches):
+            yield parse_condition(
+                condition_id,
+                match.group(1).decode("utf-8").strip(),
+                category_at(positions, names, match.start()),
+                match.group(2).decode("utf-8").strip(),
+            )
+        if condition_id < 0:
+            print("Warning: No conditions parsed. Check knowledge base format and content.")
+    finally:
+        # Scanners and matches pin the map; drop them before closing it.
+        matches = match = None
+        buffer.close()
+
+
+def _block_key(match, category):
+    """Identifies a condition block by its text hash and enclosing category."""
+    digest = hashlib.blake2b(match.group(0).encode("utf-8"), digest_size=16).digest()
+    return digest, category
+
+
+class IncrementalParser:
+    """
+    ``parse_knowledge_base`` that re-parses only changed condition blocks.
+
+    Parsed conditions are remembered by the hash of their ``[Condition: ...]``
+    block text and their category. A later ``parse`` reuses the records of
+    unchanged blocks (renumbering their ``id`` when blocks moved) and parses
+    only new or edited ones, giving the same result as a full parse.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        # Blocks parsed from scratch by the last parse call
+        self.reparsed = 0
+
+    def seed(self, text, conditions):
+        """
+        Remembers ``conditions`` as the parse of ``text`` without re-parsing it.
+
+        Ignored unless ``text`` has exactly as many condition blocks as
+        ``conditions`` (i.e. they are not the parse of ``text``).
+
+        Returns:
+            bool: Whether the conditions were remembered.
+        """
+        positions, names = category_sections(text)
+        keys = [
+            _block_key(match, category_at(positions, names, match.start()))
+            for match in CONDITION_PATTERN.finditer(text)
+        ]
+        if len(keys) != len(conditions):
+            return False
+        self._blocks = dict(zip(keys, conditions))
+        return True
+
+    def parse(self, text):
+        """Parses the raw text into a list of condition dictionaries."""
+        positions, names = category_sections(text)
+        blocks = {}
+        conditions = []
+        reparsed = 0
+        for condition_id, match in enumerate(CONDITION_PATTERN.finditer(text)):
+            category = category_at(positions, names, match.start())
+            key = _block_key(match, category)
+            condition = self._blocks.get(key)
+            if condition is None:
+                condition = parse_condition(
+                    condition_id, match.group(1).strip(), category, match.group(2).strip()
+                )
+                reparsed += 1
+            elif condition["id"] != condition_id:
+                condition = {**condition, "id": condition_id}
+            blocks[key] = condition
+            conditions.append(condition)
+        self._blocks = blocks
+        self.reparsed = reparsed
+
+        if not conditions:
+            print("Warning: No conditions parsed. Check knowledge base format and content.")
+
+        return conditions
+
+
+def _snapshot_header(source_digest, payload_digest):
+    return _SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_FORMAT_VERSION,
+        PARSER_VERSION,
+        sys.version_info[0],
+        sys.version_info[1],
+        marshal.version,
+        source_digest,
+        payload_digest,
+    )
+
+
+def write_snapshot(path, conditions, source):
+    """
+    Writes the parsed ``conditions`` of the ``source`` bytes to ``path``.
+
+    The file is written to a temporary name and renamed into place, so
+    concurrent readers see either the old or the new snapshot.
+    """
+    payload = marshal.dumps(conditions)
+    header = _snapshot_header(
+        hashlib.sha256(source).digest(), hashlib.sha256(payload).digest()
+    )
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header + payload)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def read_snapshot(path, source):
+    """
+    Returns the conditions stored in the snapshot at ``path``.
+
+    Returns None when the snapshot is missing, was written for other source
+    bytes, by another format, parser or Python version, or is corrupt.
+    """
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return None
+    header_size = _SNAPSHOT_HEADER.size
+    if len(data) < header_size:
+        return None
+    payload_digest = data[header_size - 32 : header_size]
+    expected = _snapshot_header(hashlib.sha256(source).digest(), payload_digest)
+    payload = memoryview(data)[header_size:]
+    if data[:header_size] != expected or hashlib.sha256(payload).digest() != payload_digest:
+        return None
+    try:
+        conditions = marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+    return conditions if isinstance(conditions, list) else None
+
+
+def load_conditions(source, snapshot_path=knowledge_base_snapshot_file, workers=1):
+    """
+    Returns the parsed conditions of the knowledge base ``source`` bytes.
+
+    Uses the snapshot at ``snapshot_path`` when it matches ``source``;
+    otherwise parses the text and rewrites the snapshot. A snapshot that
+    cannot be written (e.g. a read-only deployment) only costs the parse.
+    Pass ``snapshot_path=None`` to always parse. With ``workers`` > 1 large
+    texts are parsed across a process pool (see ``parallel_kb_loader``).
+    """
+    if snapshot_path is not None:
+        conditions = read_snapshot(snapshot_path, source)
+        if conditions is not None:
+            return conditions
+    text = source.decode("utf-8")
+    if workers > 1:
+        from .parallel_kb_loader import parse_knowledge_base_parallel
+
+        conditions = parse_knowledge_base_parallel(text, workers)
+    else:
+        conditions = parse_knowledge_base(text)
+    if snapshot_path is not None and conditions:
+        try:
+            write_snapshot(snapshot_path, conditions, source)
+        except OSError as e:
+            print(f"Warning: could not write knowledge base snapshot: {e}")
+    return conditions
+
+
+def read_knowledge_base(
+    path=knowledge_base_file, snapshot_path=knowledge_base_snapshot_file, workers=1
+):
+    """Synchronous ``load_knowledge`` for command line tools and worker processes."""
+    return load_conditions(Path(path).read_bytes(), snapshot_path, workers)
+
+
+async def load_knowledge_with_source(workers=1):
+    """
+    Loads the knowledge base file.
+
+    Returns:
+        tuple: ``(conditions, source bytes)``; the source is None when the
+        file does not exist.
+    """
     conditions_database = None
     print("Loading knowledge base...")
     if not knowledge_base_file.exists():
         print(f"Error: {knowledge_base_file} not found")
-        return []
+        return [], None
 
-    async with aiofiles.open(knowledge_base_file, "r", encoding="utf-8") as f:
-        lines = await f.read()
+    async with aiofiles.open(knowledge_base_file, "rb") as f:
+        source = await f.read()
 
-    conditions_database = parse_knowledge_base(lines)
+    # Parsing (and writing the snapshot) runs off the event loop so a reload
+    # does not stall requests in flight.
+    conditions_database = await asyncio.to_thread(load_conditions, source, workers=workers)
     if not conditions_database:
         print("Failed to load knowledge base. Server may not work properly.")
     else:
         print(f"Loaded {len(conditions_database)} conditions.")
+    return conditions_database, source
+
+
+async def load_knowledge(workers=1):
+    conditions_database, _ = await load_knowledge_with_source(workers)
     return conditions_database
@@ -0,0 +1,130 @@
+"""
+Hot reload of the knowledge base file.
+
+``KnowledgeBaseWatcher`` polls ``knowledge_base.txt`` (a ``stat`` per
+interval, no external service). When its modification time or size changes
+and its content hash differs from the last version seen, the file is
+re-parsed with an ``IncrementalParser`` (only edited condition blocks are
+parsed again), the snapshot is refreshed and the new conditions are handed
+to a callback, which in the API compiles and swaps in a new scoring plan.
+"""
+
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+
+from .kb_loader import (
+    IncrementalParser,
+    knowledge_base_file,
+    knowledge_base_snapshot_file,
+    write_snapshot,
+)
+
+
+class KnowledgeBaseWatcher:
+    """
+    Detects changes to the knowledge base file and re-parses it incrementally.
+
+    Args:
+        path: The knowledge base text file.
+        snapshot_path: Snapshot refreshed after every reload (None to skip).
+    """
+
+    def __init__(self, path=knowledge_base_file, snapshot_path=knowledge_base_snapshot_file):
+        self.path = Path(path)
+        self.snapshot_path = snapshot_path
+        self.parser = IncrementalParser()
+        self.reloads = 0
+        self._signature = None
+        self._digest = None
+
+    def signature(self):
+        """Returns the file's ``(mtime_ns, size)``, or None if it is missing."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def prime(self, conditions, source, signature):
+        """
+        Records the initial load so only later changes trigger a reload.
+
+        Args:
+            conditions: The conditions loaded at startup.
+            source: The file bytes they were loaded from (None if none).
+            signature: ``signature()`` taken before ``source`` was read, so
+                an edit landing during startup is seen by the first poll.
+        """
+        self._signature = signature
+        self._digest = None
+        if source is None:
+            return
+        try:
+            text = source.decode("utf-8")
+        except UnicodeDecodeError:
+            return
+        if self.parser.seed(text, conditions):
+            self._digest = hashlib.sha256(source).digest()
+
+    def poll(self):
+        """
+        Checks the file once.
+
+        Returns:
+            list: The re-parsed conditions if the content changed since the
+            last poll, otherwise None. A file that is missing, not valid
+            UTF-8 or yields no conditions (e.g. caught mid-write) is skipped
+            and the current knowledge base kept.
+        """
+        # Stat before reading: a write that lands during the read changes
+        # the signature again and is picked up by the next poll.
+        signature = self.signature()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+        try:
+            source = self.path.read_bytes()
+        except OSError:
+            return None
+        digest = hashlib.sha256(source).digest()
+        if digest == self._digest:
+            return None
+        try:
+            text = source.decode("utf-8")
+        except UnicodeDecodeError as e:
+            print(f"Warning: knowledge base is not valid UTF-8, not reloading: {e}")
+            return None
+        conditions = self.parser.parse(text)
+        if not conditions:
+            print("Warning: knowledge base has no conditions, not reloading.")
+            return None
+        self._digest = digest
+        if self.snapshot_path is not None:
+            try:
+                write_snapshot(self.snapshot_path, conditions, source)
+            except OSError as e:
+                print(f"Warning: could not write knowledge base snapshot: {e}")
+        self.reloads += 1
+        print(
+            f"Knowledge base changed: {len(conditions)} conditions, "
+            f"{self.parser.reparsed} re-parsed."
+        )
+        return conditions
+
+    async def watch(self, interval, on_change):
+        """
+        Polls every ``interval`` seconds until cancelled.
+
+        ``on_change`` is awaited with the new conditions after each change.
+        Errors are reported and polling continues with the current plan.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                conditions = await asyncio.to_thread(self.poll)
+                if conditions is not None:
+                    await on_change(conditions)
+            except Exception as e:
+                print(f"Knowledge base reload failed: {e}")
@@ -1,3 +1,46 @@
+import functools
+import hashlib
+
+import numpy as np
+
+# Answers containing one of these phrases ("other:" only as a prefix) mean the
+# patient opted out of the question, so the whole field contributes nothing.
+EXCLUSIVE_PHRASES = frozenset(
+    {
+        "none of the above",
+        "nothing specific",
+        "prefer not to say",
+        "not sure",
+        "not spreading",
+        "unsure",
+        "other:",
+        "none",
+    }
+)
+
+# Questionnaire fields (request keys) -> (KeywordMappings attribute, multiple choice)
+QUESTIONNAIRE_FIELDS = {
+    "symptoms": ("symptom_keywords", True),
+    "location": ("location_keywords", True),
+    "appearance": ("morphology_keywords", True),
+    "general_symptoms": ("systemic_symptons_keywords", True),
+    "triggers": ("trigger_keywords", True),
+    "past_diagnoses": ("condition_keywords", True),
+    "spread_arrangement": ("spread_pattern_keywords", False),
+    "condition_duration": ("duration_keywords", False),
+    "age_range": ("age_keywords", False),
+    "gender": ("gender_keywords", False),
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def is_exclusive_option(option_lower):
+    """Returns True if a lowercased answer opts out of its question."""
+    return option_lower.startswith("other:") or any(
+        phrase in option_lower for phrase in EXCLUSIVE_PHRASES if phrase != "other:"
+    )
+
+
 # --- keyword mapping (expanded based on new detailed questions) ---
 # symptoms - expanded based on kb details
 class KeywordMappings:
@@ -1291,3 +1334,126 @@ class KeywordMappings:
             # "satellite lesions": This is vague. Could be papules or pustules. Need separate entries or map to a general 'spots' morphology?
             # "heliotrope"/"gottron": These are location *and* morphology. Current mapping is okay but maybe add morphology links too?
         }
+        self.compile()
+
+    def compile(self):
+        """
+        Builds the option lookup tables from the keyword dictionaries.
+
+        Every distinct keyword (compared case-insensitively, like the matching)
+        gets an integer id (``self.vocabulary[id]``), shared by all options
+        and fields that list it. Each questionnaire field gets a lowercased
+        option -> keyword id table, both as frozensets
+        (``option_keyword_ids``) and as sorted int32 arrays
+        (``option_keyword_arrays``), plus the set of its options that are
+        exclusive. ``field_keyword_ids`` holds each field's keyword ids and
+        ``keyword_fields`` is the field x keyword membership matrix, rows in
+        ``QUESTIONNAIRE_FIELDS`` order. ``self.fingerprint`` identifies the
+        compiled mappings. Call this again after editing the keyword
+        dictionaries.
+        """
+        self.vocabulary = []
+        self.keyword_ids = {}
+        self.option_keyword_ids = {}
+        self.option_keyword_arrays = {}
+        self.exclusive_options = {}
+        for field, (mapping_attr, _) in QUESTIONNAIRE_FIELDS.items():
+            table = {}
+            for option, keywords in getattr(self, mapping_attr).items():
+                # Like the original linear scan, the first case-insensitive match wins.
+                table.setdefault(
+                    option.lower(), frozenset(self._keyword_id(kw) for kw in keywords)
+                )
+            self.option_keyword_ids[field] = table
+            self.option_keyword_arrays[field] = {
+                option: np.array(sorted(ids), dtype=np.int32)
+                for option, ids in table.items()
+            }
+            self.exclusive_options[field] = frozenset(
+                option for option in table if is_exclusive_option(option)
+            )
+
+        self.field_keyword_ids = {}
+        self.keyword_fields = np.zeros(
+            (len(QUESTIONNAIRE_FIELDS), len(self.vocabulary)), dtype=bool
+        )
+        for pos, (field, table) in enumerate(self.option_keyword_ids.items()):
+            ids = np.array(sorted(set().union(*table.values())), dtype=np.int32)
+            self.field_keyword_ids[field] = ids
+            self.keyword_fields[pos, ids] = True
+        self.fingerprint = hashlib.sha1(
+            repr(
+                (
+                    self.vocabulary,
+                    {f: sorted(t.items()) for f, t in self.option_keyword_ids.items()},
+                    sorted(self.specific_keyword_bonus_map.items()),
+                )
+            ).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def _keyword_id(self, keyword):
+        # Matching ignores case, so keywords differing only in case are one id.
+        keyword = keyword.lower()
+        kw_id = self.keyword_ids.get(keyword)
+        if kw_id is None:
+            kw_id = self.keyword_ids[keyword] = len(self.vocabulary)
+            self.vocabulary.append(keyword)
+        return kw_id
+
+    def selected_options(self, field, user_data):
+        """
+        Returns the known lowercased options selected by one answer.
+
+        Multiple choice fields expect a list of options and single choice
+        fields a string. Answers of the wrong type select nothing, unknown
+        options are ignored, and selecting an exclusive option ("None of the
+        above", "Other: ...", ...) disables the whole field.
+        """
+        if not user_data:
+            return []
+        _, is_multiple = QUESTIONNAIRE_FIELDS[field]
+        if is_multiple:
+            if not isinstance(user_data, list):
+                return []
+            options = [option.lower() for option in user_data]
+        else:
+            if not isinstance(user_data, str):
+                return []
+            options = [user_data.lower()]
+
+        table = self.option_keyword_ids[field]
+        exclusive = self.exclusive_options[field]
+        for option in options:
+            if option in exclusive or (
+                option not in table and is_exclusive_option(option)
+            ):
+                return []
+        return [option for option in options if option in table]
+
+    def resolve_field(self, field, user_data):
+        """
+        Returns the set of keyword ids selected by one questionnaire answer.
+
+        See ``selected_options`` for how answers are interpreted.
+        """
+        table = self.option_keyword_ids[field]
+        keyword_ids = set()
+        for option in self.selected_options(field, user_data):
+            keyword_ids.update(table[option])
+        return keyword_ids
+
+    def resolve_field_array(self, field, user_data):
+        """
+        Like ``resolve_field``, as an int32 array of keyword ids.
+
+        The selected options' id arrays are concatenated without
+        deduplication, so an id shared by two selected options appears twice;
+        that is harmless for indexing and cheaper than ``np.unique``.
+        """
+        arrays = self.option_keyword_arrays[field]
+        selected = [arrays[option] for option in self.selected_options(field, user_data)]
+        if not selected:
+            return np.zeros(0, dtype=np.int32)
+        if len(selected) == 1:
+            return selected[0]
+        return np.concatenate(selected)
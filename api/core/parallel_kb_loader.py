@@ -0,0 +1,113 @@
+"""
+Knowledge base parsing across a process pool.
+
+``parse_knowledge_base_parallel`` cuts the text into one chunk per worker,
+always right before a ``[Condition: ...]`` tag, so no condition block or
+category heading straddles two chunks. Each worker scans its chunk's headings
+and parses its conditions; the parent renumbers the conditions and assigns
+their categories from the merged heading offsets (a heading number reused
+later in the text renames all its sections, as in ``parse_knowledge_base``).
+
+Starting the pool and shipping the chunks and records between processes
+costs more than parsing a small knowledge base, so texts shorter than
+``PARALLEL_PARSE_MIN_CHARS`` (or ``workers`` <= 1) are parsed in process.
+"""
+
+import concurrent.futures
+import marshal
+import os
+import re
+
+from .kb_loader import (
+    CATEGORY_PATTERN,
+    CONDITION_PATTERN,
+    category_at,
+    merge_category_headings,
+    parse_condition,
+    parse_knowledge_base,
+)
+
+# Texts below this many characters are parsed in process; see the crossover
+# benchmark in tests/test_parallel_kb_loader.py.
+PARALLEL_PARSE_MIN_CHARS = 500_000
+
+# Newlines and indentation before a condition tag: chunks start at the tag.
+_CHUNK_BOUNDARY = re.compile(r"\n\s*(?=\[Condition:)", re.IGNORECASE)
+
+
+def split_knowledge_base(text, count):
+    """
+    Splits ``text`` into up to ``count`` chunks starting at condition tags.
+
+    Returns:
+        list: ``(chunk text, offset of the chunk in text)`` pairs.
+    """
+    bounds = [0]
+    for k in range(1, count):
+        match = _CHUNK_BOUNDARY.search(text, max(bounds[-1], len(text) * k // count))
+        if match is None:
+            break
+        if match.end() > bounds[-1]:
+            bounds.append(match.end())
+    bounds.append(len(text))
+    return [(text[start:end], start) for start, end in zip(bounds, bounds[1:])]
+
+
+def _parse_chunk(text, offset):
+    """
+    Worker: parses one chunk without ids or categories.
+
+    Returns:
+        bytes: Marshalled ``(headings, blocks)``, the chunk's ``(offset,
+        number, name)`` category headings and ``(offset, condition)`` pairs,
+        offsets in the full text. Marshal loads the records several times
+        faster than the pool's pickling would.
+    """
+    headings = [
+        (offset + match.start(), match.group(1), match.group(2).strip())
+        for match in CATEGORY_PATTERN.finditer(text)
+    ]
+    blocks = [
+        (
+            offset + match.start(),
+            parse_condition(None, match.group(1).strip(), None, match.group(2).strip()),
+        )
+        for match in CONDITION_PATTERN.finditer(text)
+    ]
+    return marshal.dumps((headings, blocks))
+
+
+def parse_knowledge_base_parallel(text, workers=None, min_chars=PARALLEL_PARSE_MIN_CHARS):
+    """
+    ``parse_knowledge_base`` split across ``workers`` processes.
+
+    Args:
+        text: Knowledge base text.
+        workers (int): Worker processes (default: CPU count).
+        min_chars (int): Shorter texts are parsed in process.
+
+    Returns:
+        list: The same condition dictionaries as ``parse_knowledge_base``.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(text) < min_chars:
+        return parse_knowledge_base(text)
+
+    chunks = split_knowledge_base(text, workers)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        results = [marshal.loads(data) for data in pool.map(_parse_chunk, *zip(*chunks))]
+
+    positions, names = merge_category_headings(
+        heading for headings, _ in results for heading in headings
+    )
+    conditions = []
+    for _, blocks in results:
+        for start, condition in blocks:
+            condition["id"] = len(conditions)
+            condition["category"] = category_at(positions, names, start)
+            conditions.append(condition)
+
+    if not conditions:
+        print("Warning: No conditions parsed. Check knowledge base format and content.")
+
+    return conditions
@@ -0,0 +1,152 @@
+"""
+LRU result cache for symptom scoring.
+
+Questionnaire answers come from a finite option set, so identical answer
+combinations are common. Results are cached under a canonical form of the
+answers (case-folded, order- and duplicate-insensitive option lists) together
+with the scoring engine's version, so reloading the knowledge base, keyword
+mappings or weights never serves stale rankings.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def _canonical_value(value):
+    # Scoring compares options case-insensitively and treats multiple choice
+    # answers as sets, but a list and a bare string score differently.
+    if isinstance(value, str):
+        return ("str", value.lower())
+    if isinstance(value, list):
+        return (
+            "list",
+            tuple(
+                sorted(
+                    {
+                        ("str", item.lower()) if isinstance(item, str) else ("repr", repr(item))
+                        for item in value
+                    }
+                )
+            ),
+        )
+    return ("repr", repr(value))
+
+
+def canonical_answers(patient_input):
+    """Returns a hashable, order-insensitive form of a questionnaire answer dict."""
+    return tuple(
+        sorted((key, _canonical_value(value)) for key, value in patient_input.items())
+    )
+
+
+class ScoreCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+
+    Args:
+        max_size (int): Maximum number of cached results; 0 disables caching.
+        ttl_seconds (float): Seconds a result stays valid after being stored.
+        clock (callable): Monotonic time source (overridable for tests).
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(patient_input, version):
+        """Builds the cache key for ``patient_input`` under an engine version."""
+        return (version, canonical_answers(patient_input))
+
+    def get(self, key):
+        """Returns the cached result for ``key`` or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores ``value`` under ``key``, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every cached result (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the cache counters as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def cached_calculate_scores(
+    engine, cache, patient_input, conditions_db, limit=None, min_score=None
+):
+    """``engine.calculate_scores`` behind ``cache`` (skipped when cache is None)."""
+    if cache is None:
+        return engine.calculate_scores(patient_input, conditions_db, limit, min_score)
+    version = (engine.cache_version(conditions_db), limit, min_score)
+    key = cache.make_key(patient_input, version)
+    results = cache.get(key)
+    if results is None:
+        results = engine.calculate_scores(patient_input, conditions_db, limit, min_score)
+        cache.put(key, results)
+    return results
+
+
+def cached_calculate_scores_batch(
+    engine, cache, patient_inputs, conditions_db, limit=None, min_score=None
+):
+    """``engine.calculate_scores_batch`` that only scores the cache misses."""
+    if cache is None:
+        return engine.calculate_scores_batch(
+            patient_inputs, conditions_db, limit, min_score
+        )
+    version = (engine.cache_version(conditions_db), limit, min_score)
+    keys = [cache.make_key(p, version) for p in patient_inputs]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        scored = engine.calculate_scores_batch(
+            [patient_inputs[i] for i in missing], conditions_db, limit, min_score
+        )
+        for i, result in zip(missing, scored):
+            results[i] = result
+            cache.put(keys[i], result)
+    return results
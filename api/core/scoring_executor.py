@@ -0,0 +1,102 @@
+"""
+Bounded executor that keeps CPU-bound scoring off the asyncio event loop.
+
+Scoring is synchronous and CPU heavy; running it inside ``async def``
+handlers blocks the event loop, stalling health checks and every other
+request. ``BoundedScoringExecutor`` runs scoring calls on a dedicated thread
+pool and caps how many calls may be running or waiting. Once the cap is
+reached new calls fail fast with ``ScoringSaturated`` (served as 503 with a
+Retry-After header) instead of queueing without bound.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+
+class ScoringSaturated(Exception):
+    """Raised when the scoring executor has no free slot."""
+
+    def __init__(self, retry_after_seconds):
+        super().__init__("Scoring capacity exhausted, retry later.")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class BoundedScoringExecutor:
+    """
+    Thread pool with a cap on running plus queued scoring calls.
+
+    Args:
+        max_workers (int): Scoring calls running at once.
+        max_queue (int): Calls allowed to wait for a worker.
+        retry_after_seconds (int): Retry-After hint for rejected calls.
+    """
+
+    def __init__(self, max_workers=4, max_queue=64, retry_after_seconds=1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scoring"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def try_acquire(self):
+        """Reserves a slot; returns False when running + queued calls hit the cap."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                return False
+            self._pending += 1
+            return True
+
+    def release(self):
+        """Frees a slot reserved with ``try_acquire``."""
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs ``func(*args, **kwargs)`` on the pool and awaits its result.
+
+        Raises:
+            ScoringSaturated: If no slot is free.
+        """
+        if not self.try_acquire():
+            raise ScoringSaturated(self.retry_after_seconds)
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self.release()
+            raise
+        # The slot is freed when the call itself finishes (or is cancelled
+        # before it started), not when the awaiting request goes away: a
+        # cancelled request must not free capacity its call still uses.
+        future.add_done_callback(lambda _: self.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """Waits for running calls and stops the pool."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """Returns the executor counters as a dict."""
+        with self._lock:
+            pending = self._pending
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": min(pending, self.max_workers),
+                "queued": max(pending - self.max_workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
@@ -1,13 +1,102 @@
-import re
 import collections
+import dataclasses
+import heapq
 from .config import Config
-from .keywords import KeywordMappings
+from .keywords import KeywordMappings, is_exclusive_option
+from .kb_index import (
+    ConditionNameIndex,
+    build_bonus_table,
+    build_condition_index,
+    build_keyword_index,
+    knowledge_base_fingerprint,
+)
 
 # --- Functions (parse_knowledge_base, get_user_input, calculate_scores) ---
 # PASTE THE FUNCTIONS FROM THE PREVIOUS VERSION HERE - they don't need internal changes
 # based on these weight/keyword adjustments. Ensure the calculate_scores uses the new weights.
 
 
+# Keyword categories in scoring order: (request key, Config weight, debug tag).
+# The request key also selects the KeywordMappings table (see QUESTIONNAIRE_FIELDS).
+SCORING_CATEGORIES = (
+    ("symptoms", "WEIGHT_SYMPTOM", "Symptom"),
+    ("location", "WEIGHT_LOCATION", "Location"),
+    ("appearance", "WEIGHT_MORPHOLOGY", "Morphology"),
+    ("general_symptoms", "WEIGHT_SYSTEMIC", "Systemic"),
+    ("triggers", "WEIGHT_TRIGGER", "Trigger"),
+    ("spread_arrangement", "WEIGHT_SPREAD_PATTERN", "Spread"),
+    ("past_diagnoses", "WEIGHT_CONDITION", "MedCond"),
+    ("condition_duration", "WEIGHT_DURATION", "Duration"),
+    ("age_range", "WEIGHT_AGE", "Age"),
+    ("gender", "WEIGHT_GENDER", "Gender"),
+)
+
+# Config fields that influence scores (part of the result cache version).
+SCORE_CONFIG_FIELDS = tuple(
+    f.name
+    for f in dataclasses.fields(Config)
+    if f.name.startswith(("WEIGHT_", "BONUS_")) or f.name == "KEYWORD_MATCHING"
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class KnowledgeBaseIndex:
+    """Lookup structures derived from one condition list; never modified once built."""
+
+    conditions: list
+    fingerprint: str
+    # Keyword id -> matching condition rows
+    keyword_index: tuple
+    # ((specific keyword, input key, required option, bonus), rows) per bonus entry
+    bonus_table: tuple
+    # Condition row -> bonus entries whose specific keyword it contains
+    condition_bonuses: dict
+    # Condition name -> rows with that name
+    rows_by_name: dict
+    name_index: ConditionNameIndex
+    # Backend specific compiled form (see VectorizedScoringEngine)
+    compiled: object = None
+
+
+def index_knowledge_base(conditions_db, keyword_index, bonus_table, compiled=None):
+    """Builds a KnowledgeBaseIndex from precomputed keyword and bonus matches."""
+    condition_bonuses = collections.defaultdict(list)
+    for entry, rows in bonus_table:
+        for idx in rows:
+            condition_bonuses[idx].append(entry)
+    rows_by_name = collections.defaultdict(list)
+    for idx, condition in enumerate(conditions_db):
+        rows_by_name[condition["name"]].append(idx)
+    return KnowledgeBaseIndex(
+        conditions=conditions_db,
+        fingerprint=knowledge_base_fingerprint(conditions_db),
+        keyword_index=tuple(keyword_index),
+        bonus_table=tuple(bonus_table),
+        condition_bonuses={idx: tuple(entries) for idx, entries in condition_bonuses.items()},
+        rows_by_name={name: tuple(rows) for name, rows in rows_by_name.items()},
+        name_index=ConditionNameIndex(conditions_db),
+        compiled=compiled,
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class ScoringPlan:
+    """
+    An engine compiled against one knowledge base, config and keyword mapping.
+
+    Request handlers read the plan once and use its engine, conditions and
+    condition index together, so replacing the plan (a single attribute
+    assignment) never mixes two knowledge bases within a request.
+    """
+
+    engine: "ScoringEngine"
+    conditions: list
+    # Condition name -> record, see build_condition_index
+    condition_index: dict
+    # ScoringEngine.cache_version of the plan
+    version: tuple
+
+
 class ScoringEngine:
     config: Config
     keyword_map: KeywordMappings
@@ -15,284 +104,414 @@ class ScoringEngine:
     def __init__(self, config, keyword_map):
         self.config = config
         self.keyword_map = keyword_map
+        self._kb = None
 
-    # Removed get_user_input function as input will come from API request
-    def calculate_scores(self, patient_input, conditions_db):
-        """Calculates scores using adjusted weights and general specific keyword bonuses."""
-        print("\n--- [calculate_scores] START ---")  # Log start
-        print(f"Received patient_input: {patient_input}")  # Log the full input
+    @classmethod
+    def compile(cls, config, keyword_map, conditions):
+        """
+        Compiles an immutable ScoringPlan for ``conditions``.
 
-        scores = collections.defaultdict(float)
-        debug_scores = collections.defaultdict(
-            lambda: collections.defaultdict(float)
-        )  # For debugging
-
-        # --- Prepare keyword sets (Handle single vs multiple choice inputs) ---
-        def get_keywords(input_key, keyword_dict, is_multiple, exclusive_options):
-            # (Keep the inner workings of get_keywords the same for now)
-            # ... existing get_keywords code ...
-            kws = (
-                set()
-            )  # Placeholder - Replace with your actual get_keywords logic return
-            user_data = patient_input.get(input_key)
-            if not user_data:
-                return kws
-
-            options_to_process = []
-            if is_multiple:
-                if isinstance(user_data, list):
-                    options_to_process = user_data
-                else:
-                    return kws  # Error or unexpected type
-            else:
-                if isinstance(user_data, str):
-                    options_to_process = [user_data]
-                else:
-                    return kws  # Error or unexpected type
-
-            is_exclusive_selected = False
-            # Simplified exclusive check for logging demo
-            for opt in options_to_process:
-                if any(
-                    ex_phrase in opt.lower()
-                    for ex_phrase in exclusive_options
-                    if ex_phrase != "other:"
-                ) or (
-                    "other:" in exclusive_options and opt.lower().startswith("other:")
-                ):
-                    is_exclusive_selected = True
-                    break
+        The engine gets its own copy of ``config``, so later changes to the
+        caller's Config do not leak into the plan.
 
-            if not is_exclusive_selected:
-                for option in options_to_process:
-                    option_lower = option.lower()
-                    matched_key = None
-                    for key_option in keyword_dict.keys():
-                        # Use lower() for case-insensitive key matching
-                        if key_option.lower() == option_lower:
-                            matched_key = key_option
-                            break
-                    if matched_key:
-                        kws.update(keyword_dict[matched_key])
-                    # else: # Optional: Log if an option wasn't found in the dictionary
-                    #     print(f"--- DEBUG: Option '{option}' for key '{input_key}' not found in keyword_dict keys.")
-            return kws
-
-        # Define common exclusive phrases based on updated options
-        exclusive_phrases = {
-            "none of the above",
-            "nothing specific",
-            "prefer not to say",
-            "not sure",
-            "not spreading",
-            "unsure",
-            "other:",
-            "none",
-        }
-
-        # --- CORRECTED KEYS based on QuestionSet.js ---
-        symptom_kws = get_keywords(
-            "symptoms", self.keyword_map.symptom_keywords, True, exclusive_phrases
+        Args:
+            config (Config): Configuration object.
+            keyword_map (KeywordMappings): Questionnaire keyword mappings.
+            conditions: Parsed conditions.
+
+        Returns:
+            ScoringPlan: The compiled plan.
+        """
+        engine = cls(dataclasses.replace(config), keyword_map)
+        engine.build_index(conditions)
+        return ScoringPlan(
+            engine=engine,
+            conditions=conditions,
+            condition_index=build_condition_index(conditions),
+            version=engine.cache_version(conditions),
         )
-        location_kws = get_keywords(
-            "location", self.keyword_map.location_keywords, True, exclusive_phrases
+
+    def build_index(self, conditions_db):
+        """
+        Precomputes the keyword -> condition index for ``conditions_db``.
+
+        Call this once after loading the knowledge base. ``calculate_scores``
+        rebuilds the index itself if it is handed a different condition list.
+        """
+        self._kb = self._index_knowledge_base(conditions_db)
+
+    def _index_knowledge_base(self, conditions_db):
+        vocabulary = self.keyword_map.vocabulary
+        matching = self.config.KEYWORD_MATCHING
+        index = build_keyword_index(conditions_db, vocabulary, matching)
+        return index_knowledge_base(
+            conditions_db,
+            # Indexed by keyword id.
+            [index[kw] for kw in vocabulary],
+            build_bonus_table(
+                conditions_db, self.keyword_map.specific_keyword_bonus_map, matching
+            ),
         )
-        morphology_kws = get_keywords(
-            "appearance", self.keyword_map.morphology_keywords, True, exclusive_phrases
-        )  # Use 'appearance'
-        systemic_kws = get_keywords(
-            "general_symptoms",
-            self.keyword_map.systemic_symptons_keywords,
-            True,
-            exclusive_phrases,
-        )  # Use 'general_symptoms'
-        trigger_kws = get_keywords(
-            "triggers", self.keyword_map.trigger_keywords, True, exclusive_phrases
+
+    def _kb_for(self, conditions_db):
+        # Read once: every method works on a single snapshot even if another
+        # thread indexes a different condition list meanwhile.
+        kb = self._kb
+        if kb is None or kb.conditions is not conditions_db:
+            kb = self._index_knowledge_base(conditions_db)
+            self._kb = kb
+        return kb
+
+    def cache_version(self, conditions_db):
+        """
+        Identifies everything besides the answers that scores depend on.
+
+        Combines the knowledge base content, the compiled keyword mappings and
+        the score weights, so cached results are invalidated by a reload.
+        """
+        return (
+            self._kb_for(conditions_db).fingerprint,
+            self.keyword_map.fingerprint,
+            tuple(getattr(self.config, name) for name in SCORE_CONFIG_FIELDS),
         )
-        med_cond_kws = get_keywords(
-            "past_diagnoses",
-            self.keyword_map.condition_keywords,
-            True,
-            exclusive_phrases,
-        )  # Use 'past_diagnoses'
-
-        spread_pattern_kws = get_keywords(
-            "spread_arrangement",
-            self.keyword_map.spread_pattern_keywords,
-            False,
-            exclusive_phrases,
-        )  # Use 'spread_arrangement'
-        duration_kws = get_keywords(
-            "condition_duration",
-            self.keyword_map.duration_keywords,
-            False,
-            exclusive_phrases,
-        )  # Use 'condition_duration'
-        age_kws = get_keywords(
-            "age_range", self.keyword_map.age_keywords, False, exclusive_phrases
+
+    def history_rows(self, patient_input, conditions_db):
+        """Returns the rows of the conditions named in the patient's past diagnoses."""
+        return self._kb_for(conditions_db).name_index.rows_for(
+            reported_diagnoses(patient_input.get("past_diagnoses"))
         )
-        gender_kws = get_keywords(
-            "gender", self.keyword_map.gender_keywords, False, exclusive_phrases
+
+    def extract_patient_keywords(self, patient_input):
+        """
+        Resolves questionnaire answers into the keyword sets used for scoring.
+
+        Returns:
+            tuple: ``(keyword_sets_and_weights, patient_med_cond_names)`` where
+            the first item is a list of ``(keyword id set, weight, category tag)``
+            in ``SCORING_CATEGORIES`` order and the second is the set of
+            lowercased past diagnoses eligible for the history name bonus.
+        """
+        # Option lookups go through the tables compiled by KeywordMappings.
+        keyword_sets_and_weights = [
+            (
+                self.keyword_map.resolve_field(field, patient_input.get(field)),
+                getattr(self.config, weight_attr),
+                category_tag,
+            )
+            for field, weight_attr, category_tag in SCORING_CATEGORIES
+        ]
+
+        # Special handling for medical condition names for bonus
+        patient_med_cond_names = reported_diagnoses(patient_input.get("past_diagnoses"))
+
+        return keyword_sets_and_weights, patient_med_cond_names
+
+    def _patient_terms(self, patient_input, conditions_db):
+        """
+        Lists the score terms selected by a patient's answers.
+
+        Returns:
+            list: ``(points, condition rows)`` pairs, one per selected keyword,
+            for the history name bonus and per selected specific keyword
+            bonus. A condition's score is the sum of the points of the terms
+            listing it; rows are sorted and terms without rows are left out.
+        """
+        keyword_sets_and_weights, patient_med_cond_names = (
+            self.extract_patient_keywords(patient_input)
         )
+        # Only the conditions listed in the keyword index for each extracted
+        # keyword are touched; everything else keeps a keyword score of 0.
+        kb = self._kb_for(conditions_db)
+        terms = [
+            (weight, kb.keyword_index[kw_id])
+            for kw_ids, weight, _ in keyword_sets_and_weights
+            for kw_id in kw_ids
+        ]
+
+        history_rows = kb.name_index.rows_for(patient_med_cond_names)
+        terms.append((self.config.BONUS_HISTORY_NAME_MATCH, sorted(history_rows)))
+
+        # Which conditions contain each bonus keyword is precomputed, so only
+        # the patient's option selection is checked here.
+        for (_, input_cat_key, req_input_opt, bonus_val), rows in kb.bonus_table:
+            if option_selected(patient_input.get(input_cat_key), req_input_opt):
+                terms.append((bonus_val, rows))
+        return [(weight, rows) for weight, rows in terms if len(rows)]
+
+    def _history_match(self, kb, idx, patient_med_cond_names):
+        """Returns the reported diagnosis earning condition ``idx`` the history bonus, if any."""
+        for reported_cond_name in patient_med_cond_names:
+            # Substring match in either direction, resolved by the name index
+            if idx in kb.name_index.matches(reported_cond_name):
+                return reported_cond_name
+        return None
+
+    def _specific_bonuses(self, kb, idx, patient_input):
+        """Yields ``(specific keyword, required option, bonus)`` earned by condition ``idx``."""
+        for specific_kw, input_cat_key, req_input_opt, bonus_val in (
+            kb.condition_bonuses.get(idx, ())
+        ):
+            if option_selected(patient_input.get(input_cat_key), req_input_opt):
+                yield specific_kw, req_input_opt, bonus_val
+
+    # Removed get_user_input function as input will come from API request
+    def calculate_scores(self, patient_input, conditions_db, limit=None, min_score=None):
+        """
+        Calculates scores using adjusted weights and general specific keyword bonuses.
+
+        Use ``explain_scores`` on the returned results for a per-keyword breakdown.
+
+        Args:
+            patient_input: Questionnaire answers.
+            conditions_db: Parsed conditions.
+            limit: Optional maximum number of results (the top ``limit``).
+            min_score: Optional minimum score a result must reach.
+
+        Returns:
+            list: ``(condition name, score)`` pairs sorted by score descending.
+        """
+        terms = self._patient_terms(patient_input, conditions_db)
+
+        row_scores = collections.defaultdict(float)
+        for weight, rows in terms:
+            for idx in rows:
+                row_scores[idx] += weight
+
+        scores = {}
+        # Only conditions that matched something can score; visiting them in
+        # knowledge-base order keeps the ranking's tie order.
+        for idx in sorted(row_scores):
+            if row_scores[idx] > 0:
+                scores[conditions_db[idx]["name"]] = row_scores[idx]
 
-        # --- Log Extracted Keywords ---
-        print(f"\n--- DEBUG: Extracted Keyword Sets ---")
-        print(f"Symptoms ({len(symptom_kws)}): {symptom_kws}")
-        print(f"Location ({len(location_kws)}): {location_kws}")
-        print(f"Morphology ({len(morphology_kws)}): {morphology_kws}")
-        print(f"Systemic ({len(systemic_kws)}): {systemic_kws}")
-        print(f"Trigger ({len(trigger_kws)}): {trigger_kws}")
-        print(f"Med Cond ({len(med_cond_kws)}): {med_cond_kws}")
-        print(f"Spread Pattern ({len(spread_pattern_kws)}): {spread_pattern_kws}")
-        print(f"Duration ({len(duration_kws)}): {duration_kws}")
-        print(f"Age ({len(age_kws)}): {age_kws}")
-        print(f"Gender ({len(gender_kws)}): {gender_kws}")
-        print("-" * 30)
-
-        # Special handling for medical condition names for bonus (Corrected Key)
-        patient_med_cond_names = set()
-        med_cond_input = patient_input.get("past_diagnoses")  # Use 'past_diagnoses'
-        if isinstance(med_cond_input, list):
-            is_exclusive_selected = False
-            for mc in med_cond_input:
-                mc_lower = mc.lower()
-                for exclusive_phrase in exclusive_phrases:
-                    if (
-                        exclusive_phrase == "other:"
-                        and mc_lower.startswith(exclusive_phrase)
-                    ) or (
-                        exclusive_phrase != "other:" and exclusive_phrase in mc_lower
-                    ):
-                        is_exclusive_selected = True
-                        break
-                if is_exclusive_selected:
+        return select_top_scores(scores, limit, min_score)
+
+    def score_vector(self, patient_input, conditions_db):
+        """Returns the final score of every condition, indexed by row."""
+        scores = [0.0] * len(conditions_db)
+        for weight, rows in self._patient_terms(patient_input, conditions_db):
+            for idx in rows:
+                scores[idx] += weight
+        return scores
+
+    def field_scores(self, field, value, conditions_db):
+        """
+        Scores a single questionnaire answer on its own.
+
+        Every score component depends on exactly one request key (its
+        keywords, the history bonus on ``past_diagnoses``, or a specific
+        keyword bonus's input key), so a patient's scores are the sum of
+        ``field_scores`` over their answers. Scoring sessions use this to
+        recompute only the field that changed.
+
+        Args:
+            field: Request key, e.g. ``"symptoms"``.
+            value: The raw answer for ``field``.
+            conditions_db: Parsed conditions.
+
+        Returns:
+            dict: condition row -> points contributed by this answer.
+        """
+        kb = self._kb_for(conditions_db)
+        scores = collections.defaultdict(float)
+        for category_field, weight_attr, _ in SCORING_CATEGORIES:
+            if category_field == field:
+                weight = getattr(self.config, weight_attr)
+                for kw_id in self.keyword_map.resolve_field(field, value):
+                    for idx in kb.keyword_index[kw_id]:
+                        scores[idx] += weight
+
+        if field == "past_diagnoses":
+            for idx in kb.name_index.rows_for(reported_diagnoses(value)):
+                scores[idx] += self.config.BONUS_HISTORY_NAME_MATCH
+
+        for (_, input_cat_key, req_input_opt, bonus_val), rows in kb.bonus_table:
+            if input_cat_key == field and option_selected(value, req_input_opt):
+                for idx in rows:
+                    scores[idx] += bonus_val
+        return dict(scores)
+
+    def rank_scores(self, final_scores, conditions_db, limit=None, min_score=None):
+        """
+        Ranks per-condition scores the way ``calculate_scores`` does.
+
+        Args:
+            final_scores: Sequence of scores indexed by condition row.
+            conditions_db: Parsed conditions.
+            limit: Optional maximum number of results.
+            min_score: Optional minimum score a result must reach.
+
+        Returns:
+            list: ``(condition name, score)`` pairs sorted by score descending.
+        """
+        scores = {}
+        for idx, score in enumerate(final_scores):
+            if score > 0:
+                scores[conditions_db[idx]["name"]] = float(score)
+        return select_top_scores(scores, limit, min_score)
+
+    def _explain_condition(
+        self, kb, idx, keyword_sets_and_weights, patient_med_cond_names, patient_input
+    ):
+        """Recomputes one condition's score with its matched keyword details."""
+        keyword_index = kb.keyword_index
+        vocabulary = self.keyword_map.vocabulary
+        score = 0.0
+        matched_keywords_details = []
+        debug_scores = collections.defaultdict(float)
+
+        for kw_ids, weight, category_tag in keyword_sets_and_weights:
+            for kw_id in sorted(kw_ids, key=vocabulary.__getitem__):
+                if idx in keyword_index[kw_id]:
+                    score += weight
+                    debug_scores[category_tag] += weight
+                    matched_keywords_details.append(
+                        f"+{weight:.1f} ({category_tag}: {vocabulary[kw_id]})"
+                    )
+
+        reported_cond_name = self._history_match(kb, idx, patient_med_cond_names)
+        if reported_cond_name:
+            bonus = self.config.BONUS_HISTORY_NAME_MATCH
+            score += bonus
+            debug_scores["Bonus_History"] += bonus
+            matched_keywords_details.append(
+                f"+{bonus:.1f} (Bonus_History: {reported_cond_name})"
+            )
+
+        bonus_score = 0.0
+        for specific_kw, req_input_opt, bonus_val in self._specific_bonuses(
+            kb, idx, patient_input
+        ):
+            bonus_score += bonus_val
+            debug_scores[f"Bonus_{specific_kw}"] += bonus_val
+            matched_keywords_details.append(
+                f"+{bonus_val:.1f} (Bonus_{specific_kw} for {req_input_opt})"
+            )
+
+        return score + bonus_score, matched_keywords_details, dict(debug_scores)
+
+    def explain_scores(self, patient_input, conditions_db, results):
+        """
+        Breaks down the scores of already ranked results.
+
+        Only the conditions in ``results`` are examined, so explaining a
+        top-k result costs nothing for the rest of the knowledge base.
+
+        Args:
+            patient_input: The questionnaire answers that produced ``results``.
+            conditions_db: Parsed conditions.
+            results: ``(condition name, score)`` pairs from ``calculate_scores``.
+
+        Returns:
+            dict: condition name -> ``{"matched_keywords": [...],
+            "score_breakdown": {category tag: points}}``.
+        """
+        kb = self._kb_for(conditions_db)
+        keyword_sets_and_weights, patient_med_cond_names = (
+            self.extract_patient_keywords(patient_input)
+        )
+        explanations = {}
+        for name, _ in results:
+            # A duplicated name reports its last positive-scoring record.
+            for idx in reversed(kb.rows_by_name.get(name, ())):
+                score, details, breakdown = self._explain_condition(
+                    kb,
+                    idx,
+                    keyword_sets_and_weights,
+                    patient_med_cond_names,
+                    patient_input,
+                )
+                if score > 0:
+                    explanations[name] = {
+                        "matched_keywords": details,
+                        "score_breakdown": breakdown,
+                    }
                     break
-            if not is_exclusive_selected:
-                for cond_name in med_cond_input:
-                    patient_med_cond_names.add(
-                        cond_name.lower()
-                    )  # Add the full name as reported
-        print(f"--- DEBUG: Patient Reported Med Cond Names: {patient_med_cond_names}")
-
-        # --- Score each condition ---
-        print(f"\n--- DEBUG: Scoring Conditions ({len(conditions_db)} total) ---")
-        for (
-            condition
-        ) in conditions_db:  # Limit logging to first 10 conditions for brevity
-            print("1")
-            print(condition)
-            name = condition["name"]
-            print("2")
-            flags_text = condition["red_flags_text"]
-            current_score = 0.0
-            matched_keywords_details = []
-
-            print("3")
-            # --- Standard Keyword Scoring ---
-            keyword_sets_and_weights = [
-                (symptom_kws, self.config.WEIGHT_SYMPTOM, "Symptom"),
-                (location_kws, self.config.WEIGHT_LOCATION, "Location"),
-                (morphology_kws, self.config.WEIGHT_MORPHOLOGY, "Morphology"),
-                (systemic_kws, self.config.WEIGHT_SYSTEMIC, "Systemic"),
-                (trigger_kws, self.config.WEIGHT_TRIGGER, "Trigger"),
-                (spread_pattern_kws, self.config.WEIGHT_SPREAD_PATTERN, "Spread"),
-                (med_cond_kws, self.config.WEIGHT_CONDITION, "MedCond"),
-                (duration_kws, self.config.WEIGHT_DURATION, "Duration"),
-                (age_kws, self.config.WEIGHT_AGE, "Age"),
-                (gender_kws, self.config.WEIGHT_GENDER, "Gender"),
-            ]
-
-            print(f"\n--- DEBUG: Scoring Condition: {name} ---")
-            # print(f"Flags Text (Snippet): {flags_text[:150]}...") # Optional: uncomment to see flags text
-
-            for kw_set, weight, category_tag in keyword_sets_and_weights:
-                category_score = 0
-                if kw_set:
-                    for kw in kw_set:
-                        pattern = r"\b" + re.escape(kw) + r"\b"
-                        if re.search(pattern, flags_text, re.IGNORECASE):
-                            # --- Log successful match ---
-                            print(
-                                f"    MATCH! Keyword: '{kw}' (Category: {category_tag}, Weight: +{weight:.1f})"
-                            )
-                            score_increase = weight
-                            current_score += score_increase
-                            category_score += score_increase
-                            matched_keywords_details.append(
-                                f"+{score_increase:.1f} ({category_tag}: {kw})"
-                            )
-
-                if category_score > 0:
-                    debug_scores[name][category_tag] += category_score
-
-            # --- Apply Bonuses ---
-            # (Keep bonus logic, add logging if needed later)
-            # ... existing bonus code ...
-            history_bonus_applied = False
-            if patient_med_cond_names:
-                condition_name_lower = name.lower()
-                for reported_cond_name in patient_med_cond_names:
-                    # Use 'in' for substring matching, might need refinement
-                    if (
-                        reported_cond_name in condition_name_lower
-                        or condition_name_lower in reported_cond_name
-                    ):
-                        print(
-                            f"    BONUS! History Match: +{self.config.BONUS_HISTORY_NAME_MATCH:.1f} for '{reported_cond_name}'"
-                        )
-                        current_score += self.config.BONUS_HISTORY_NAME_MATCH
-                        debug_scores[name][
-                            "Bonus_History"
-                        ] += self.config.BONUS_HISTORY_NAME_MATCH
-                        matched_keywords_details.append(
-                            f"+{self.config.BONUS_HISTORY_NAME_MATCH:.1f} (Bonus_History: {reported_cond_name})"
-                        )
-                        history_bonus_applied = True
-                        break  # Apply bonus once
-
-            bonus_score = 0.0
-
-            for specific_kw, (
-                input_cat_key,
-                req_input_opt,
-                bonus_val,
-            ) in self.keyword_map.specific_keyword_bonus_map.items():
-                pattern = r"\b" + re.escape(specific_kw) + r"\b"
-                if re.search(pattern, flags_text, re.IGNORECASE):
-                    user_category_input = patient_input.get(
-                        input_cat_key
-                    )  # Use correct key here
-                    user_selected_relevant_option = False
-                    if isinstance(user_category_input, list):
-                        if any(
-                            req_input_opt.lower() == user_opt.lower()
-                            for user_opt in user_category_input
-                        ):
-                            user_selected_relevant_option = True
-                    elif isinstance(user_category_input, str):
-                        if req_input_opt.lower() == user_category_input.lower():
-                            user_selected_relevant_option = True
-
-                    if user_selected_relevant_option:
-                        print(
-                            f"    BONUS! Specific Keyword: +{bonus_val:.1f} for '{specific_kw}' matching '{req_input_opt}'"
-                        )
-                        bonus_score += bonus_val
-                        debug_scores[name][f"Bonus_{specific_kw}"] += bonus_val
-                        matched_keywords_details.append(
-                            f"+{bonus_val:.1f} (Bonus_{specific_kw} for {req_input_opt})"
-                        )
-
-            final_score = current_score + bonus_score
-
-            if final_score > 0:
-                scores[name] = final_score
-                print(f"--- DEBUG: Final Score for {name}: {final_score:.1f} ---")
-            # else: # Optional log for zero scores
-            #      print(f"--- DEBUG: Zero score for {name} ---")
-
-        print("\n--- [calculate_scores] END ---")  # Log end
-
-        # Sort by score descending
-        sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
-        return sorted_scores
+        return explanations
+
+    def calculate_scores_batch(
+        self, patient_inputs, conditions_db, limit=None, min_score=None
+    ):
+        """
+        Scores several patients against the same knowledge base.
+
+        Args:
+            patient_inputs: List of questionnaire answer dicts.
+            conditions_db: Parsed conditions.
+            limit: Optional maximum number of results per patient.
+            min_score: Optional minimum score a result must reach.
+
+        Returns:
+            list: One ``calculate_scores`` result per patient, in input order.
+        """
+        return [
+            self.calculate_scores(patient_input, conditions_db, limit, min_score)
+            for patient_input in patient_inputs
+        ]
+
+
+def reported_diagnoses(med_cond_input):
+    """Returns the lowercased past diagnoses eligible for the history name bonus."""
+    if isinstance(med_cond_input, list) and not any(
+        is_exclusive_option(mc.lower()) for mc in med_cond_input
+    ):
+        # Add the full names as reported
+        return {mc.lower() for mc in med_cond_input}
+    return set()
+
+
+def option_selected(user_input, required_option):
+    """True if a raw answer (list or string) selects ``required_option``, ignoring case."""
+    required = required_option.lower()
+    if isinstance(user_input, list):
+        return any(required == user_opt.lower() for user_opt in user_input)
+    if isinstance(user_input, str):
+        return required == user_input.lower()
+    return False
+
+
+def select_top_scores(scores, limit=None, min_score=None):
+    """
+    Orders a ``{condition name: score}`` dict by score descending.
+
+    Ties keep the dict's insertion order. With ``limit`` a heap selects only
+    the top entries instead of sorting everything; ``min_score`` drops lower
+    scores first.
+    """
+    items = scores.items()
+    if min_score is not None:
+        items = [item for item in items if item[1] >= min_score]
+    if limit is not None and limit < len(items):
+        # Documented equivalent of sorted(..., reverse=True)[:limit], ties included.
+        return heapq.nlargest(limit, items, key=lambda item: item[1])
+    return sorted(items, key=lambda item: item[1], reverse=True)
+
+
+def scoring_engine_class(config):
+    """Returns the ScoringEngine class selected by ``config.SCORING_BACKEND``."""
+    if config.SCORING_BACKEND == "index":
+        return ScoringEngine
+    if config.SCORING_BACKEND == "vectorized":
+        from .vectorized_scoring import VectorizedScoringEngine
+
+        return VectorizedScoringEngine
+    raise ValueError(f"Unknown scoring backend: {config.SCORING_BACKEND!r}")
+
+
+def create_scoring_engine(config, keyword_map):
+    """
+    Create the scoring backend selected by ``config.SCORING_BACKEND``.
+
+    Args:
+        config (Config): Configuration object.
+        keyword_map (KeywordMappings): Questionnaire keyword mappings.
+
+    Returns:
+        ScoringEngine: The selected engine (not yet indexed).
+    """
+    return scoring_engine_class(config)(config, keyword_map)
+
+
+def compile_scoring_plan(config, keyword_map, conditions):
+    """Compiles a ScoringPlan with the backend selected by ``config.SCORING_BACKEND``."""
+    return scoring_engine_class(config).compile(config, keyword_map, conditions)
@@ -0,0 +1,176 @@
+"""
+Incremental scoring sessions for step-by-step questionnaires.
+
+The front end asks for a ranking after every answered question. A session
+keeps the answers given so far together with one sparse partial score per
+answered field (the rows the field scores and their scores, see
+``ScoringEngine.field_scores``); changing an answer only rescores that field,
+then the partials are summed into a dense vector and re-ranked. A session's
+memory therefore grows with the rows its answers match, not with the size of
+the knowledge base. Sessions live in an in-memory store with LRU eviction and
+an idle timeout.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ScoringSession:
+    """
+    One questionnaire in progress.
+
+    Partial scores are tied to the engine version they were computed under
+    (``ScoringEngine.cache_version``) and are rebuilt from the stored answers
+    when the knowledge base, keyword mappings or weights change.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.answers = {}
+        self._partials = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _partial(engine, conditions_db, field, value):
+        """Returns the ``(rows, scores)`` arrays ``field`` = ``value`` contributes."""
+        field_scores = engine.field_scores(field, value, conditions_db)
+        return (
+            np.fromiter(field_scores.keys(), dtype=np.int64, count=len(field_scores)),
+            np.fromiter(field_scores.values(), dtype=np.float64, count=len(field_scores)),
+        )
+
+    def _sync(self, engine, conditions_db):
+        version = engine.cache_version(conditions_db)
+        if version != self._version:
+            self._partials = {
+                field: self._partial(engine, conditions_db, field, value)
+                for field, value in self.answers.items()
+            }
+            self._version = version
+
+    def update(self, engine, conditions_db, changes):
+        """
+        Applies answer changes, rescoring only the changed fields.
+
+        Args:
+            engine: ScoringEngine used for scoring.
+            conditions_db: Parsed conditions.
+            changes: dict of request key -> new answer; None removes the answer.
+
+        Raises:
+            Exception: Any error scoring a new answer; no change is applied.
+        """
+        with self._lock:
+            self._sync(engine, conditions_db)
+            # Score every change before storing any, so a value that fails
+            # to score leaves the session unchanged.
+            partials = {
+                field: self._partial(engine, conditions_db, field, value)
+                for field, value in changes.items()
+                if value is not None
+            }
+            for field, value in changes.items():
+                if value is None:
+                    self.answers.pop(field, None)
+                    self._partials.pop(field, None)
+                else:
+                    self.answers[field] = value
+                    self._partials[field] = partials[field]
+
+    def ranking(self, engine, conditions_db, limit=None, min_score=None):
+        """Returns the ``calculate_scores`` result for the current answers."""
+        with self._lock:
+            self._sync(engine, conditions_db)
+            total = np.zeros(len(conditions_db), dtype=np.float64)
+            # Rows are unique within a partial, so fancy-index += is exact.
+            for rows, scores in self._partials.values():
+                total[rows] += scores
+        return engine.rank_scores(total, conditions_db, limit, min_score)
+
+    def snapshot(self):
+        """Returns a copy of the current answers."""
+        with self._lock:
+            return dict(self.answers)
+
+
+class SessionStore:
+    """
+    Thread-safe LRU store of scoring sessions with an idle timeout.
+
+    Args:
+        max_sessions (int): Maximum number of live sessions; the least
+            recently used session is evicted beyond it.
+        ttl_seconds (float): Seconds a session survives without being used.
+        clock (callable): Monotonic time source (overridable for tests).
+    """
+
+    def __init__(self, max_sessions=10000, ttl_seconds=1800.0, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _purge_expired(self, now):
+        # Sessions are kept in order of last use and every use extends the
+        # lifetime by the same TTL, so the expired ones are at the front.
+        while self._sessions:
+            expires_at, _ = next(iter(self._sessions.values()))
+            if expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+            self.expirations += 1
+
+    def create(self):
+        """Starts a new empty session and returns it, dropping expired sessions."""
+        session = ScoringSession(uuid.uuid4().hex)
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+            self._sessions[session.session_id] = (now + self.ttl_seconds, session)
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def get(self, session_id):
+        """Returns the live session ``session_id`` and extends its lifetime, or None."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, session = entry
+            now = self._clock()
+            if expires_at <= now:
+                del self._sessions[session_id]
+                self.expirations += 1
+                return None
+            self._sessions[session_id] = (now + self.ttl_seconds, session)
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        """Ends a session; returns False if it did not exist."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        """Returns the store counters as a dict."""
+        with self._lock:
+            return {
+                "size": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "created": self.created,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
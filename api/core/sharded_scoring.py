@@ -0,0 +1,205 @@
+"""
+Process-pool scoring over shared-memory knowledge-base arrays.
+
+For bulk jobs one process is the ceiling, so ``ShardedScorer`` copies the
+compiled sparse match matrices (see ``compile_knowledge_base``) into
+``multiprocessing.shared_memory`` once and splits the conditions into
+contiguous row shards scored by a process pool. Workers attach to the shared
+arrays instead of receiving a copy of the knowledge base; each task only
+carries the patients' column weight vectors.
+
+Each shard returns its best rows per patient and the parent merges them into
+exactly the ranking ``calculate_scores`` produces: a shard keeps its top
+``limit`` rows of unique condition names plus every positive row of a
+duplicated name, since a duplicated name reports its last positive row and
+its rows may live in different shards.
+"""
+
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .vectorized_scoring import VectorizedScoringEngine, csr_matmat, top_k_order
+
+# Compiled arrays the workers need, by CompiledKnowledgeBase attribute.
+SHARED_ARRAYS = ("indptr", "indices", "bonus_indptr", "bonus_indices")
+
+# Worker process state: array name -> np.ndarray view on shared memory.
+_worker_arrays = {}
+_worker_blocks = []
+
+
+def _attach_shared_arrays(specs):
+    """Process pool initializer: maps the parent's shared arrays."""
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        _worker_arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _csr_slice(indptr, indices, start, end):
+    local_indptr = indptr[start : end + 1] - indptr[start]
+    return local_indptr, indices[indptr[start] : indptr[end]]
+
+
+def _score_shard(
+    start, end, column_weights, bonus_weights, history, history_bonus, limit, min_score
+):
+    """
+    Scores rows ``start:end`` for a batch of patients.
+
+    Returns:
+        list: Per patient, ``(rows, scores)`` arrays of the shard rows that
+        may appear in the merged ranking.
+    """
+    arrays = _worker_arrays
+    scores = csr_matmat(
+        *_csr_slice(arrays["indptr"], arrays["indices"], start, end), column_weights
+    )
+    scores += csr_matmat(
+        *_csr_slice(arrays["bonus_indptr"], arrays["bonus_indices"], start, end),
+        bonus_weights,
+    )
+    for j, rows in enumerate(history):
+        local = rows[(rows >= start) & (rows < end)] - start
+        scores[local, j] += history_bonus
+
+    duplicates = arrays["duplicate_mask"][start:end]
+    selected = []
+    for j in range(scores.shape[1]):
+        shard_scores = scores[:, j]
+        positive = shard_scores > 0
+        unique = np.flatnonzero(positive & ~duplicates)
+        values = shard_scores[unique]
+        if min_score is not None:
+            keep = values >= min_score
+            unique, values = unique[keep], values[keep]
+        unique = unique[top_k_order(values, unique, limit)]
+        rows = np.concatenate([unique, np.flatnonzero(positive & duplicates)])
+        selected.append((rows + start, shard_scores[rows]))
+    return selected
+
+
+class ShardedScorer:
+    """
+    Scores patient batches across a process pool sharing the compiled KB.
+
+    Args:
+        config (Config): Scoring configuration.
+        keyword_map (KeywordMappings): Questionnaire keyword mappings.
+        conditions: Parsed conditions.
+        num_workers (int): Worker processes (default: CPU count).
+        num_shards (int): Condition shards per batch (default: num_workers).
+
+    Use as a context manager, or call ``close`` to stop the pool and free
+    the shared memory.
+    """
+
+    def __init__(self, config, keyword_map, conditions, num_workers=None, num_shards=None):
+        self.plan = VectorizedScoringEngine.compile(config, keyword_map, conditions)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        compiled = self.plan.engine.compiled_kb(conditions)
+
+        arrays = {name: getattr(compiled, name) for name in SHARED_ARRAYS}
+        arrays["duplicate_mask"] = np.zeros(compiled.num_conditions, dtype=bool)
+        arrays["duplicate_mask"][compiled.duplicate_rows] = True
+
+        self._blocks = []
+        specs = {}
+        for name, array in arrays.items():
+            # SharedMemory rejects size 0.
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self._blocks.append(block)
+            specs[name] = (block.name, array.shape, array.dtype.str)
+
+        num_shards = max(1, min(num_shards or self.num_workers, compiled.num_conditions))
+        bounds = np.linspace(0, compiled.num_conditions, num_shards + 1).astype(int)
+        self.shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_attach_shared_arrays,
+            initargs=(specs,),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops the worker pool and releases the shared memory."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def score_batch(self, patient_inputs, limit=None, min_score=None):
+        """
+        Scores a batch of patients; same output as ``calculate_scores_batch``.
+
+        Returns:
+            list: One ``(condition name, score)`` ranking per patient.
+        """
+        if not patient_inputs:
+            return []
+        engine = self.plan.engine
+        conditions = self.plan.conditions
+        compiled = engine.compiled_kb(conditions)
+
+        num_patients = len(patient_inputs)
+        column_weights = np.zeros((len(compiled.column_weights), num_patients))
+        bonus_weights = np.zeros((len(compiled.bonus_entries), num_patients))
+        history = []
+        for j, patient_input in enumerate(patient_inputs):
+            column_weights[:, j], patient_history, bonus_weights[:, j] = (
+                engine.patient_columns(patient_input, conditions)
+            )
+            history.append(np.flatnonzero(patient_history))
+
+        futures = [
+            self._pool.submit(
+                _score_shard,
+                start,
+                end,
+                column_weights,
+                bonus_weights,
+                history,
+                engine.config.BONUS_HISTORY_NAME_MATCH,
+                limit,
+                min_score,
+            )
+            for start, end in self.shards
+        ]
+        shard_results = [future.result() for future in futures]
+        rankings = []
+        for j in range(num_patients):
+            merged = np.zeros(compiled.num_conditions)
+            for selected in shard_results:
+                rows, scores = selected[j]
+                merged[rows] = scores
+            rankings.append(engine.rank_scores(merged, conditions, limit, min_score))
+        return rankings
+
+    def score_stream(self, patient_inputs, batch_size=1000, limit=None, min_score=None):
+        """
+        Lazily scores an iterable of patients in batches of ``batch_size``.
+
+        Yields:
+            list: One ranking per patient, in input order.
+        """
+        batch = []
+        for patient_input in patient_inputs:
+            batch.append(patient_input)
+            if len(batch) == batch_size:
+                yield from self.score_batch(batch, limit, min_score)
+                batch = []
+        if batch:
+            yield from self.score_batch(batch, limit, min_score)
@@ -0,0 +1,462 @@
+"""
+Vectorized symptom scoring backed by a sparse condition x keyword matrix.
+
+The knowledge base is compiled once into CSR-style NumPy arrays: one row per
+condition and one column per (scoring category, keyword) pair, with a static
+per-column weight taken from ``Config.WEIGHT_*``. Scoring a patient builds a
+small column weight vector from their answers and performs a single sparse
+matrix-vector product (a matrix-matrix product for a batch of patients);
+specific keyword bonuses use a second sparse matrix over the entries of
+``KeywordMappings.specific_keyword_bonus_map``.
+
+For top-k requests against large knowledge bases the same matches are also
+kept by column, so ``max_score_top_k`` can skip conditions that cannot make
+the result.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .kb_index import build_bonus_table, build_keyword_index
+from .scoring_service import (
+    SCORING_CATEGORIES,
+    ScoringEngine,
+    index_knowledge_base,
+    option_selected,
+    reported_diagnoses,
+)
+
+
+@dataclass
+class CompiledKnowledgeBase:
+    """Sparse match matrices compiled from the knowledge base and keyword mappings."""
+
+    num_conditions: int
+    # [category position, keyword id] -> column in the keyword match matrix (-1: none)
+    column_lookup: np.ndarray
+    # Per category position: lowercased option -> columns of its keywords
+    option_columns: list
+    column_weights: np.ndarray
+    column_categories: np.ndarray
+    # CSR condition x column keyword matches
+    indptr: np.ndarray
+    indices: np.ndarray
+    # The same matches by column (CSC): sorted condition rows per column
+    column_indptr: np.ndarray
+    column_rows: np.ndarray
+    # Keyword id -> matching condition rows (the inverted index the matrix is built from)
+    keyword_hits: list
+    # (specific keyword, input key, required option, bonus) per bonus column
+    bonus_entries: list
+    # (bonus entry, matching condition rows) pairs, see build_bonus_table
+    bonus_table: list
+    bonus_indptr: np.ndarray
+    bonus_indices: np.ndarray
+    bonus_column_indptr: np.ndarray
+    bonus_column_rows: np.ndarray
+    # Condition -> distinct name slot (first-appearance order)
+    name_ids: np.ndarray
+    num_names: int
+    has_duplicate_names: bool
+    # Rows whose condition name appears more than once
+    duplicate_rows: np.ndarray
+
+
+def _csr_from_columns(column_hits, num_rows):
+    """Builds CSR arrays from a list of per-column row tuples."""
+    rows = np.fromiter(
+        (row for hits in column_hits for row in hits), dtype=np.int64
+    )
+    cols = np.fromiter(
+        (col for col, hits in enumerate(column_hits) for _ in hits), dtype=np.int64
+    )
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def _csc_from_columns(column_hits):
+    """Concatenates per-column row tuples into ``(indptr, rows)`` arrays."""
+    indptr = np.zeros(len(column_hits) + 1, dtype=np.int64)
+    np.cumsum([len(hits) for hits in column_hits], out=indptr[1:])
+    rows = np.fromiter(
+        (row for hits in column_hits for row in hits), dtype=np.int64, count=indptr[-1]
+    )
+    return indptr, rows
+
+
+def csr_matmat(indptr, indices, dense):
+    """Multiplies a binary CSR matrix by a dense ``(num_columns, k)`` matrix."""
+    out = np.zeros((len(indptr) - 1, dense.shape[1]), dtype=np.float64)
+    starts = indptr[:-1]
+    nonempty = starts < indptr[1:]
+    if len(indices):
+        # reduceat sums each row's slice; empty rows have to be skipped since
+        # reduceat would return the element at their start offset instead.
+        out[nonempty] = np.add.reduceat(dense[indices], starts[nonempty], axis=0)
+    return out
+
+
+def compile_knowledge_base(conditions, keyword_map, config):
+    """
+    Compiles parsed conditions into sparse keyword and bonus match matrices.
+
+    Args:
+        conditions: Parsed conditions as returned by ``parse_knowledge_base``.
+        keyword_map: ``KeywordMappings`` providing the questionnaire keywords.
+        config: ``Config`` providing the per-category weights and matching mode.
+
+    Returns:
+        CompiledKnowledgeBase: The compiled matrices.
+    """
+    columns = []
+    column_lookup = np.full(
+        (len(SCORING_CATEGORIES), len(keyword_map.vocabulary)), -1, dtype=np.int64
+    )
+    for pos, (field, weight_attr, _) in enumerate(SCORING_CATEGORIES):
+        for kw_id in keyword_map.field_keyword_ids[field].tolist():
+            column_lookup[pos, kw_id] = len(columns)
+            columns.append((pos, kw_id, getattr(config, weight_attr)))
+
+    keyword_index = build_keyword_index(
+        conditions, keyword_map.vocabulary, config.KEYWORD_MATCHING
+    )
+    keyword_hits = [keyword_index[kw] for kw in keyword_map.vocabulary]
+    column_hits = [keyword_hits[kw_id] for _, kw_id, _ in columns]
+    indptr, indices = _csr_from_columns(column_hits, len(conditions))
+    column_indptr, column_rows = _csc_from_columns(column_hits)
+
+    bonus_table = build_bonus_table(
+        conditions, keyword_map.specific_keyword_bonus_map, config.KEYWORD_MATCHING
+    )
+    bonus_hits = [rows for _, rows in bonus_table]
+    bonus_indptr, bonus_indices = _csr_from_columns(bonus_hits, len(conditions))
+    bonus_column_indptr, bonus_column_rows = _csc_from_columns(bonus_hits)
+
+    name_slots = {}
+    name_ids = np.array(
+        [name_slots.setdefault(c["name"], len(name_slots)) for c in conditions],
+        dtype=np.int64,
+    )
+    name_counts = np.bincount(name_ids, minlength=len(name_slots))
+
+    return CompiledKnowledgeBase(
+        num_conditions=len(conditions),
+        column_lookup=column_lookup,
+        option_columns=[
+            {
+                option: column_lookup[pos, kw_ids].astype(np.int64)
+                for option, kw_ids in keyword_map.option_keyword_arrays[field].items()
+            }
+            for pos, (field, _, _) in enumerate(SCORING_CATEGORIES)
+        ],
+        column_weights=np.array([w for _, _, w in columns], dtype=np.float64),
+        column_categories=np.array([pos for pos, _, _ in columns], dtype=np.int64),
+        indptr=indptr,
+        indices=indices,
+        column_indptr=column_indptr,
+        column_rows=column_rows,
+        keyword_hits=keyword_hits,
+        bonus_entries=[entry for entry, _ in bonus_table],
+        bonus_table=bonus_table,
+        bonus_indptr=bonus_indptr,
+        bonus_indices=bonus_indices,
+        bonus_column_indptr=bonus_column_indptr,
+        bonus_column_rows=bonus_column_rows,
+        name_ids=name_ids,
+        num_names=len(name_slots),
+        has_duplicate_names=len(name_slots) < len(conditions),
+        duplicate_rows=np.flatnonzero(name_counts[name_ids] > 1),
+    )
+
+
+def _rows_by_name(final_scores, compiled):
+    """
+    Picks the rows to report for a score vector, one per condition name.
+
+    Results are keyed by condition name like the reference engine, so a
+    duplicated name reports its last positive score at the position of its
+    first positive occurrence.
+
+    Returns:
+        tuple: ``(rows, positions)`` arrays; ``positions`` orders ties.
+    """
+    rows = np.flatnonzero(final_scores > 0)
+    if not compiled.has_duplicate_names:
+        return rows, rows
+    name_ids = compiled.name_ids[rows]
+    first = np.full(compiled.num_names, compiled.num_conditions, dtype=np.int64)
+    last = np.full(compiled.num_names, -1, dtype=np.int64)
+    np.minimum.at(first, name_ids, rows)
+    np.maximum.at(last, name_ids, rows)
+    present = last >= 0
+    return last[present], first[present]
+
+
+def top_k_order(values, positions, limit=None):
+    """
+    Returns the indices of the ``limit`` best entries, best first.
+
+    Entries are ordered by value descending, then position ascending. With a
+    limit, ``np.partition`` finds the cut-off value so only the selected
+    entries (plus ties at the cut-off) are sorted.
+    """
+    selected = np.arange(len(values))
+    if limit is not None and limit <= 0:
+        return selected[:0]
+    if limit is not None and limit < len(values):
+        cutoff = -np.partition(-values, limit - 1)[limit - 1]
+        above = np.flatnonzero(values > cutoff)
+        tied = np.flatnonzero(values == cutoff)
+        tied = tied[np.argsort(positions[tied], kind="stable")][: limit - len(above)]
+        selected = np.concatenate([above, tied])
+    return selected[np.lexsort((positions[selected], -values[selected]))]
+
+
+def _kth_largest(values, k):
+    return -np.partition(-values, k - 1)[k - 1]
+
+
+def max_score_top_k(term_weights, term_rows, num_rows, limit, min_score, duplicate_rows):
+    """
+    Scores only the conditions that can still appear in a top-k result.
+
+    Each term (a selected keyword column, the history bonus or a specific
+    keyword bonus) adds its weight to the sorted condition rows it lists, so
+    a condition gains at most the summed weight of the terms not applied yet.
+    Terms are applied heaviest first; once that remaining bound falls below
+    the k-th best partial score (or ``min_score``), conditions no term has
+    touched cannot qualify. The remaining terms then only update the
+    surviving candidates, found in their posting lists by binary search.
+
+    Rows of duplicated condition names are always scored exactly, since a
+    duplicated name reports its last positive row; for the same reason they
+    do not count towards the k-th best bound.
+
+    Args:
+        term_weights: float64 array of non-negative term weights.
+        term_rows: Sorted int64 row arrays, one per term.
+        num_rows: Number of conditions.
+        limit: Number of results wanted, or None.
+        min_score: Minimum score a result must reach, or None.
+        duplicate_rows: Rows whose condition name is not unique.
+
+    Returns:
+        np.ndarray: float64 scores per condition; exact for every row that
+        can be ranked within ``limit``/``min_score``, 0 for pruned rows.
+    """
+    order = np.argsort(-term_weights, kind="stable")
+    weights = term_weights[order]
+    remaining = np.zeros(len(weights) + 1)
+    remaining[:-1] = np.cumsum(weights[::-1])[::-1]
+    # Enough partial scores for ``limit`` distinct names besides duplicates.
+    wanted = None if limit is None else limit + len(duplicate_rows)
+
+    partial = np.zeros(num_rows, dtype=np.float64)
+    threshold = min_score if min_score is not None else 0.0
+    # The bound check partitions all rows, so it is done at most once per
+    # ``num_rows`` postings applied.
+    work = num_rows
+    pos = 0
+    while pos < len(order):
+        # No partial score exceeds the weight applied so far.
+        if (
+            wanted is not None
+            and wanted <= num_rows
+            and remaining[pos] < remaining[0] - remaining[pos]
+            and work >= num_rows
+        ):
+            threshold = max(threshold, _kth_largest(partial, wanted))
+            work = 0
+        if threshold > 0 and remaining[pos] < threshold:
+            break
+        rows = term_rows[order[pos]]
+        partial[rows] += weights[pos]
+        work += len(rows)
+        pos += 1
+    else:
+        return partial
+
+    keep = partial + remaining[pos] >= threshold
+    keep[duplicate_rows] = True
+    candidates = np.flatnonzero(keep)
+    scores = partial[candidates]
+    for weight, term in zip(weights[pos:], order[pos:]):
+        rows = term_rows[term]
+        slots = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+        scores += np.where(rows[slots] == candidates, weight, 0.0)
+    final_scores = np.zeros(num_rows, dtype=np.float64)
+    final_scores[candidates] = scores
+    return final_scores
+
+
+class VectorizedScoringEngine(ScoringEngine):
+    """
+    ScoringEngine backend that scores with sparse matrix-vector products.
+
+    Produces the same scores and rankings as ``ScoringEngine``.
+    """
+
+    def _index_knowledge_base(self, conditions_db):
+        """Compiles ``conditions_db`` into sparse match matrices."""
+        compiled = compile_knowledge_base(conditions_db, self.keyword_map, self.config)
+        # The keyword and bonus matches are shared with ScoringEngine.explain_scores.
+        return index_knowledge_base(
+            conditions_db, compiled.keyword_hits, compiled.bonus_table, compiled
+        )
+
+    def compiled_kb(self, conditions_db):
+        """Returns the CompiledKnowledgeBase (sparse match matrices) of ``conditions_db``."""
+        return self._kb_for(conditions_db).compiled
+
+    def patient_columns(self, patient_input, conditions_db):
+        """
+        Builds one patient's score inputs for ``compiled_kb(conditions_db)``.
+
+        Returns:
+            tuple: ``(column weights, history row mask, bonus weights)``; the
+            scores are ``csr_matmat`` of the keyword and bonus matrices with
+            the weights, plus the history bonus on the masked rows.
+        """
+        return self._patient_columns(self._kb_for(conditions_db), patient_input)
+
+    def _patient_columns(self, kb, patient_input):
+        """Builds one patient's keyword column weights, history mask and bonus weights."""
+        compiled = kb.compiled
+        column_weights = np.zeros(len(compiled.column_weights), dtype=np.float64)
+        selected = [
+            compiled.option_columns[pos][option]
+            for pos, (field, _, _) in enumerate(SCORING_CATEGORIES)
+            for option in self.keyword_map.selected_options(field, patient_input.get(field))
+        ]
+        if selected:
+            cols = np.concatenate(selected)
+            column_weights[cols] = compiled.column_weights[cols]
+
+        history = np.zeros(compiled.num_conditions, dtype=bool)
+        history_rows = kb.name_index.rows_for(
+            reported_diagnoses(patient_input.get("past_diagnoses"))
+        )
+        if history_rows:
+            history[list(history_rows)] = True
+
+        bonus_weights = np.array(
+            [
+                bonus_val
+                if option_selected(patient_input.get(input_cat_key), req_input_opt)
+                else 0.0
+                for _, input_cat_key, req_input_opt, bonus_val in compiled.bonus_entries
+            ],
+            dtype=np.float64,
+        )
+        return column_weights, history, bonus_weights
+
+    def _patient_terms_arrays(self, kb, patient_input):
+        """Returns one patient's ``(term weights, sorted row arrays)`` for top-k pruning."""
+        compiled = kb.compiled
+        column_weights, history, bonus_weights = self._patient_columns(kb, patient_input)
+        weights = []
+        rows = []
+        for col in np.flatnonzero(column_weights):
+            weights.append(column_weights[col])
+            rows.append(
+                compiled.column_rows[compiled.column_indptr[col] : compiled.column_indptr[col + 1]]
+            )
+        for col in np.flatnonzero(bonus_weights):
+            weights.append(bonus_weights[col])
+            rows.append(
+                compiled.bonus_column_rows[
+                    compiled.bonus_column_indptr[col] : compiled.bonus_column_indptr[col + 1]
+                ]
+            )
+        if history.any():
+            weights.append(self.config.BONUS_HISTORY_NAME_MATCH)
+            rows.append(np.flatnonzero(history))
+        # Keywords that match no condition add nothing.
+        kept = [i for i, term in enumerate(rows) if len(term)]
+        return np.array([weights[i] for i in kept], dtype=np.float64), [rows[i] for i in kept]
+
+    def score_top_k(self, patient_input, conditions_db, limit=None, min_score=None):
+        """
+        Scores with MaxScore pruning (see ``max_score_top_k``).
+
+        Returns:
+            np.ndarray: Per-condition scores, exact for every condition that
+            can be ranked within ``limit``/``min_score`` and 0 otherwise.
+        """
+        kb = self._kb_for(conditions_db)
+        compiled = kb.compiled
+        weights, rows = self._patient_terms_arrays(kb, patient_input)
+        if (weights < 0).any():
+            # Upper bounds only hold when no term can lower a score.
+            return self.score_vector(patient_input, conditions_db)
+        return max_score_top_k(
+            weights, rows, compiled.num_conditions, limit, min_score, compiled.duplicate_rows
+        )
+
+    def score_matrix(self, patient_inputs, conditions_db):
+        """
+        Scores several patients at once.
+
+        Returns:
+            np.ndarray: float64 array of shape ``(num_conditions, len(patient_inputs))``
+            holding the final score of every condition for every patient.
+        """
+        kb = self._kb_for(conditions_db)
+        compiled = kb.compiled
+        num_patients = len(patient_inputs)
+        column_weights = np.zeros((len(compiled.column_weights), num_patients))
+        history = np.zeros((compiled.num_conditions, num_patients), dtype=bool)
+        bonus_weights = np.zeros((len(compiled.bonus_entries), num_patients))
+        for j, patient_input in enumerate(patient_inputs):
+            column_weights[:, j], history[:, j], bonus_weights[:, j] = (
+                self._patient_columns(kb, patient_input)
+            )
+
+        keyword_scores = csr_matmat(compiled.indptr, compiled.indices, column_weights)
+        keyword_scores += history * self.config.BONUS_HISTORY_NAME_MATCH
+        bonus_scores = csr_matmat(
+            compiled.bonus_indptr, compiled.bonus_indices, bonus_weights
+        )
+        return keyword_scores + bonus_scores
+
+    def score_vector(self, patient_input, conditions_db):
+        """Returns the final score of every condition as a float64 array."""
+        return self.score_matrix([patient_input], conditions_db)[:, 0]
+
+    def rank_scores(self, final_scores, conditions_db, limit=None, min_score=None):
+        """Ranks a per-condition score array with NumPy top-k selection."""
+        final_scores = np.asarray(final_scores, dtype=np.float64)
+        compiled = self._kb_for(conditions_db).compiled
+        rows, positions = _rows_by_name(final_scores, compiled)
+        values = final_scores[rows]
+        if min_score is not None:
+            keep = values >= min_score
+            rows, positions, values = rows[keep], positions[keep], values[keep]
+        order = top_k_order(values, positions, limit)
+        return [(conditions_db[rows[i]]["name"], float(values[i])) for i in order]
+
+    def calculate_scores(self, patient_input, conditions_db, limit=None, min_score=None):
+        """Calculates scores with sparse mat-vecs; same output as ScoringEngine."""
+        if (limit is not None or min_score is not None) and (
+            len(conditions_db) >= self.config.TOP_K_PRUNING_MIN_CONDITIONS
+        ):
+            # Pruning pays off only when the knowledge base is large.
+            final_scores = self.score_top_k(patient_input, conditions_db, limit, min_score)
+        else:
+            final_scores = self.score_vector(patient_input, conditions_db)
+        return self.rank_scores(final_scores, conditions_db, limit, min_score)
+
+    def calculate_scores_batch(
+        self, patient_inputs, conditions_db, limit=None, min_score=None
+    ):
+        """Scores all patients with one sparse matrix-matrix product per matrix."""
+        if not patient_inputs:
+            return []
+        final_scores = self.score_matrix(patient_inputs, conditions_db)
+        return [
+            self.rank_scores(final_scores[:, j], conditions_db, limit, min_score)
+            for j in range(len(patient_inputs))
+        ]
@@ -0,0 +1,206 @@
+"""
+Offline evaluation of the symptom scoring engine on labeled cases.
+
+Streams a JSONL file of labeled cases (``{"answers": {...}, "diagnosis":
+"<condition name>"}`` per line) through the scoring engine in a pool of
+worker processes and reports top-k accuracy, mean reciprocal rank, a
+per-category confusion table of the top-1 suggestion and throughput. Lines
+are read and dispatched in chunks with a bounded number in flight, so memory
+does not grow with the size of the case file.
+
+Usage:
+    python -m api.evaluate cases.jsonl --workers 8 --k 1 --k 5 --json
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import dataclasses
+import itertools
+import json
+import os
+import time
+
+from api.core.config import Config
+from api.core.kb_loader import read_knowledge_base
+from api.core.keywords import KeywordMappings
+from api.core.scoring_service import compile_scoring_plan
+
+# Worker process state, see _init_worker.
+_plan = None
+
+# Category reported when the engine suggests nothing.
+NO_SUGGESTION = "None"
+
+
+def _init_worker(config):
+    """Process pool initializer: compiles the scoring plan once per worker."""
+    global _plan
+    conditions = read_knowledge_base()
+    _plan = compile_scoring_plan(
+        config, KeywordMappings(config.BONUS_SPECIFIC_KEYWORD), conditions
+    )
+
+
+def _evaluate_lines(lines):
+    """
+    Scores a chunk of raw case lines.
+
+    Returns:
+        list: ``(rank, true category, predicted category)`` per case; rank is
+        1-based and 0 when the diagnosis is not suggested. Cases whose
+        diagnosis is not in the knowledge base have a true category of None.
+    """
+    outcomes = []
+    for line in lines:
+        case = json.loads(line)
+        diagnosis = case["diagnosis"]
+        condition = _plan.condition_index.get(diagnosis)
+        if condition is None:
+            outcomes.append((0, None, None))
+            continue
+        results = _plan.engine.calculate_scores(case["answers"], _plan.conditions)
+        names = [name for name, _ in results]
+        rank = names.index(diagnosis) + 1 if diagnosis in names else 0
+        predicted = (
+            _plan.condition_index[names[0]]["category"] if names else NO_SUGGESTION
+        )
+        outcomes.append((rank, condition["category"], predicted))
+    return outcomes
+
+
+def read_case_chunks(path, chunk_size):
+    """Yields lists of up to ``chunk_size`` non-blank lines of ``path``."""
+    with open(path, encoding="utf-8") as handle:
+        lines = (line for line in handle if line.strip())
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+@dataclasses.dataclass
+class EvaluationReport:
+    """Running totals of an evaluation."""
+
+    k_values: tuple = (1, 3, 5, 10)
+    cases: int = 0
+    unknown_labels: int = 0
+    reciprocal_rank_sum: float = 0.0
+    hits: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    # (true category, predicted top-1 category) -> cases
+    confusion: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    elapsed_seconds: float = 0.0
+
+    def add(self, rank, true_category, predicted_category):
+        """Adds one case outcome as returned by the workers."""
+        if true_category is None:
+            self.unknown_labels += 1
+            return
+        self.cases += 1
+        if rank:
+            self.reciprocal_rank_sum += 1.0 / rank
+            for k in self.k_values:
+                if rank <= k:
+                    self.hits[k] += 1
+        self.confusion[true_category, predicted_category] += 1
+
+    def accuracy(self, k):
+        """Share of cases whose diagnosis is within the top ``k`` suggestions."""
+        return self.hits[k] / self.cases if self.cases else 0.0
+
+    @property
+    def mean_reciprocal_rank(self):
+        return self.reciprocal_rank_sum / self.cases if self.cases else 0.0
+
+    @property
+    def throughput(self):
+        """Evaluated cases per second."""
+        total = self.cases + self.unknown_labels
+        return total / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def as_dict(self):
+        """Returns the report as a JSON-serialisable dict."""
+        confusion = collections.defaultdict(dict)
+        for (true_category, predicted), count in sorted(self.confusion.items()):
+            confusion[true_category][predicted] = count
+        return {
+            "cases": self.cases,
+            "unknown_labels": self.unknown_labels,
+            "top_k_accuracy": {str(k): self.accuracy(k) for k in self.k_values},
+            "mean_reciprocal_rank": self.mean_reciprocal_rank,
+            "confusion": dict(confusion),
+            "elapsed_seconds": self.elapsed_seconds,
+            "cases_per_second": self.throughput,
+        }
+
+    def format(self):
+        """Returns the report as human-readable text."""
+        lines = [
+            f"Cases: {self.cases} ({self.unknown_labels} with unknown diagnoses skipped)",
+            *(f"Top-{k} accuracy: {self.accuracy(k):.3f}" for k in self.k_values),
+            f"Mean reciprocal rank: {self.mean_reciprocal_rank:.3f}",
+            f"Throughput: {self.throughput:.0f} cases/s",
+            "Top-1 category confusion (true -> predicted: cases):",
+        ]
+        for (true_category, predicted), count in sorted(self.confusion.items()):
+            lines.append(f"  {true_category} -> {predicted}: {count}")
+        return "\n".join(lines)
+
+
+def evaluate(cases_path, workers=None, chunk_size=500, k_values=(1, 3, 5, 10), config=None):
+    """
+    Evaluates the scoring engine on every case in ``cases_path``.
+
+    Args:
+        cases_path: JSONL file of labeled cases.
+        workers (int): Worker processes (default: CPU count).
+        chunk_size (int): Cases sent to a worker at a time.
+        k_values: Cut-offs reported as top-k accuracy.
+        config (Config): Scoring configuration (default: ``Config.from_env()``).
+
+    Returns:
+        EvaluationReport: The aggregated metrics.
+    """
+    config = config or Config.from_env()
+    workers = workers or os.cpu_count() or 1
+    report = EvaluationReport(k_values=tuple(k_values))
+    started = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(config,)
+    ) as pool:
+        # At most two chunks per worker are read ahead of the results.
+        pending = collections.deque()
+        for chunk in read_case_chunks(cases_path, chunk_size):
+            pending.append(pool.submit(_evaluate_lines, chunk))
+            if len(pending) >= 2 * workers:
+                for outcome in pending.popleft().result():
+                    report.add(*outcome)
+        while pending:
+            for outcome in pending.popleft().result():
+                report.add(*outcome)
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("cases", help="JSONL file of labeled cases")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument(
+        "--k", type=int, action="append", dest="k_values",
+        help="top-k cut-off to report (repeatable, default 1 3 5 10)",
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = evaluate(
+        args.cases, args.workers, args.chunk_size, args.k_values or (1, 3, 5, 10)
+    )
+    print(json.dumps(report.as_dict(), indent=2) if args.json else report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,94 @@
 # api/main.py
-from fastapi import FastAPI, HTTPException, Request
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from api.core.kb_loader import *
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from api.core.config import Config
-from api.core.scoring_service import ScoringEngine
+from api.core.scoring_service import ScoringPlan, compile_scoring_plan
 from api.core.keywords import KeywordMappings
+from api.core.result_cache import (
+    ScoreCache,
+    cached_calculate_scores,
+    cached_calculate_scores_batch,
+)
+from api.core.scoring_executor import BoundedScoringExecutor, ScoringSaturated
+from api.core.sessions import SessionStore
+from api.core.fusion import CategoryFusion
+from api.core.kb_watcher import KnowledgeBaseWatcher
 import asyncio
+import base64
+import binascii
 
 
 # Create an instance of the FastAPI class
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    config = Config.from_env()
+    app.state.kb_watcher = KnowledgeBaseWatcher()
+    # Taken before the read: an edit during startup still counts as a change.
+    kb_signature = app.state.kb_watcher.signature()
     try:
-        knowledge_loaded = await load_knowledge()
+        knowledge_loaded, kb_source = await load_knowledge_with_source(
+            config.KB_PARSE_WORKERS
+        )
         print(f"Loaded {len(knowledge_loaded)} conditions")
     except Exception as e:
-        knowledge_loaded = []
+        knowledge_loaded, kb_source = [], None
         print(f"Failed to load knowledge: {e}")
 
-    app.state.conditions_database = knowledge_loaded
-
-    config = Config()
     keyword_mappings = KeywordMappings(config.BONUS_SPECIFIC_KEYWORD)
-    scoringEngine = ScoringEngine(config, keyword_mappings)
-    app.state.scoringEngine = scoringEngine
+    app.state.scoring_plan = compile_scoring_plan(
+        config, keyword_mappings, knowledge_loaded
+    )
+    print(f"Scoring backend: {config.SCORING_BACKEND}")
+    app.state.score_cache = ScoreCache(
+        config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL_SECONDS
+    )
+    app.state.session_store = SessionStore(
+        config.SESSION_STORE_SIZE, config.SESSION_TTL_SECONDS
+    )
+    app.state.scoring_executor = BoundedScoringExecutor(
+        config.SCORING_WORKERS,
+        config.SCORING_QUEUE_LIMIT,
+        config.SCORING_RETRY_AFTER_SECONDS,
+    )
+    # The image model is optional: without it /diagnose answers 503.
+    app.state.inference_service = None
+    app.state.category_fusion = None
+    try:
+        from api.core.inference_service import create_inference_service
+
+        inference_service = await asyncio.to_thread(create_inference_service, config)
+        app.state.inference_service = inference_service
+        app.state.category_fusion = CategoryFusion(
+            inference_service.class_names, config.FUSION_IMAGE_WEIGHT
+        )
+        # Precompute the class of every condition's category.
+        app.state.category_fusion.row_classes(knowledge_loaded)
+        unmapped = app.state.category_fusion.unmapped_categories(knowledge_loaded)
+        if unmapped:
+            print(f"KB categories without an image class: {unmapped}")
+    except Exception as e:
+        print(f"Image model not available: {e}")
+    await asyncio.to_thread(
+        app.state.kb_watcher.prime, knowledge_loaded, kb_source, kb_signature
+    )
+    watch_task = None
+    if config.KB_WATCH_INTERVAL_SECONDS > 0:
+        watch_task = asyncio.create_task(
+            app.state.kb_watcher.watch(
+                config.KB_WATCH_INTERVAL_SECONDS,
+                lambda conditions: reload_scoring_plan(app, conditions),
+            )
+        )
     print("Application lifespan complete.")
     yield
+    if watch_task is not None:
+        watch_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await watch_task
+    app.state.scoring_executor.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -40,6 +102,60 @@ app.add_middleware(
 )
 
 
+async def reload_scoring_plan(app: FastAPI, conditions=None):
+    """
+    Compiles a new scoring plan in a worker thread and swaps it in.
+
+    Requests already running keep the plan they started with; later requests
+    see the new one. The knowledge base is re-read unless ``conditions`` is
+    given.
+
+    Returns:
+        ScoringPlan: The plan now in use.
+    """
+    current: ScoringPlan = app.state.scoring_plan
+    if conditions is None:
+        conditions = await load_knowledge(current.engine.config.KB_PARSE_WORKERS)
+    plan = await asyncio.to_thread(
+        compile_scoring_plan,
+        current.engine.config,
+        current.engine.keyword_map,
+        conditions,
+    )
+    fusion = getattr(app.state, "category_fusion", None)
+    if fusion is not None:
+        fusion.row_classes(plan.conditions)
+    # A single attribute assignment: handlers read either plan, never a mix.
+    app.state.scoring_plan = plan
+    return plan
+
+
+def current_plan(request: Request) -> ScoringPlan:
+    """Returns the scoring plan for this request, failing if no KB is loaded."""
+    plan: ScoringPlan = request.app.state.scoring_plan
+    if not plan.conditions:
+        raise HTTPException(status_code=500, detail="Knowledge base not loaded.")
+    return plan
+
+
+async def run_scoring(request: Request, func, *args):
+    """
+    Runs a synchronous scoring call on the bounded scoring executor.
+
+    Keeps CPU-bound scoring off the event loop; answers 503 with a
+    Retry-After header when the executor's queue is full.
+    """
+    executor: BoundedScoringExecutor = request.app.state.scoring_executor
+    try:
+        return await executor.run(func, *args)
+    except ScoringSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Scoring service is busy, retry later.",
+            headers={"Retry-After": str(e.retry_after_seconds)},
+        )
+
+
 # Define a path operation decorator for a GET request to the root URL "/"
 @app.get("/")
 def read_root():
@@ -50,13 +166,47 @@ def read_root():
     return {"message": "Dermatology AI API is running"}
 
 
+def build_suggestions(results, condition_index):
+    """Formats ``(condition name, score)`` pairs for the API response."""
+    response_data = []
+    for condition_name, score in results:
+        condition_entry = condition_index.get(condition_name)
+        category = condition_entry["category"] if condition_entry else "Unknown"
+        response_data.append(
+            {
+                "condition": condition_name,
+                "score": round(score, 1),
+                "category": category,
+            }
+        )
+    return response_data
+
+
+def add_explanations(suggestions, explanations):
+    """Attaches ``engine.explain_scores`` output to formatted suggestions."""
+    for suggestion in suggestions:
+        explanation = explanations.get(suggestion["condition"])
+        if explanation:
+            suggestion["explanation"] = explanation
+
+
 @app.post("/suggest_conditions")
-async def suggest_conditions(request: Request):
-    conditions_database = request.app.state.conditions_database
-    engine: ScoringEngine = request.app.state.scoringEngine
+async def suggest_conditions(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    min_score: Optional[float] = Query(None),
+    explain: bool = Query(False),
+):
+    """
+    Scores one patient's answers against the knowledge base.
 
-    if not conditions_database:
-        raise HTTPException(status_code=500, detail="Knowledge base not loaded.")
+    ``limit`` returns only the top results and ``min_score`` drops results
+    scoring below it; both are applied inside the engine. With ``explain``
+    each returned suggestion also carries its matched keywords and per
+    category score breakdown.
+    """
+    plan = current_plan(request)
+    engine = plan.engine
 
     try:
         patient_answers = await request.json()
@@ -66,31 +216,293 @@ async def suggest_conditions(request: Request):
     if not patient_answers:
         raise HTTPException(status_code=400, detail="No patient answers provided.")
 
-    try:
-        print("Calculating scores...")
-        results = engine.calculate_scores(patient_answers, conditions_database)
-        print(f"Top results: {results[:5]}")
-        response_data = []
-        for condition_name, score in results:
-            condition_entry = next(
-                (c for c in conditions_database if c["name"] == condition_name), None
+    def score():
+        results = cached_calculate_scores(
+            engine,
+            request.app.state.score_cache,
+            patient_answers,
+            plan.conditions,
+            limit,
+            min_score,
+        )
+        suggestions = build_suggestions(results, plan.condition_index)
+        if explain:
+            add_explanations(
+                suggestions,
+                engine.explain_scores(patient_answers, plan.conditions, results),
             )
-            category = condition_entry["category"] if condition_entry else "Unknown"
-            response_data.append(
-                {
-                    "condition": condition_name,
-                    "score": round(score, 1),
-                    "category": category,
-                }
+        return {"suggestions": suggestions}
+
+    try:
+        return await run_scoring(request, score)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+
+
+@app.post("/suggest_conditions/batch")
+async def suggest_conditions_batch(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    min_score: Optional[float] = Query(None),
+    explain: bool = Query(False),
+):
+    """
+    Scores a list of patient answer dicts in one call.
+
+    The request body is a JSON array of the same answer objects accepted by
+    /suggest_conditions; results are returned in input order. ``limit``,
+    ``min_score`` and ``explain`` apply to every patient.
+    """
+    plan = current_plan(request)
+    engine = plan.engine
+
+    try:
+        patients = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Request must be JSON.")
+
+    if not isinstance(patients, list) or not patients:
+        raise HTTPException(
+            status_code=400, detail="Request must be a non-empty list of patient answers."
+        )
+    if len(patients) > engine.config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {engine.config.MAX_BATCH_SIZE} patients).",
+        )
+    if not all(isinstance(p, dict) and p for p in patients):
+        raise HTTPException(
+            status_code=400, detail="Every batch entry must be a non-empty object."
+        )
+
+    def score():
+        batch_results = cached_calculate_scores_batch(
+            engine,
+            request.app.state.score_cache,
+            patients,
+            plan.conditions,
+            limit,
+            min_score,
+        )
+        response = []
+        for patient, results in zip(patients, batch_results):
+            suggestions = build_suggestions(results, plan.condition_index)
+            if explain:
+                add_explanations(
+                    suggestions,
+                    engine.explain_scores(patient, plan.conditions, results),
+                )
+            response.append({"suggestions": suggestions})
+        return {"results": response}
+
+    try:
+        return await run_scoring(request, score)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+
+
+@app.post("/diagnose")
+async def diagnose(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    min_score: Optional[float] = Query(None),
+    top_k: int = Query(3, ge=1),
+):
+    """
+    Ranks conditions from a skin image and questionnaire answers together.
+
+    The body is ``{"image": "<base64 image file>", "answers": {...}}`` with
+    answers in the /suggest_conditions format. Symptom scores are boosted by
+    the image model's probability for each condition's category (see
+    ``CategoryFusion.fuse``). The response holds the fused ``suggestions``
+    and the model's ``top_k`` ``image_predictions``.
+    """
+    plan = current_plan(request)
+    inference_service = request.app.state.inference_service
+    fusion: CategoryFusion = request.app.state.category_fusion
+    if inference_service is None or fusion is None:
+        raise HTTPException(status_code=503, detail="Image model not loaded.")
+
+    try:
+        body = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Request must be JSON.")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Request must be a JSON object.")
+    answers = body.get("answers")
+    if not isinstance(answers, dict) or not answers:
+        raise HTTPException(status_code=400, detail="No patient answers provided.")
+    try:
+        image_bytes = base64.b64decode(body.get("image") or "", validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Image must be base64 encoded.")
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="No image provided.")
+
+    def score():
+        try:
+            image = inference_service.load_image(image_bytes)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        probabilities = inference_service.predict_probabilities(image)
+        symptom_scores = plan.engine.score_vector(answers, plan.conditions)
+        fused = fusion.fuse(symptom_scores, probabilities, plan.conditions)
+        results = plan.engine.rank_scores(fused, plan.conditions, limit, min_score)
+        return {
+            "suggestions": build_suggestions(results, plan.condition_index),
+            "image_predictions": inference_service.top_predictions(probabilities, top_k),
+        }
+
+    try:
+        return await run_scoring(request, score)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+
+
+async def read_session_changes(request: Request, allow_empty=False):
+    """Reads a JSON object of answer changes from the request body."""
+    body = await request.body()
+    if not body and allow_empty:
+        return {}
+    try:
+        changes = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Request must be JSON.")
+    if not isinstance(changes, dict) or not (changes or allow_empty):
+        raise HTTPException(
+            status_code=400, detail="Request must be a non-empty object of answers."
+        )
+    return changes
+
+
+def get_session(request: Request, session_id: str):
+    session = request.app.state.session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    return session
+
+
+def session_response(plan: ScoringPlan, session, limit, min_score, explain, changes=None):
+    """
+    Applies ``changes`` to a session, then ranks its current answers into a
+    /suggest_conditions style response.
+    """
+    try:
+        if changes:
+            session.update(plan.engine, plan.conditions, changes)
+        results = session.ranking(plan.engine, plan.conditions, limit, min_score)
+        suggestions = build_suggestions(results, plan.condition_index)
+        if explain:
+            add_explanations(
+                suggestions,
+                plan.engine.explain_scores(session.snapshot(), plan.conditions, results),
             )
-        return {"suggestions": response_data}
+        return {"session_id": session.session_id, "suggestions": suggestions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
 
 
+@app.post("/sessions", status_code=201)
+async def create_session(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    min_score: Optional[float] = Query(None),
+    explain: bool = Query(False),
+):
+    """
+    Starts an incremental scoring session.
+
+    The optional body holds initial answers in the /suggest_conditions format.
+    Returns the new ``session_id`` and the ranking for those answers.
+    """
+    plan = current_plan(request)
+    changes = await read_session_changes(request, allow_empty=True)
+    store: SessionStore = request.app.state.session_store
+
+    def score():
+        # Created on the executor, so a saturated executor (503) leaves no session.
+        return session_response(plan, store.create(), limit, min_score, explain, changes)
+
+    return await run_scoring(request, score)
+
+
+@app.patch("/sessions/{session_id}")
+async def update_session(
+    session_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    min_score: Optional[float] = Query(None),
+    explain: bool = Query(False),
+):
+    """
+    Changes some of a session's answers and returns the new ranking.
+
+    The body maps request keys to their new answers; ``null`` removes an
+    answer. Only the changed fields are rescored.
+    """
+    plan = current_plan(request)
+    session = get_session(request, session_id)
+    changes = await read_session_changes(request)
+    return await run_scoring(
+        request, session_response, plan, session, limit, min_score, explain, changes
+    )
+
+
+@app.get("/sessions/{session_id}")
+async def get_session_ranking(
+    session_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    min_score: Optional[float] = Query(None),
+    explain: bool = Query(False),
+):
+    """Returns the ranking for a session's current answers."""
+    plan = current_plan(request)
+    session = get_session(request, session_id)
+    return await run_scoring(
+        request, session_response, plan, session, limit, min_score, explain
+    )
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, request: Request):
+    """Ends a session."""
+    if not request.app.state.session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    return {"deleted": session_id}
+
+
 @app.get("/health_kb")
 async def health_check_kb():
-    conditions_database = app.state.conditions_database
+    plan: ScoringPlan = app.state.scoring_plan
+
+    status = "ok" if plan.conditions else "knowledge base not loaded"
+    return {
+        "status": status,
+        "conditions_loaded": len(plan.conditions),
+        "kb_fingerprint": plan.version[0],
+    }
+
+
+@app.get("/health_cache")
+async def health_check_cache():
+    """Reports the scoring result cache counters."""
+    return app.state.score_cache.stats()
+
+
+@app.get("/health_sessions")
+async def health_check_sessions():
+    """Reports the scoring session store counters."""
+    return app.state.session_store.stats()
+
 
-    status = "ok" if conditions_database else "knowledge base not loaded"
-    return {"status": status, "conditions_loaded": len(conditions_database)}
+@app.get("/health_scoring")
+async def health_check_scoring():
+    """Reports the scoring executor's running, queued and rejected calls."""
+    return app.state.scoring_executor.stats()
@@ -0,0 +1,20 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import pytest
+
+from api.core.config import Config
+from api.core.keywords import KeywordMappings
+from api.core.kb_loader import knowledge_base_file, parse_knowledge_base
+
+
+@pytest.fixture(scope="session")
+def conditions():
+    """Parse the bundled knowledge base once for the whole session."""
+    return parse_knowledge_base(knowledge_base_file.read_text(encoding="utf-8"))
+
+
+@pytest.fixture(scope="session")
+def keyword_map():
+    return KeywordMappings(Config().BONUS_SPECIFIC_KEYWORD)
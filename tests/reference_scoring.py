@@ -0,0 +1,171 @@
+"""
+Reference implementation of the symptom scoring algorithm.
+
+This is the original, unoptimized ``ScoringEngine.calculate_scores`` loop
+(minus its debug logging). It scans every condition with a fresh regex per
+keyword, so it is slow, but it is the behaviour the optimized engines must
+reproduce exactly. Tests use it as an oracle for differential checks.
+"""
+
+import collections
+import functools
+import random
+import re
+
+EXCLUSIVE_PHRASES = {
+    "none of the above",
+    "nothing specific",
+    "prefer not to say",
+    "not sure",
+    "not spreading",
+    "unsure",
+    "other:",
+    "none",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _word_pattern(keyword):
+    return re.compile(r"\b" + re.escape(keyword) + r"\b", re.IGNORECASE)
+
+
+def reference_calculate_scores(config, keyword_map, patient_input, conditions_db):
+    """Scores ``conditions_db`` exactly like the original engine did."""
+    scores = collections.defaultdict(float)
+
+    def get_keywords(input_key, keyword_dict, is_multiple):
+        kws = set()
+        user_data = patient_input.get(input_key)
+        if not user_data:
+            return kws
+        if is_multiple:
+            if not isinstance(user_data, list):
+                return kws
+            options_to_process = user_data
+        else:
+            if not isinstance(user_data, str):
+                return kws
+            options_to_process = [user_data]
+
+        for opt in options_to_process:
+            if any(
+                ex_phrase in opt.lower()
+                for ex_phrase in EXCLUSIVE_PHRASES
+                if ex_phrase != "other:"
+            ) or opt.lower().startswith("other:"):
+                return kws
+
+        for option in options_to_process:
+            for key_option in keyword_dict.keys():
+                if key_option.lower() == option.lower():
+                    kws.update(keyword_dict[key_option])
+                    break
+        return kws
+
+    keyword_sets_and_weights = [
+        (get_keywords("symptoms", keyword_map.symptom_keywords, True), config.WEIGHT_SYMPTOM),
+        (get_keywords("location", keyword_map.location_keywords, True), config.WEIGHT_LOCATION),
+        (get_keywords("appearance", keyword_map.morphology_keywords, True), config.WEIGHT_MORPHOLOGY),
+        (get_keywords("general_symptoms", keyword_map.systemic_symptons_keywords, True), config.WEIGHT_SYSTEMIC),
+        (get_keywords("triggers", keyword_map.trigger_keywords, True), config.WEIGHT_TRIGGER),
+        (get_keywords("spread_arrangement", keyword_map.spread_pattern_keywords, False), config.WEIGHT_SPREAD_PATTERN),
+        (get_keywords("past_diagnoses", keyword_map.condition_keywords, True), config.WEIGHT_CONDITION),
+        (get_keywords("condition_duration", keyword_map.duration_keywords, False), config.WEIGHT_DURATION),
+        (get_keywords("age_range", keyword_map.age_keywords, False), config.WEIGHT_AGE),
+        (get_keywords("gender", keyword_map.gender_keywords, False), config.WEIGHT_GENDER),
+    ]
+
+    patient_med_cond_names = set()
+    med_cond_input = patient_input.get("past_diagnoses")
+    if isinstance(med_cond_input, list):
+        is_exclusive_selected = any(
+            (phrase == "other:" and mc.lower().startswith(phrase))
+            or (phrase != "other:" and phrase in mc.lower())
+            for mc in med_cond_input
+            for phrase in EXCLUSIVE_PHRASES
+        )
+        if not is_exclusive_selected:
+            patient_med_cond_names = {mc.lower() for mc in med_cond_input}
+
+    for condition in conditions_db:
+        name = condition["name"]
+        flags_text = condition["red_flags_text"]
+        current_score = 0.0
+
+        for kw_set, weight in keyword_sets_and_weights:
+            for kw in kw_set:
+                if _word_pattern(kw).search(flags_text):
+                    current_score += weight
+
+        condition_name_lower = name.lower()
+        for reported in patient_med_cond_names:
+            if reported in condition_name_lower or condition_name_lower in reported:
+                current_score += config.BONUS_HISTORY_NAME_MATCH
+                break
+
+        bonus_score = 0.0
+        for specific_kw, (input_cat_key, req_input_opt, bonus_val) in (
+            keyword_map.specific_keyword_bonus_map.items()
+        ):
+            if _word_pattern(specific_kw).search(flags_text):
+                user_input = patient_input.get(input_cat_key)
+                if isinstance(user_input, list):
+                    selected = any(req_input_opt.lower() == o.lower() for o in user_input)
+                elif isinstance(user_input, str):
+                    selected = req_input_opt.lower() == user_input.lower()
+                else:
+                    selected = False
+                if selected:
+                    bonus_score += bonus_val
+
+        final_score = current_score + bonus_score
+        if final_score > 0:
+            scores[name] = final_score
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def random_patients(keyword_map, conditions_db, count, seed=0):
+    """Generates ``count`` plausible (and some malformed) questionnaire answers."""
+    rng = random.Random(seed)
+    multiple = {
+        "symptoms": keyword_map.symptom_keywords,
+        "location": keyword_map.location_keywords,
+        "appearance": keyword_map.morphology_keywords,
+        "general_symptoms": keyword_map.systemic_symptons_keywords,
+        "triggers": keyword_map.trigger_keywords,
+        "past_diagnoses": keyword_map.condition_keywords,
+    }
+    single = {
+        "spread_arrangement": keyword_map.spread_pattern_keywords,
+        "condition_duration": keyword_map.duration_keywords,
+        "age_range": keyword_map.age_keywords,
+        "gender": keyword_map.gender_keywords,
+    }
+
+    def recase(option):
+        return rng.choice([option, option.lower(), option.upper()])
+
+    patients = []
+    for _ in range(count):
+        patient = {}
+        for field, options in multiple.items():
+            if rng.random() < 0.8:
+                chosen = rng.sample(list(options), rng.randint(1, 4))
+                patient[field] = [recase(o) for o in chosen]
+        for field, options in single.items():
+            if rng.random() < 0.8:
+                patient[field] = recase(rng.choice(list(options)))
+        if "past_diagnoses" in patient and rng.random() < 0.5:
+            patient["past_diagnoses"].append(rng.choice(conditions_db)["name"])
+        if rng.random() < 0.3:
+            # The bonus map is keyed by internal category names.
+            patient["morphology"] = rng.sample(list(keyword_map.morphology_keywords), 2)
+            patient["duration"] = rng.choice(list(keyword_map.duration_keywords))
+            patient["systemic_symptoms"] = rng.sample(
+                list(keyword_map.systemic_symptons_keywords), 2
+            )
+        if rng.random() < 0.05:
+            patient["symptoms"] = "pain"  # wrong type for a multiple choice field
+        patients.append(patient)
+    return patients
@@ -0,0 +1,152 @@
+"""
+Test suite for offline weight calibration.
+Validates that feature-based ranks match the scoring engine and that the
+searches evaluate and order weightings correctly.
+"""
+
+import dataclasses
+import json
+import random
+
+import numpy as np
+import pytest
+
+from api.calibrate import main, parse_grid
+from api.core.calibration import (
+    CALIBRATION_FIELDS,
+    CalibrationSet,
+    config_weights,
+    coordinate_search,
+    grid_search,
+    random_search,
+    read_labeled_cases,
+)
+from api.core.config import Config
+from api.core.keywords import KeywordMappings
+from api.core.scoring_service import ScoringEngine
+
+from .reference_scoring import random_patients
+
+
+def labeled_cases(keyword_map, conditions, config, count, seed):
+    """Labels random patients with one of their top results under ``config``."""
+    rng = random.Random(seed)
+    engine = ScoringEngine(config, KeywordMappings(config.BONUS_SPECIFIC_KEYWORD))
+    cases = []
+    for patient in random_patients(keyword_map, conditions, count, seed):
+        results = engine.calculate_scores(patient, conditions, limit=3)
+        if results:
+            cases.append((patient, rng.choice(results)[0]))
+    return cases
+
+
+def engine_rank(engine, patient, conditions, diagnosis):
+    names = [name for name, _ in engine.calculate_scores(patient, conditions)]
+    return names.index(diagnosis) + 1 if diagnosis in names else 0
+
+
+@pytest.fixture(scope="module")
+def cases(keyword_map, conditions):
+    return labeled_cases(keyword_map, conditions, Config(), 150, seed=8)
+
+
+@pytest.fixture(scope="module")
+def calibration_set(cases, conditions, keyword_map):
+    return CalibrationSet(cases, conditions, keyword_map)
+
+
+class TestCalibrationSet:
+    """Test cases for CalibrationSet."""
+
+    def test_ranks_match_engine(self, keyword_map, conditions):
+        rng = random.Random(3)
+        patients = random_patients(keyword_map, conditions, 60, seed=12)
+        # Arbitrary labels, including duplicated names and unranked diagnoses.
+        names = [c["name"] for c in conditions]
+        duplicated = sorted({n for n in names if names.count(n) > 1})
+        labels = [rng.choice(duplicated if i % 3 == 0 else names) for i in range(len(patients))]
+        calibration_set = CalibrationSet(list(zip(patients, labels)), conditions, keyword_map)
+
+        configs = [
+            Config(),
+            dataclasses.replace(Config(), WEIGHT_SYMPTOM=3.0, BONUS_SPECIFIC_KEYWORD=0.5),
+            dataclasses.replace(Config(), WEIGHT_LOCATION=0.0, BONUS_HISTORY_NAME_MATCH=6.0),
+        ]
+        ranks = calibration_set.ranks(np.array([config_weights(c) for c in configs]))
+        for col, config in enumerate(configs):
+            engine = ScoringEngine(config, KeywordMappings(config.BONUS_SPECIFIC_KEYWORD))
+            assert ranks[:, col].tolist() == [
+                engine_rank(engine, patient, conditions, label)
+                for patient, label in zip(patients, labels)
+            ]
+
+    def test_unknown_diagnoses_are_skipped(self, cases, conditions, keyword_map):
+        calibration_set = CalibrationSet(
+            cases[:5] + [(cases[0][0], "Not A Condition")], conditions, keyword_map
+        )
+        assert len(calibration_set) == 5
+        assert calibration_set.unknown_labels == 1
+
+    def test_empty_set(self, conditions, keyword_map):
+        top1, top5 = CalibrationSet([], conditions, keyword_map).evaluate(
+            config_weights(Config())
+        )
+        assert top1.tolist() == [0.0] and top5.tolist() == [0.0]
+
+
+class TestSearches:
+    """Test cases for the grid, random and coordinate searches."""
+
+    def test_grid_search_evaluates_every_combination(self, calibration_set):
+        grid = {"WEIGHT_SYMPTOM": [0.5, 1.0, 2.0], "WEIGHT_LOCATION": [1.0, 2.5]}
+        results = grid_search(calibration_set, grid)
+        assert len(results) == 6
+        assert [r.top1 for r in results] == sorted((r.top1 for r in results), reverse=True)
+        default = next(
+            r for r in results
+            if r.weights["WEIGHT_SYMPTOM"] == 1.0 and r.weights["WEIGHT_LOCATION"] == 2.5
+        )
+        top1, top5 = calibration_set.evaluate(config_weights(Config()))
+        assert (default.top1, default.top5) == (top1[0], top5[0])
+        assert results[0].config().WEIGHT_MORPHOLOGY == Config().WEIGHT_MORPHOLOGY
+
+    def test_random_search_includes_base(self, calibration_set):
+        results = random_search(calibration_set, 50, seed=1, objective="top5")
+        assert len(results) == 51
+        assert any(r.weights == dict(zip(CALIBRATION_FIELDS, config_weights(Config()))) for r in results)
+        assert results[0].top5 == max(r.top5 for r in results)
+
+    def test_coordinate_search_recovers_labeling_weights(self, keyword_map, conditions):
+        true_config = dataclasses.replace(Config(), WEIGHT_SYMPTOM=4.0, WEIGHT_LOCATION=0.5)
+        cases = labeled_cases(keyword_map, conditions, true_config, 120, seed=5)
+        calibration_set = CalibrationSet(cases, conditions, keyword_map)
+        history = coordinate_search(
+            calibration_set,
+            {"WEIGHT_SYMPTOM": [1.0, 2.0, 4.0], "WEIGHT_LOCATION": [0.5, 2.5]},
+        )
+        assert history[-1].top1 >= history[0].top1
+        assert history[-1].top5 == 1.0
+
+    def test_unknown_field_is_rejected(self, calibration_set):
+        with pytest.raises(ValueError):
+            grid_search(calibration_set, {"WEIGHT_COLOR": [1.0]})
+
+
+class TestCalibrateCommand:
+    """Test cases for the calibration command line."""
+
+    def test_parse_grid(self):
+        assert parse_grid(["WEIGHT_AGE=0.5,1"]) == {"WEIGHT_AGE": [0.5, 1.0]}
+        with pytest.raises(ValueError):
+            parse_grid(["WEIGHT_AGE"])
+
+    def test_main_prints_best_weightings(self, cases, tmp_path, capsys):
+        path = tmp_path / "cases.jsonl"
+        path.write_text(
+            "\n".join(json.dumps({"answers": a, "diagnosis": d}) for a, d in cases[:20]) + "\n"
+        )
+        assert len(list(read_labeled_cases(path))) == 20
+        main([str(path), "--search", "grid", "--grid", "WEIGHT_AGE=0,1", "--top", "2"])
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 2
+        assert all(line.startswith("top1=") for line in lines)
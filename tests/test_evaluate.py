@@ -0,0 +1,81 @@
+"""
+Test suite for the offline evaluation command.
+Validates the parallel, streamed metrics against scoring the cases directly.
+"""
+
+import json
+
+import pytest
+
+from api.core.config import Config
+from api.core.kb_index import build_condition_index
+from api.core.keywords import KeywordMappings
+from api.core.scoring_service import ScoringEngine
+from api.evaluate import EvaluationReport, evaluate, main, read_case_chunks
+
+from .reference_scoring import random_patients
+
+
+@pytest.fixture(scope="module")
+def cases(keyword_map, conditions):
+    engine = ScoringEngine(Config(), keyword_map)
+    patients = random_patients(keyword_map, conditions, 80, seed=17)
+    # Half labeled with the top suggestion, the rest spread over the KB.
+    cases = []
+    for i, patient in enumerate(patients):
+        results = engine.calculate_scores(patient, conditions, limit=1)
+        if i % 2 and results:
+            cases.append((patient, results[0][0]))
+        else:
+            cases.append((patient, conditions[(i * 37) % len(conditions)]["name"]))
+    return cases
+
+
+@pytest.fixture
+def cases_path(cases, tmp_path):
+    path = tmp_path / "cases.jsonl"
+    lines = [json.dumps({"answers": a, "diagnosis": d}) for a, d in cases]
+    lines.insert(10, "")
+    lines.append(json.dumps({"answers": cases[0][0], "diagnosis": "Not A Condition"}))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def expected_report(cases, conditions, k_values):
+    engine = ScoringEngine(Config(), KeywordMappings(Config().BONUS_SPECIFIC_KEYWORD))
+    condition_index = build_condition_index(conditions)
+    report = EvaluationReport(k_values=k_values)
+    for answers, diagnosis in cases:
+        names = [name for name, _ in engine.calculate_scores(answers, conditions)]
+        rank = names.index(diagnosis) + 1 if diagnosis in names else 0
+        predicted = condition_index[names[0]]["category"] if names else "None"
+        report.add(rank, condition_index[diagnosis]["category"], predicted)
+    return report
+
+
+class TestEvaluate:
+    """Test cases for evaluate."""
+
+    def test_matches_direct_scoring(self, cases, cases_path, conditions):
+        report = evaluate(cases_path, workers=2, chunk_size=7, k_values=(1, 5))
+        expected = expected_report(cases, conditions, (1, 5))
+        assert report.cases == len(cases)
+        assert report.unknown_labels == 1
+        assert report.hits == expected.hits
+        assert report.confusion == expected.confusion
+        assert report.mean_reciprocal_rank == pytest.approx(expected.mean_reciprocal_rank)
+        assert 0 < report.accuracy(1) <= report.accuracy(5) < 1
+        assert report.throughput > 0
+
+    def test_read_case_chunks(self, cases_path):
+        chunks = list(read_case_chunks(cases_path, 30))
+        assert [len(chunk) for chunk in chunks] == [30, 30, 21]
+
+    def test_main_json(self, cases_path, capsys):
+        main([str(cases_path), "--workers", "1", "--k", "3", "--json"])
+        report = json.loads(capsys.readouterr().out)
+        assert report["cases"] == 80
+        assert list(report["top_k_accuracy"]) == ["3"]
+        assert sum(
+            count for predicted in report["confusion"].values() for count in predicted.values()
+        ) == 80
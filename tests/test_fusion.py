@@ -0,0 +1,66 @@
+"""
+Test suite for image + symptom score fusion.
+Validates the class <-> category mapping and the vectorized boost.
+"""
+
+import numpy as np
+import pytest
+
+from api.core.config import Config
+from api.core.fusion import CategoryFusion, normalize_category
+from api.core.scoring_service import ScoringEngine
+from api.core.vectorized_scoring import VectorizedScoringEngine
+
+from .reference_scoring import random_patients
+
+
+@pytest.fixture(scope="module")
+def class_names():
+    with open(Config().CLASS_NAMES_PATH, encoding="utf-8") as handle:
+        return [line.strip() for line in handle if line.strip()]
+
+
+class TestCategoryMapping:
+    """Test cases for the class -> category mapping."""
+
+    def test_every_kb_category_has_an_image_class(self, conditions, class_names):
+        fusion = CategoryFusion(class_names)
+        assert fusion.unmapped_categories(conditions) == []
+        row_classes = fusion.row_classes(conditions)
+        assert [class_names[i] for i in row_classes] == [c["category"] for c in conditions]
+
+    def test_names_are_normalized(self):
+        fusion = CategoryFusion(["Eczema  Photos "])
+        conditions = [{"category": "eczema photos"}, {"category": "Other"}]
+        assert fusion.row_classes(conditions).tolist() == [0, -1]
+        assert normalize_category(" A\tB ") == "a b"
+
+    def test_row_classes_cached_per_condition_list(self, conditions, class_names):
+        fusion = CategoryFusion(class_names)
+        assert fusion.row_classes(conditions) is fusion.row_classes(conditions)
+        assert len(fusion.row_classes(conditions[:5])) == 5
+
+
+class TestFuse:
+    """Test cases for CategoryFusion.fuse."""
+
+    def test_boost_by_category_probability(self):
+        fusion = CategoryFusion(["A", "B"], image_weight=2.0)
+        conditions = [{"category": "A"}, {"category": "B"}, {"category": "C"}, {"category": "B"}]
+        fused = fusion.fuse([1.0, 2.0, 3.0, 0.0], [0.25, 0.75], conditions)
+        assert fused.tolist() == [1.5, 5.0, 3.0, 0.0]
+
+    def test_zero_image_weight_keeps_symptom_ranking(self, keyword_map, conditions, class_names):
+        fusion = CategoryFusion(class_names, image_weight=0.0)
+        probabilities = np.random.default_rng(0).dirichlet(np.ones(len(class_names)))
+        for engine_class in (ScoringEngine, VectorizedScoringEngine):
+            engine = engine_class(Config(), keyword_map)
+            for patient in random_patients(keyword_map, conditions, 20, seed=2):
+                fused = fusion.fuse(engine.score_vector(patient, conditions), probabilities, conditions)
+                assert engine.rank_scores(fused, conditions) == engine.calculate_scores(
+                    patient, conditions
+                )
+
+    def test_rejects_wrong_number_of_probabilities(self):
+        with pytest.raises(ValueError):
+            CategoryFusion(["A", "B"]).fuse([1.0], [1.0], [{"category": "A"}])
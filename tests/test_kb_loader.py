@@ -0,0 +1,283 @@
+"""
+Test suite for knowledge base loading.
+Validates the parser against the original implementation and that the
+pre-parsed snapshot round-trips the parser output and is rejected whenever it
+does not match the source text.
+"""
+
+import asyncio
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from api.core import kb_loader
+from api.core.kb_loader import (
+    _SNAPSHOT_HEADER,
+    IncrementalParser,
+    category_at,
+    category_sections,
+    iter_knowledge_base,
+    knowledge_base_file,
+    load_conditions,
+    parse_knowledge_base,
+    read_snapshot,
+    write_snapshot,
+)
+
+from .reference_kb_loader import (
+    EDGE_CASE_KB,
+    canonical_conditions,
+    reference_parse_knowledge_base,
+    synthetic_knowledge_base,
+)
+
+
+@pytest.fixture(scope="module")
+def source():
+    return knowledge_base_file.read_bytes()
+
+
+@pytest.fixture(scope="module")
+def conditions(source):
+    return parse_knowledge_base(source.decode("utf-8"))
+
+
+class TestParser:
+    """Test cases for parse_knowledge_base against the original parser."""
+
+    @pytest.mark.parametrize("copies", [1, 3])
+    def test_matches_reference(self, source, copies):
+        text = synthetic_knowledge_base(source.decode("utf-8"), copies)
+        assert canonical_conditions(parse_knowledge_base(text)) == canonical_conditions(
+            reference_parse_knowledge_base(text)
+        )
+
+    def test_edge_cases_match_reference(self):
+        conditions = parse_knowledge_base(EDGE_CASE_KB)
+        assert canonical_conditions(conditions) == canonical_conditions(
+            reference_parse_knowledge_base(EDGE_CASE_KB)
+        )
+        assert [c["category"] for c in conditions] == [
+            "Unknown", "Renamed First", "Second Category", "Renamed First"
+        ]
+
+    def test_red_flags_keep_first_appearance_order(self):
+        alpha = parse_knowledge_base(EDGE_CASE_KB)[1]
+        # A continuation line extends the flag before it.
+        assert alpha["red_flags_list"] == ["Itch", "Scale", "Crust' Continued Flag"]
+        assert alpha["red_flags_text"] == "itch | scale | crust' continued flag"
+        delta = parse_knowledge_base(EDGE_CASE_KB)[3]
+        assert delta["red_flags_list"] == ["Itch"]
+
+    def test_empty_text(self):
+        assert parse_knowledge_base("") == reference_parse_knowledge_base("") == []
+
+    def test_category_at(self):
+        positions, names = category_sections("1. A\ntext\n2. B\n")
+        assert positions == [0, 10]
+        assert [category_at(positions, names, offset) for offset in (0, 9, 10, 99)] == [
+            "A", "A", "B", "B"
+        ]
+        assert category_at([], [], 0) == "Unknown"
+
+    @pytest.mark.slow
+    def test_benchmark_synthetic_100x(self, source):
+        text = synthetic_knowledge_base(source.decode("utf-8"), 100)
+        started = time.perf_counter()
+        conditions = parse_knowledge_base(text)
+        elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        reference = reference_parse_knowledge_base(text)
+        reference_elapsed = time.perf_counter() - started
+        print(
+            f"{len(conditions)} conditions: {elapsed:.2f}s "
+            f"(original parser {reference_elapsed:.2f}s)"
+        )
+        assert canonical_conditions(conditions) == canonical_conditions(reference)
+        assert elapsed < reference_elapsed
+
+
+class TestStreamingParser:
+    """Test cases for iter_knowledge_base against parse_knowledge_base."""
+
+    def test_matches_parser(self, conditions):
+        assert list(iter_knowledge_base(knowledge_base_file)) == conditions
+
+    @pytest.mark.parametrize("copies", [0, 3])
+    def test_synthetic_and_empty_files(self, tmp_path, source, copies):
+        text = synthetic_knowledge_base(source.decode("utf-8"), copies)
+        path = tmp_path / "kb.txt"
+        path.write_text(text, encoding="utf-8")
+        assert list(iter_knowledge_base(path)) == parse_knowledge_base(text)
+
+    def test_edge_cases(self, tmp_path):
+        path = tmp_path / "kb.txt"
+        path.write_text(EDGE_CASE_KB, encoding="utf-8")
+        assert list(iter_knowledge_base(path)) == parse_knowledge_base(EDGE_CASE_KB)
+
+    def test_stopping_early_releases_the_file(self, tmp_path, source):
+        path = tmp_path / "kb.txt"
+        path.write_bytes(source)
+        records = iter_knowledge_base(path)
+        assert next(records)["id"] == 0
+        records.close()
+        path.unlink()
+
+    def test_memory_does_not_grow_with_the_file(self, tmp_path, source):
+        path = tmp_path / "kb.txt"
+        path.write_text(synthetic_knowledge_base(source.decode("utf-8"), 10), encoding="utf-8")
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in iter_knowledge_base(path))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert count == 10 * len(parse_knowledge_base(source.decode("utf-8")))
+        assert peak < len(source)
+
+
+class TestIncrementalParser:
+    """Test cases for IncrementalParser."""
+
+    def test_reparses_only_changed_blocks(self, source):
+        text = source.decode("utf-8")
+        parser = IncrementalParser()
+        first = parser.parse(text)
+        assert first == parse_knowledge_base(text)
+        assert parser.reparsed == len(first)
+
+        edited = text.replace("[Condition: Acne Vulgaris]", "[Condition: Acne Vulgaris (Edited)]")
+        second = parser.parse(edited)
+        assert second == parse_knowledge_base(edited)
+        assert parser.reparsed == 1
+        assert second[1] is first[1]
+
+    def test_moved_and_removed_blocks(self, source):
+        text = source.decode("utf-8")
+        parser = IncrementalParser()
+        parser.parse(text)
+        # Dropping the first condition shifts every id and recategorises nothing.
+        start = text.index("[Condition:")
+        trimmed = text[:start] + text[text.index("[Condition:", start + 1):]
+        assert parser.parse(trimmed) == parse_knowledge_base(trimmed)
+        assert parser.reparsed == 0
+
+    def test_category_change_reparses_block(self):
+        parser = IncrementalParser()
+        parser.parse(EDGE_CASE_KB)
+        renamed = EDGE_CASE_KB.replace("2. Second Category", "2. Other Category")
+        assert parser.parse(renamed) == parse_knowledge_base(renamed)
+        # Alpha's block text ends with the renamed heading; Lowercase Tag
+        # keeps its text but moves to the renamed category.
+        assert parser.reparsed == 2
+
+    def test_seed(self, source, conditions):
+        text = source.decode("utf-8")
+        parser = IncrementalParser()
+        assert parser.seed(text, conditions)
+        assert parser.parse(text) == conditions
+        assert parser.reparsed == 0
+        # A mismatched seed is ignored.
+        parser = IncrementalParser()
+        assert not parser.seed(text, conditions[:5])
+        parser.parse(text)
+        assert parser.reparsed == len(conditions)
+
+
+class TestSnapshot:
+    """Test cases for the knowledge base snapshot."""
+
+    def test_round_trip(self, tmp_path, source, conditions):
+        path = tmp_path / "kb.snapshot"
+        write_snapshot(path, conditions, source)
+        assert read_snapshot(path, source) == conditions
+        assert [p.name for p in tmp_path.iterdir()] == ["kb.snapshot"]
+
+    def test_missing_snapshot(self, tmp_path, source):
+        assert read_snapshot(tmp_path / "missing", source) is None
+
+    def test_stale_source(self, tmp_path, source, conditions):
+        path = tmp_path / "kb.snapshot"
+        write_snapshot(path, conditions, source)
+        assert read_snapshot(path, source + b"\n") is None
+
+    def test_version_change(self, tmp_path, source, conditions, monkeypatch):
+        path = tmp_path / "kb.snapshot"
+        write_snapshot(path, conditions, source)
+        monkeypatch.setattr(kb_loader, "PARSER_VERSION", kb_loader.PARSER_VERSION + 1)
+        assert read_snapshot(path, source) is None
+
+    @pytest.mark.parametrize("offset", [0, 10, _SNAPSHOT_HEADER.size + 100, -1])
+    def test_corrupt_snapshot(self, tmp_path, source, conditions, offset):
+        path = tmp_path / "kb.snapshot"
+        write_snapshot(path, conditions, source)
+        data = bytearray(path.read_bytes())
+        data[offset] ^= 0xFF
+        path.write_bytes(bytes(data))
+        assert read_snapshot(path, source) is None
+
+    def test_truncated_snapshot(self, tmp_path, source, conditions):
+        path = tmp_path / "kb.snapshot"
+        write_snapshot(path, conditions, source)
+        path.write_bytes(path.read_bytes()[:20])
+        assert read_snapshot(path, source) is None
+
+
+class TestLoadConditions:
+    """Test cases for load_conditions and load_knowledge."""
+
+    def test_regenerates_stale_snapshot(self, tmp_path, source, conditions):
+        path = tmp_path / "kb.snapshot"
+        path.write_bytes(b"stale")
+        assert load_conditions(source, path) == conditions
+        assert read_snapshot(path, source) == conditions
+
+    def test_fresh_snapshot_skips_parsing(self, tmp_path, source, conditions, monkeypatch):
+        path = tmp_path / "kb.snapshot"
+        write_snapshot(path, conditions, source)
+
+        def fail(text):
+            raise AssertionError("parsed despite a fresh snapshot")
+
+        monkeypatch.setattr(kb_loader, "parse_knowledge_base", fail)
+        assert load_conditions(source, path) == conditions
+
+    def test_unwritable_snapshot_still_parses(self, tmp_path, source, conditions):
+        path = tmp_path / "missing_dir" / "kb.snapshot"
+        assert load_conditions(source, path) == conditions
+        assert not path.exists()
+
+    def test_disabled_snapshot(self, source, conditions):
+        assert load_conditions(source, None) == conditions
+
+    def test_load_knowledge_uses_snapshot(self, tmp_path, conditions, monkeypatch):
+        path = tmp_path / "kb.snapshot"
+        monkeypatch.setattr(
+            kb_loader, "load_conditions",
+            lambda source, workers: load_conditions(source, path, workers),
+        )
+        assert asyncio.run(kb_loader.load_knowledge()) == conditions
+        assert path.exists()
+
+    def test_load_knowledge_parses_off_the_event_loop(self, conditions, monkeypatch):
+        started, ticked = threading.Event(), threading.Event()
+
+        def load(source, workers):
+            started.set()
+            # Only returns early if the loop stays free to run tick().
+            assert ticked.wait(5), "load_conditions blocked the event loop"
+            return conditions
+
+        async def tick():
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            ticked.set()
+
+        async def run():
+            loaded, _ = await asyncio.gather(kb_loader.load_knowledge(), tick())
+            return loaded
+
+        monkeypatch.setattr(kb_loader, "load_conditions", load)
+        assert asyncio.run(run()) == conditions
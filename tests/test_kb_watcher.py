@@ -0,0 +1,137 @@
+"""
+Test suite for the knowledge base hot reload watcher.
+Validates change detection, incremental re-parsing and the polling loop.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from api.core.kb_loader import knowledge_base_file, parse_knowledge_base, read_snapshot
+from api.core.kb_watcher import KnowledgeBaseWatcher
+
+
+@pytest.fixture
+def kb_path(tmp_path):
+    path = tmp_path / "knowledge_base.txt"
+    path.write_bytes(knowledge_base_file.read_bytes())
+    return path
+
+
+def startup(kb_path, tmp_path):
+    """Loads the KB like the lifespan: returns the watcher and the loaded bytes."""
+    watcher = KnowledgeBaseWatcher(kb_path, tmp_path / "kb.snapshot")
+    signature = watcher.signature()
+    source = kb_path.read_bytes()
+    return watcher, source, signature
+
+
+@pytest.fixture
+def watcher(kb_path, tmp_path):
+    watcher, source, signature = startup(kb_path, tmp_path)
+    watcher.prime(parse_knowledge_base(source.decode("utf-8")), source, signature)
+    return watcher
+
+
+def rewrite(path, text):
+    """Writes ``text`` and moves the mtime forward, whatever the clock resolution."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns + 1_000_000, mtime_ns + 1_000_000))
+
+
+class TestPrime:
+    """Test cases for priming the watcher with the startup load."""
+
+    def test_edit_during_startup_is_reloaded(self, kb_path, tmp_path):
+        watcher, source, signature = startup(kb_path, tmp_path)
+        loaded = parse_knowledge_base(source.decode("utf-8"))
+        # The file changes after it was read, before the watcher is primed.
+        edited = source.decode("utf-8") + "\n[Condition: Added During Startup]\n- Red Flags: New\n"
+        rewrite(kb_path, edited)
+        watcher.prime(loaded, source, signature)
+
+        conditions = watcher.poll()
+        assert conditions == parse_knowledge_base(edited)
+        assert len(conditions) == len(loaded) + 1
+        # The new block and the former last block, whose text now ends
+        # before the new tag instead of at the end of the file.
+        assert watcher.parser.reparsed == 2
+
+    def test_mismatched_conditions_force_a_reload(self, kb_path, tmp_path):
+        watcher, source, signature = startup(kb_path, tmp_path)
+        loaded = parse_knowledge_base(source.decode("utf-8"))
+        watcher.prime(loaded[:-1], source, signature)
+        # Unchanged file: the first poll does not reread it ...
+        assert watcher.poll() is None
+        # ... but any change reloads it, even back to the same bytes.
+        rewrite(kb_path, source.decode("utf-8"))
+        assert watcher.poll() == loaded
+
+    def test_failed_startup_load(self, kb_path, tmp_path):
+        watcher, _, signature = startup(kb_path, tmp_path)
+        watcher.prime([], None, signature)
+        rewrite(kb_path, kb_path.read_text(encoding="utf-8"))
+        assert len(watcher.poll()) == len(parse_knowledge_base(kb_path.read_text(encoding="utf-8")))
+
+
+class TestPoll:
+    """Test cases for KnowledgeBaseWatcher.poll."""
+
+    def test_unchanged_file(self, watcher, kb_path):
+        assert watcher.poll() is None
+        # Touched but identical content is not a reload.
+        rewrite(kb_path, kb_path.read_text(encoding="utf-8"))
+        assert watcher.poll() is None
+        assert watcher.reloads == 0
+
+    def test_edit_is_reparsed_incrementally(self, watcher, kb_path, tmp_path):
+        text = kb_path.read_text(encoding="utf-8").replace(
+            "[Condition: Acne Vulgaris]", "[Condition: Acne Vulgaris (Edited)]"
+        )
+        rewrite(kb_path, text)
+        conditions = watcher.poll()
+        assert conditions == parse_knowledge_base(text)
+        assert watcher.parser.reparsed == 1
+        assert watcher.reloads == 1
+        assert read_snapshot(tmp_path / "kb.snapshot", text.encode("utf-8")) == conditions
+        assert watcher.poll() is None
+
+    @pytest.mark.parametrize("content", [b"", b"\xff\xfe not utf-8"])
+    def test_unusable_content_is_skipped(self, watcher, kb_path, content):
+        original = kb_path.read_text(encoding="utf-8")
+        kb_path.write_bytes(content)
+        assert watcher.poll() is None
+        # Restoring the loaded text is not a change either.
+        rewrite(kb_path, original)
+        assert watcher.poll() is None
+        assert watcher.reloads == 0
+
+    def test_missing_file(self, watcher, kb_path):
+        kb_path.unlink()
+        assert watcher.poll() is None
+
+
+class TestWatch:
+    """Test cases for the polling loop."""
+
+    def test_change_triggers_callback(self, watcher, kb_path):
+        changes = []
+
+        async def run():
+            task = asyncio.create_task(watcher.watch(0.01, on_change))
+            rewrite(kb_path, kb_path.read_text(encoding="utf-8").replace("Acne", "Akne"))
+            for _ in range(500):
+                if changes:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        async def on_change(conditions):
+            changes.append(conditions)
+            raise RuntimeError("callback errors do not stop the watcher")
+
+        asyncio.run(run())
+        assert len(changes) == 1
+        assert any(c["name"] == "Akne Vulgaris" for c in changes[0])
@@ -0,0 +1,349 @@
+"""
+Test suite for the FastAPI application endpoints.
+Runs the real lifespan (knowledge base + scoring engine) through TestClient.
+"""
+
+import pytest
+
+try:
+    from fastapi.testclient import TestClient
+except ImportError:  # pragma: no cover - httpx is needed by TestClient
+    pytest.skip("fastapi TestClient (httpx) not available", allow_module_level=True)
+
+import asyncio
+import base64
+import threading
+
+import numpy as np
+
+from api.core.fusion import CategoryFusion
+from api.core.scoring_executor import BoundedScoringExecutor, ScoringSaturated
+from api.main import app, reload_scoring_plan
+
+PATIENT = {
+    "symptoms": ["Itching (maybe rate severity?)", "Redness"],
+    "location": ["Face"],
+    "appearance": ["Pustules (pus-filled bumps)"],
+    "condition_duration": "More than 1 year",
+}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+class TestSuggestConditions:
+    """Test cases for /suggest_conditions."""
+
+    def test_returns_ranked_suggestions(self, client):
+        response = client.post("/suggest_conditions", json=PATIENT)
+        assert response.status_code == 200
+        suggestions = response.json()["suggestions"]
+        assert suggestions
+        scores = [s["score"] for s in suggestions]
+        assert scores == sorted(scores, reverse=True)
+        assert all(s["category"] != "Unknown" for s in suggestions)
+
+    def test_rejects_empty_answers(self, client):
+        assert client.post("/suggest_conditions", json={}).status_code == 400
+
+    def test_limit_and_min_score(self, client):
+        full = client.post("/suggest_conditions", json=PATIENT).json()["suggestions"]
+        top = client.post("/suggest_conditions?limit=3", json=PATIENT).json()
+        assert top["suggestions"] == full[:3]
+        threshold = full[0]["score"]
+        high = client.post(
+            f"/suggest_conditions?min_score={threshold}", json=PATIENT
+        ).json()["suggestions"]
+        assert high and all(s["score"] >= threshold for s in high)
+
+    def test_explain_only_for_returned_suggestions(self, client):
+        plain = client.post("/suggest_conditions?limit=3", json=PATIENT).json()
+        assert all("explanation" not in s for s in plain["suggestions"])
+        explained = client.post(
+            "/suggest_conditions?limit=3&explain=true", json=PATIENT
+        ).json()["suggestions"]
+        assert len(explained) == 3
+        for suggestion in explained:
+            breakdown = suggestion["explanation"]["score_breakdown"]
+            assert round(sum(breakdown.values()), 1) == suggestion["score"]
+
+    def test_rejects_invalid_limit(self, client):
+        assert client.post("/suggest_conditions?limit=0", json=PATIENT).status_code == 422
+
+
+class TestSuggestConditionsBatch:
+    """Test cases for /suggest_conditions/batch."""
+
+    def test_matches_single_requests_in_order(self, client):
+        patients = [PATIENT, {"location": ["Scalp"], "gender": "Female"}, PATIENT]
+        response = client.post("/suggest_conditions/batch", json=patients)
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 3
+        for patient, result in zip(patients, results):
+            single = client.post("/suggest_conditions", json=patient).json()
+            assert result == single
+
+    @pytest.mark.parametrize("body", [[], {"symptoms": ["Pain"]}, [{}], ["Pain"]])
+    def test_rejects_malformed_batches(self, client, body):
+        assert client.post("/suggest_conditions/batch", json=body).status_code == 400
+
+    def test_rejects_oversized_batch(self, client):
+        limit = app.state.scoring_plan.engine.config.MAX_BATCH_SIZE
+        response = client.post("/suggest_conditions/batch", json=[PATIENT] * (limit + 1))
+        assert response.status_code == 413
+
+
+class TestResultCache:
+    """Test cases for the result cache wiring."""
+
+    def test_repeated_request_is_a_cache_hit(self, client):
+        before = client.get("/health_cache").json()
+        patient = {"symptoms": ["Pain", "Swelling"], "location": ["Legs"]}
+        first = client.post("/suggest_conditions", json=patient).json()
+        second = client.post("/suggest_conditions", json=patient).json()
+        after = client.get("/health_cache").json()
+        assert first == second
+        assert after["hits"] == before["hits"] + 1
+        assert after["misses"] == before["misses"] + 1
+
+
+class TestSessions:
+    """Test cases for the incremental /sessions API."""
+
+    def test_step_by_step_matches_suggest_conditions(self, client):
+        created = client.post("/sessions")
+        assert created.status_code == 201
+        session_id = created.json()["session_id"]
+        assert created.json()["suggestions"] == []
+
+        answered = {}
+        for field, value in PATIENT.items():
+            answered[field] = value
+            response = client.patch(f"/sessions/{session_id}", json={field: value})
+            assert response.status_code == 200
+            expected = client.post("/suggest_conditions", json=answered).json()
+            assert response.json()["suggestions"] == expected["suggestions"]
+
+        ranking = client.get(f"/sessions/{session_id}?limit=3&explain=true").json()
+        expected = client.post(
+            "/suggest_conditions?limit=3&explain=true", json=PATIENT
+        ).json()
+        assert ranking["suggestions"] == expected["suggestions"]
+
+    def test_null_removes_answer(self, client):
+        session_id = client.post("/sessions", json=PATIENT).json()["session_id"]
+        response = client.patch(f"/sessions/{session_id}", json={"location": None})
+        remaining = {k: v for k, v in PATIENT.items() if k != "location"}
+        expected = client.post("/suggest_conditions", json=remaining).json()
+        assert response.json()["suggestions"] == expected["suggestions"]
+
+    def test_unknown_and_deleted_sessions(self, client):
+        session_id = client.post("/sessions").json()["session_id"]
+        assert client.delete(f"/sessions/{session_id}").status_code == 200
+        assert client.get(f"/sessions/{session_id}").status_code == 404
+        assert client.patch(f"/sessions/{session_id}", json=PATIENT).status_code == 404
+        assert client.delete(f"/sessions/{session_id}").status_code == 404
+
+    @pytest.mark.parametrize("body", [{}, ["Pain"]])
+    def test_rejects_malformed_updates(self, client, body):
+        session_id = client.post("/sessions").json()["session_id"]
+        assert client.patch(f"/sessions/{session_id}", json=body).status_code == 400
+
+
+class TestScoringPlanSwap:
+    """Test cases for replacing the scoring plan at runtime."""
+
+    def test_reload_swaps_plan_atomically(self, client):
+        old_plan = app.state.scoring_plan
+        subset = old_plan.conditions[:25]
+        try:
+            new_plan = asyncio.run(reload_scoring_plan(app, subset))
+            assert app.state.scoring_plan is new_plan
+            assert new_plan.version != old_plan.version
+            health = client.get("/health_kb").json()
+            assert health["conditions_loaded"] == 25
+            assert health["kb_fingerprint"] == new_plan.version[0]
+            # A request that captured the old plan still sees the full KB.
+            assert len(old_plan.engine.calculate_scores(PATIENT, old_plan.conditions)) > len(
+                new_plan.engine.calculate_scores(PATIENT, new_plan.conditions)
+            )
+        finally:
+            app.state.scoring_plan = old_plan
+
+    def test_kb_watcher_is_primed(self, client):
+        # The lifespan primes the watcher with the loaded KB: nothing to reload.
+        assert app.state.kb_watcher.poll() is None
+        assert app.state.kb_watcher.reloads == 0
+
+
+class TestScoringExecutor:
+    """Test cases for running scoring on the bounded executor."""
+
+    def test_saturated_executor_returns_503(self, client):
+        executor = app.state.scoring_executor
+        slots = 0
+        try:
+            while executor.try_acquire():
+                slots += 1
+            assert slots == executor.capacity
+            sessions = app.state.session_store.stats()["size"]
+            for path, body in (
+                ("/suggest_conditions", PATIENT),
+                ("/suggest_conditions/batch", [PATIENT]),
+                ("/sessions", PATIENT),
+            ):
+                response = client.post(path, json=body)
+                assert response.status_code == 503
+                assert response.headers["Retry-After"] == str(
+                    executor.retry_after_seconds
+                )
+            # A rejected session start does not leave an orphan session.
+            assert app.state.session_store.stats()["size"] == sessions
+        finally:
+            for _ in range(slots):
+                executor.release()
+        assert client.post("/suggest_conditions", json=PATIENT).status_code == 200
+        stats = client.get("/health_scoring").json()
+        assert stats["rejected"] >= 3
+        assert stats["running"] == 0 and stats["queued"] == 0
+
+    def test_queue_cap_rejects_beyond_workers_plus_queue(self):
+        executor = BoundedScoringExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def run():
+            blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            assert executor.stats()["running"] == 1
+            assert executor.stats()["queued"] == 1
+            with pytest.raises(ScoringSaturated):
+                await executor.run(release.wait)
+            release.set()
+            return await asyncio.gather(*blocked)
+
+        try:
+            assert asyncio.run(run()) == [True, True]
+        finally:
+            release.set()
+            executor.shutdown()
+
+    def test_cancelled_request_keeps_its_slot(self):
+        executor = BoundedScoringExecutor(max_workers=1, max_queue=0)
+        release = threading.Event()
+
+        async def run():
+            blocked = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            blocked.cancel()
+            await asyncio.sleep(0.05)
+            # The call is still running on the pool, so its slot stays taken.
+            assert executor.stats()["running"] == 1
+            with pytest.raises(ScoringSaturated):
+                await executor.run(release.wait)
+            release.set()
+            for _ in range(100):
+                if executor.stats()["running"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return await executor.run(lambda: "free")
+
+        try:
+            assert asyncio.run(run()) == "free"
+        finally:
+            release.set()
+            executor.shutdown()
+        assert executor.stats()["rejected"] == 1
+        assert executor.stats()["completed"] == 2
+
+
+class FakeInferenceService:
+    """Stands in for the TFLite model: returns fixed class probabilities."""
+
+    def __init__(self, class_names, probabilities):
+        self.class_names = class_names
+        self.probabilities = np.asarray(probabilities, dtype=np.float32)
+
+    @staticmethod
+    def load_image(data):
+        if not data.startswith(b"IMG"):
+            raise ValueError("Invalid image data: not an image")
+        return data
+
+    def predict_probabilities(self, image):
+        return self.probabilities
+
+    def top_predictions(self, predictions, top_k=3):
+        order = np.argsort(predictions)[::-1][:top_k]
+        return [
+            {"rank": i + 1, "class_name": self.class_names[idx], "confidence": float(predictions[idx])}
+            for i, idx in enumerate(order)
+        ]
+
+
+@pytest.fixture
+def image_model(client):
+    plan = app.state.scoring_plan
+    class_names = sorted({c["category"] for c in plan.conditions})
+    previous = app.state.inference_service, app.state.category_fusion
+    yield class_names, lambda probabilities, weight=1.0: (
+        setattr(app.state, "inference_service", FakeInferenceService(class_names, probabilities)),
+        setattr(app.state, "category_fusion", CategoryFusion(class_names, weight)),
+    )
+    app.state.inference_service, app.state.category_fusion = previous
+
+
+def diagnose_body(image=b"IMG data", answers=PATIENT):
+    return {"image": base64.b64encode(image).decode("ascii"), "answers": answers}
+
+
+class TestDiagnose:
+    """Test cases for /diagnose."""
+
+    def test_unavailable_without_image_model(self, client, image_model):
+        app.state.inference_service = None
+        response = client.post("/diagnose", json=diagnose_body())
+        assert response.status_code == 503
+
+    def test_image_boosts_predicted_category(self, client, image_model):
+        class_names, install = image_model
+        symptom_only = client.post("/suggest_conditions", json=PATIENT).json()["suggestions"]
+        # Predict the category of a lower-ranked suggestion with certainty.
+        target = symptom_only[-1]["category"]
+        probabilities = [1.0 if name == target else 0.0 for name in class_names]
+        install(probabilities, 100.0)
+
+        response = client.post("/diagnose", params={"top_k": 2}, json=diagnose_body())
+        assert response.status_code == 200
+        body = response.json()
+        assert body["suggestions"][0]["category"] == target
+        assert {s["condition"] for s in body["suggestions"]} == {
+            s["condition"] for s in symptom_only
+        }
+        assert body["image_predictions"][0]["class_name"] == target
+        assert len(body["image_predictions"]) == 2
+
+    def test_zero_probabilities_keep_symptom_ranking(self, client, image_model):
+        class_names, install = image_model
+        install([0.0] * len(class_names))
+        fused = client.post("/diagnose", params={"limit": 5}, json=diagnose_body()).json()
+        expected = client.post("/suggest_conditions", params={"limit": 5}, json=PATIENT).json()
+        assert fused["suggestions"] == expected["suggestions"]
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {"image": "not base64!", "answers": PATIENT},
+            {"answers": PATIENT},
+            {"image": base64.b64encode(b"IMG").decode(), "answers": {}},
+            diagnose_body(image=b"GIF89a"),
+            [PATIENT],
+        ],
+    )
+    def test_bad_requests(self, client, image_model, body):
+        class_names, install = image_model
+        install([0.0] * len(class_names))
+        assert client.post("/diagnose", json=body).status_code == 400
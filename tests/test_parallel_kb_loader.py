@@ -0,0 +1,84 @@
+"""
+Test suite for parallel knowledge base parsing.
+Validates that chunked parsing in a process pool reproduces
+parse_knowledge_base exactly, and benchmarks the in-process crossover.
+"""
+
+import os
+import time
+
+import pytest
+
+from api.core.kb_loader import knowledge_base_file, load_conditions, parse_knowledge_base
+from api.core.parallel_kb_loader import parse_knowledge_base_parallel, split_knowledge_base
+
+from .reference_kb_loader import EDGE_CASE_KB, synthetic_knowledge_base
+
+
+@pytest.fixture(scope="module")
+def text():
+    return knowledge_base_file.read_text(encoding="utf-8")
+
+
+class TestSplit:
+    """Test cases for split_knowledge_base."""
+
+    def test_chunks_start_at_condition_tags(self, text):
+        chunks = split_knowledge_base(text, 4)
+        assert len(chunks) == 4
+        assert "".join(chunk for chunk, _ in chunks) == text
+        for chunk, offset in chunks[1:]:
+            assert chunk.startswith("[Condition:")
+            assert text[offset:].startswith(chunk)
+
+    def test_more_chunks_than_conditions(self):
+        chunks = split_knowledge_base(EDGE_CASE_KB, 50)
+        # The text before the first tag plus one chunk per condition.
+        assert len(chunks) == 5
+        assert "".join(chunk for chunk, _ in chunks) == EDGE_CASE_KB
+
+
+class TestParallelParse:
+    """Test cases for parse_knowledge_base_parallel."""
+
+    @pytest.mark.parametrize("workers", [2, 3])
+    def test_matches_parser(self, text, workers):
+        synthetic = synthetic_knowledge_base(text, 2)
+        assert parse_knowledge_base_parallel(synthetic, workers, min_chars=0) == (
+            parse_knowledge_base(synthetic)
+        )
+
+    def test_edge_cases(self):
+        # Categories defined in one chunk apply to conditions in later ones.
+        assert parse_knowledge_base_parallel(EDGE_CASE_KB, 4, min_chars=0) == (
+            parse_knowledge_base(EDGE_CASE_KB)
+        )
+
+    def test_small_text_and_single_worker_parse_in_process(self, text, monkeypatch):
+        monkeypatch.setattr(
+            "concurrent.futures.ProcessPoolExecutor",
+            lambda *args, **kwargs: pytest.fail("started a process pool"),
+        )
+        assert parse_knowledge_base_parallel(text, 4) == parse_knowledge_base(text)
+        assert parse_knowledge_base_parallel(text, 1, min_chars=0) == parse_knowledge_base(text)
+
+    def test_load_conditions_workers(self, text):
+        source = text.encode("utf-8")
+        assert load_conditions(source, None, workers=2) == parse_knowledge_base(text)
+
+    @pytest.mark.slow
+    def test_benchmark_crossover(self, text):
+        workers = max(2, os.cpu_count() or 1)
+        for copies in (1, 3, 10, 30):
+            synthetic = synthetic_knowledge_base(text, copies)
+            started = time.perf_counter()
+            serial = parse_knowledge_base(synthetic)
+            serial_elapsed = time.perf_counter() - started
+            started = time.perf_counter()
+            parallel = parse_knowledge_base_parallel(synthetic, workers, min_chars=0)
+            parallel_elapsed = time.perf_counter() - started
+            print(
+                f"{len(synthetic) / 1e6:.2f}M chars: in process {serial_elapsed:.3f}s, "
+                f"{workers} workers {parallel_elapsed:.3f}s"
+            )
+            assert parallel == serial
@@ -0,0 +1,128 @@
+"""
+Test suite for the scoring result cache.
+Validates canonical keys, LRU/TTL bounds, counters and version invalidation.
+"""
+
+import pytest
+
+from api.core.config import Config
+from api.core.keywords import KeywordMappings
+from api.core.result_cache import (
+    ScoreCache,
+    canonical_answers,
+    cached_calculate_scores,
+    cached_calculate_scores_batch,
+)
+from api.core.scoring_service import ScoringEngine
+
+CONDITIONS = [
+    {"name": "Itchy Thing", "red_flags_text": "itchy papules | face"},
+    {"name": "Painful Thing", "red_flags_text": "painful nodule"},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingEngine(ScoringEngine):
+    """ScoringEngine that counts how often it actually scores."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.calls = 0
+
+    def calculate_scores(self, patient_input, conditions_db, limit=None, min_score=None):
+        self.calls += 1
+        return super().calculate_scores(patient_input, conditions_db, limit, min_score)
+
+
+@pytest.fixture
+def engine():
+    config = Config()
+    return CountingEngine(config, KeywordMappings(config.BONUS_SPECIFIC_KEYWORD))
+
+
+class TestCanonicalAnswers:
+    """Test cases for the canonical answer key."""
+
+    def test_order_case_and_duplicates_ignored(self):
+        a = {"symptoms": ["Pain", "Redness"], "gender": "Female"}
+        b = {"gender": "FEMALE", "symptoms": ["redness", "pain", "Pain"]}
+        assert canonical_answers(a) == canonical_answers(b)
+
+    def test_list_and_string_answers_differ(self):
+        assert canonical_answers({"symptoms": ["pain"]}) != canonical_answers(
+            {"symptoms": "pain"}
+        )
+
+
+class TestScoreCache:
+    """Test cases for the LRU/TTL cache itself."""
+
+    def test_lru_eviction(self):
+        cache = ScoreCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # "b" is now least recently used
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert (stats["hits"], stats["misses"]) == (3, 1)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = ScoreCache(max_size=4, ttl_seconds=10, clock=clock)
+        cache.put("a", 1)
+        clock.now = 9.9
+        assert cache.get("a") == 1
+        clock.now = 10.0
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_zero_size_disables_storage(self):
+        cache = ScoreCache(max_size=0)
+        cache.put("a", 1)
+        assert cache.get("a") is None
+
+
+class TestCachedScoring:
+    """Test cases for scoring through the cache."""
+
+    def test_repeated_answers_hit_cache(self, engine):
+        cache = ScoreCache()
+        first = cached_calculate_scores(engine, cache, {"symptoms": ["Pain"]}, CONDITIONS)
+        second = cached_calculate_scores(engine, cache, {"symptoms": ["PAIN"]}, CONDITIONS)
+        assert first == second
+        assert engine.calls == 1
+
+    def test_new_knowledge_base_invalidates(self, engine):
+        cache = ScoreCache()
+        patient = {"symptoms": ["Pain"]}
+        cached_calculate_scores(engine, cache, patient, CONDITIONS)
+        edited = [dict(CONDITIONS[0]), {"name": "Painful Thing", "red_flags_text": "painless"}]
+        assert cached_calculate_scores(engine, cache, patient, edited) == []
+        assert engine.calls == 2
+
+    def test_weight_change_invalidates(self, engine):
+        cache = ScoreCache()
+        patient = {"symptoms": ["Pain"]}
+        cached_calculate_scores(engine, cache, patient, CONDITIONS)
+        engine.config.WEIGHT_SYMPTOM = 2.0
+        results = cached_calculate_scores(engine, cache, patient, CONDITIONS)
+        assert results == [("Painful Thing", 2.0)]
+        assert engine.calls == 2
+
+    def test_batch_only_scores_misses(self, engine):
+        cache = ScoreCache()
+        cached_calculate_scores(engine, cache, {"symptoms": ["Pain"]}, CONDITIONS)
+        patients = [{"symptoms": ["Pain"]}, {"location": ["Face"]}]
+        results = cached_calculate_scores_batch(engine, cache, patients, CONDITIONS)
+        assert results == [engine.calculate_scores(p, CONDITIONS) for p in patients]
+        assert engine.calls == 2 + 2  # one miss in the batch, plus the two above
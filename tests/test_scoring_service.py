@@ -0,0 +1,505 @@
+"""
+Test suite for the symptom scoring engine.
+Validates the precomputed knowledge-base indexes and the vectorized backend
+against the original algorithm.
+"""
+
+import numpy as np
+import pytest
+
+from api.core.config import Config
+from api.core.keywords import KeywordMappings, QUESTIONNAIRE_FIELDS
+from api.core.kb_index import (
+    ConditionNameIndex,
+    TokenIndex,
+    build_bonus_table,
+    build_condition_index,
+    build_keyword_index,
+    stem,
+)
+import dataclasses
+
+from api.core.scoring_service import (
+    ScoringEngine,
+    ScoringPlan,
+    compile_scoring_plan,
+    create_scoring_engine,
+)
+from api.core.vectorized_scoring import (
+    VectorizedScoringEngine,
+    compile_knowledge_base,
+    max_score_top_k,
+)
+
+from .reference_scoring import reference_calculate_scores, random_patients
+
+
+@pytest.fixture(scope="module")
+def config():
+    return Config()
+
+
+@pytest.fixture(params=[ScoringEngine, VectorizedScoringEngine])
+def engine(request, config, keyword_map, conditions):
+    scoring_engine = request.param(config, keyword_map)
+    scoring_engine.build_index(conditions)
+    return scoring_engine
+
+
+class TestKeywordIndex:
+    """Test cases for the keyword -> condition inverted index."""
+
+    def test_whole_word_matching(self):
+        """Keywords only match whole words, case-insensitively."""
+        conditions = [
+            {"red_flags_text": "itchy papules | pruritus"},
+            {"red_flags_text": "bitchy | itchiness"},
+            {"red_flags_text": "severe itchy rash"},
+        ]
+        index = build_keyword_index(conditions, ["itchy", "Pruritus", "itchy", "absent"])
+
+        assert index["itchy"] == (0, 2)
+        assert index["Pruritus"] == (0,)
+        assert index["absent"] == ()
+
+    def test_index_covers_every_mapped_keyword(self, config, keyword_map, conditions):
+        """Every keyword reachable from a questionnaire option is indexed."""
+        index = ScoringEngine(config, keyword_map)._kb_for(conditions).keyword_index
+        assert len(index) == len(keyword_map.vocabulary)
+        for option_kws in keyword_map.symptom_keywords.values():
+            for kw in option_kws:
+                assert keyword_map.keyword_ids[kw] < len(index)
+
+    def test_index_rebuilt_for_new_conditions(self, engine, config, keyword_map, conditions):
+        """A different condition list transparently gets its own index."""
+        subset = conditions[:10]
+        results = engine.calculate_scores({"symptoms": ["Pain"]}, subset)
+        assert engine._kb.conditions is subset
+        expected = reference_calculate_scores(
+            config, keyword_map, {"symptoms": ["Pain"]}, subset
+        )
+        assert results == expected
+
+
+class TestStemmedMatching:
+    """Test cases for stemmed token keyword matching."""
+
+    @pytest.mark.parametrize(
+        "words",
+        [
+            ("itch", "itchy", "itching", "itches"),
+            ("scale", "scaly", "scales", "scaling"),
+            ("papule", "papules"),
+            ("crust", "crusted", "crusting", "crusts"),
+            ("scab", "scabbing"),
+            ("bleed", "bleeds", "bleeding"),
+            ("rash", "rashes"),
+            ("hive", "hives"),
+            ("herpes",),
+        ],
+    )
+    def test_inflections_share_a_stem(self, words):
+        assert len({stem(word) for word in words}) == 1
+
+    @pytest.mark.parametrize(
+        "word, expected",
+        [("bleed", "bleed"), ("speed", "speed"), ("herpes", "herpes"), ("hives", "hive")],
+    )
+    def test_stems_are_not_truncated(self, word, expected):
+        assert stem(word) == expected
+
+    def test_single_and_multi_word_keywords(self):
+        conditions = [
+            {"red_flags_text": "intense itching | bright-red plaques"},
+            {"red_flags_text": "red and bright | itchy"},
+            {"red_flags_text": "bitchy"},
+        ]
+        index = build_keyword_index(
+            conditions, ["itch", "bright red", "red bright", "absent"], matching="stemmed"
+        )
+        assert index == {
+            "itch": (0, 1),
+            "bright red": (0,),
+            "red bright": (),
+            "absent": (),
+        }
+        # Keywords longer than the indexed n-grams cannot match.
+        assert TokenIndex(conditions, max_ngram=1).rows_for("bright red") == ()
+
+    def test_multi_word_keywords_do_not_span_flags(self):
+        conditions = [
+            {"red_flags_text": "bright | red patches"},
+            {"red_flags_text": "bright, red patches"},
+            {"red_flags_text": "bright red patches"},
+        ]
+        for matching in ("word", "stemmed"):
+            index = build_keyword_index(conditions, ["bright red"], matching=matching)
+            assert index == {"bright red": (2,)}
+
+    def test_finds_every_whole_word_match(self, keyword_map, conditions):
+        keywords = keyword_map.vocabulary + list(keyword_map.specific_keyword_bonus_map)
+        word = build_keyword_index(conditions, keywords)
+        stemmed = build_keyword_index(conditions, keywords, matching="stemmed")
+        assert all(set(word[kw]) <= set(stemmed[kw]) for kw in keywords)
+        assert sum(map(len, stemmed.values())) > sum(map(len, word.values()))
+
+    def test_backends_agree(self, keyword_map, conditions):
+        config = Config(KEYWORD_MATCHING="stemmed")
+        index_engine = ScoringEngine(config, keyword_map)
+        vectorized = VectorizedScoringEngine(config, keyword_map)
+        for patient in random_patients(keyword_map, conditions, 50, seed=9):
+            assert index_engine.calculate_scores(patient, conditions) == (
+                vectorized.calculate_scores(patient, conditions)
+            )
+        assert index_engine.cache_version(conditions) != (
+            ScoringEngine(Config(), keyword_map).cache_version(conditions)
+        )
+
+    def test_unknown_mode_is_rejected(self, conditions):
+        with pytest.raises(ValueError):
+            build_keyword_index(conditions, ["itch"], matching="fuzzy")
+
+
+class TestScoringPlan:
+    """Test cases for compiled, immutable scoring plans."""
+
+    @pytest.mark.parametrize("backend", ["index", "vectorized"])
+    def test_compile_builds_a_ready_plan(self, keyword_map, conditions, backend):
+        plan = compile_scoring_plan(Config(SCORING_BACKEND=backend), keyword_map, conditions)
+        assert isinstance(plan, ScoringPlan)
+        assert plan.conditions is conditions
+        assert plan.engine._kb.conditions is conditions
+        assert plan.version == plan.engine.cache_version(conditions)
+        assert plan.condition_index == build_condition_index(conditions)
+
+    def test_plan_is_isolated_from_config_changes(self, keyword_map, conditions):
+        config = Config()
+        plan = ScoringEngine.compile(config, keyword_map, conditions)
+        before = plan.engine.calculate_scores({"symptoms": ["Pain"]}, conditions)
+        config.WEIGHT_SYMPTOM = 100.0
+        assert plan.engine.calculate_scores({"symptoms": ["Pain"]}, conditions) == before
+
+    def test_plan_and_index_are_frozen(self, keyword_map, conditions):
+        plan = ScoringEngine.compile(Config(), keyword_map, conditions)
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            plan.conditions = []
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            plan.engine._kb.keyword_index = ()
+
+
+class TestBonusTable:
+    """Test cases for the precomputed specific keyword bonus table."""
+
+    def test_rows_follow_keyword_matches(self):
+        """Each bonus entry lists the conditions containing its keyword."""
+        conditions = [
+            {"red_flags_text": "ring-shaped patches"},
+            {"red_flags_text": "bullseye rash | fever"},
+            {"red_flags_text": "ring-shaped lesions | bullseye rash"},
+        ]
+        bonus_map = {
+            "ring-shaped": ("morphology", "Ring-shaped", 2.0),
+            "bullseye": ("morphology", "Bullseye", 3.0),
+        }
+        table = build_bonus_table(conditions, bonus_map)
+
+        assert table == [
+            (("ring-shaped", "morphology", "Ring-shaped", 2.0), (0, 2)),
+            (("bullseye", "morphology", "Bullseye", 3.0), (1, 2)),
+        ]
+
+    def test_bonus_requires_selected_option(self, engine, conditions):
+        """A bonus keyword only scores when its questionnaire option is selected."""
+        entry, rows = next(
+            (entry, rows) for entry, rows in engine._kb_for(conditions).bonus_table if rows
+        )
+        _, input_cat_key, req_input_opt, bonus_val = entry
+        name = conditions[rows[0]]["name"]
+
+        selected = dict(engine.calculate_scores({input_cat_key: [req_input_opt]}, conditions))
+        assert selected[name] >= bonus_val
+        assert engine.calculate_scores({input_cat_key: ["something else"]}, conditions) == []
+
+
+class TestConditionIndex:
+    """Test cases for the name -> condition record index."""
+
+    def test_records_have_positional_ids(self, conditions):
+        assert [c["id"] for c in conditions] == list(range(len(conditions)))
+
+    def test_first_duplicate_wins(self, conditions):
+        index = build_condition_index(conditions)
+        for condition in conditions:
+            expected = next(c for c in conditions if c["name"] == condition["name"])
+            assert index[condition["name"]] is expected
+        assert len(index) < len(conditions)  # the bundled KB repeats some names
+
+
+class TestConditionNameIndex:
+    """Test cases for the past diagnosis -> condition name index."""
+
+    @pytest.mark.parametrize(
+        "reported",
+        ["", "a", "ac", "acne", "eczema", "atopic dermatitis (eczema)", "rosacea and acne vulgaris", "xyz"],
+    )
+    def test_matches_bidirectional_substring_scan(self, conditions, reported):
+        """Lookups agree with comparing the diagnosis against every name."""
+        index = ConditionNameIndex(conditions)
+        expected = tuple(
+            idx
+            for idx, condition in enumerate(conditions)
+            if reported in condition["name"].lower() or condition["name"].lower() in reported
+        )
+        assert index.matches(reported) == expected
+
+    def test_every_name_matches_itself(self, conditions):
+        """Reporting a knowledge-base name finds every record with that name."""
+        index = ConditionNameIndex(conditions)
+        for idx, condition in enumerate(conditions):
+            assert idx in index.matches(condition["name"].lower())
+
+    def test_short_names_and_memoization(self):
+        """Names shorter than a trigram still match, and lookups are memoized."""
+        index = ConditionNameIndex([{"name": "Tb"}, {"name": "Tinea Pedis"}, {"name": "TB"}])
+
+        assert index.rows_for({"pulmonary tb", "tinea"}) == {0, 1, 2}
+        index.matches("tinea")
+        assert index.matches.cache_info().hits == 1
+
+
+class TestOptionLookup:
+    """Test cases for the compiled questionnaire option tables."""
+
+    def test_every_field_has_a_table(self, keyword_map):
+        assert set(keyword_map.option_keyword_ids) == set(QUESTIONNAIRE_FIELDS)
+
+    def test_case_insensitive_resolution(self, keyword_map):
+        ids = keyword_map.resolve_field("symptoms", ["PAIN", "redness"])
+        words = {keyword_map.vocabulary[i] for i in ids}
+        assert {"pain", "painful", "erythema"} <= words
+
+    def test_keywords_are_interned(self, keyword_map):
+        assert len(keyword_map.vocabulary) == len(set(keyword_map.vocabulary))
+        pain = keyword_map.option_keyword_ids["symptoms"]["pain"]
+        tender = keyword_map.option_keyword_ids["symptoms"]["tenderness to touch"]
+        assert keyword_map.keyword_ids["painful"] in pain & tender
+
+    def test_case_variants_share_an_id(self):
+        mappings = KeywordMappings()
+        mappings.symptom_keywords = {"Pain": ["Pain", "painful"], "Burning": ["pain"]}
+        mappings.compile()
+        table = mappings.option_keyword_ids["symptoms"]
+        assert table["pain"] == table["burning"] | {mappings.keyword_ids["painful"]}
+        assert mappings.vocabulary.count("pain") == 1
+
+    def test_id_arrays_and_field_membership(self, keyword_map):
+        for pos, (field, table) in enumerate(keyword_map.option_keyword_ids.items()):
+            arrays = keyword_map.option_keyword_arrays[field]
+            assert {option: sorted(ids) for option, ids in table.items()} == {
+                option: ids.tolist() for option, ids in arrays.items()
+            }
+            field_ids = keyword_map.field_keyword_ids[field]
+            assert field_ids.tolist() == sorted(set().union(*table.values()))
+            assert np.flatnonzero(keyword_map.keyword_fields[pos]).tolist() == field_ids.tolist()
+        # Keywords listed under several fields are shared, not duplicated.
+        assert (keyword_map.keyword_fields.sum(axis=0) > 1).any()
+
+    def test_array_resolution_matches_sets(self, keyword_map, conditions):
+        for patient in random_patients(keyword_map, conditions, 100, seed=6):
+            for field in QUESTIONNAIRE_FIELDS:
+                ids = keyword_map.resolve_field_array(field, patient.get(field))
+                assert ids.dtype == np.int32
+                assert np.unique(ids).tolist() == sorted(
+                    keyword_map.resolve_field(field, patient.get(field))
+                )
+
+    @pytest.mark.parametrize(
+        "field, answer",
+        [
+            ("symptoms", ["Pain", "None of the above"]),
+            ("location", ["Face", "Other: elbow"]),
+            ("triggers", ["Stress", "I'm not sure"]),
+            ("gender", "Prefer not to say"),
+        ],
+    )
+    def test_exclusive_options_disable_field(self, keyword_map, field, answer):
+        assert not keyword_map.resolve_field(field, answer)
+
+    def test_wrong_answer_type_selects_nothing(self, keyword_map):
+        assert not keyword_map.resolve_field("symptoms", "Pain")
+        assert not keyword_map.resolve_field("gender", ["Female"])
+        assert not keyword_map.resolve_field("location", ["Somewhere unknown"])
+
+
+class TestScoringEquivalence:
+    """Differential tests against the original per-condition regex scan."""
+
+    def test_matches_reference_on_random_patients(self, engine, config, keyword_map, conditions):
+        for patient in random_patients(keyword_map, conditions, 60, seed=1):
+            expected = reference_calculate_scores(config, keyword_map, patient, conditions)
+            assert engine.calculate_scores(patient, conditions) == expected
+
+    def test_exclusive_option_disables_field(self, engine, config, keyword_map, conditions):
+        patient = {"symptoms": ["Pain", "None of the above"], "location": ["Face"]}
+        expected = reference_calculate_scores(config, keyword_map, patient, conditions)
+        assert engine.calculate_scores(patient, conditions) == expected
+        only_location = engine.calculate_scores({"location": ["Face"]}, conditions)
+        assert engine.calculate_scores(patient, conditions) == only_location
+
+    def test_batch_matches_single_scoring(self, engine, keyword_map, conditions):
+        patients = random_patients(keyword_map, conditions, 25, seed=3)
+        expected = [engine.calculate_scores(p, conditions) for p in patients]
+        assert engine.calculate_scores_batch(patients, conditions) == expected
+        assert engine.calculate_scores_batch([], conditions) == []
+
+
+class TestTopKSelection:
+    """Test cases for limit/min_score selection inside the engines."""
+
+    @pytest.mark.parametrize("limit", [1, 3, 10, 50])
+    def test_limit_matches_truncated_ranking(self, engine, keyword_map, conditions, limit):
+        for patient in random_patients(keyword_map, conditions, 15, seed=4):
+            full = engine.calculate_scores(patient, conditions)
+            assert engine.calculate_scores(patient, conditions, limit=limit) == full[:limit]
+
+    def test_min_score_filters_results(self, engine, keyword_map, conditions):
+        for patient in random_patients(keyword_map, conditions, 15, seed=5):
+            full = engine.calculate_scores(patient, conditions)
+            expected = [item for item in full if item[1] >= 5.0][:4]
+            assert engine.calculate_scores(patient, conditions, 4, 5.0) == expected
+
+    def test_ties_and_duplicate_names(self, engine, config, keyword_map):
+        conditions = [
+            {"name": "A", "red_flags_text": "itch"},
+            {"name": "B", "red_flags_text": "itch | pain"},
+            {"name": "A", "red_flags_text": "itch | pain | tender"},
+            {"name": "C", "red_flags_text": "pain"},
+            {"name": "D", "red_flags_text": "itch"},
+        ]
+        patient = {"symptoms": ["Itching (maybe rate severity?)", "Pain"]}
+        full = reference_calculate_scores(config, keyword_map, patient, conditions)
+        assert engine.calculate_scores(patient, conditions) == full
+        for limit in range(1, 5):
+            assert engine.calculate_scores(patient, conditions, limit=limit) == full[:limit]
+
+
+class TestExplain:
+    """Test cases for the opt-in score breakdown."""
+
+    def test_breakdown_adds_up_to_score(self, engine, keyword_map, conditions):
+        for patient in random_patients(keyword_map, conditions, 10, seed=6):
+            results = engine.calculate_scores(patient, conditions, limit=5)
+            explanations = engine.explain_scores(patient, conditions, results)
+            assert set(explanations) == {name for name, _ in results}
+            for name, score in results:
+                breakdown = explanations[name]["score_breakdown"]
+                assert sum(breakdown.values()) == pytest.approx(score)
+                assert len(explanations[name]["matched_keywords"]) >= len(breakdown)
+
+    def test_details_format(self, engine, conditions):
+        patient = {"symptoms": ["Pain"], "past_diagnoses": ["Psoriasis"]}
+        results = engine.calculate_scores(patient, conditions, limit=3)
+        explanation = engine.explain_scores(patient, conditions, results)
+        details = [d for e in explanation.values() for d in e["matched_keywords"]]
+        assert any(d.startswith("+1.0 (Symptom: ") for d in details)
+        assert any(d == "+1.0 (Bonus_History: psoriasis)" for d in details)
+
+    def test_scoring_is_silent(self, engine, conditions, capsys):
+        engine.calculate_scores({"symptoms": ["Pain"], "location": ["Face"]}, conditions)
+        assert capsys.readouterr().out == ""
+
+
+class TestVectorizedScoring:
+    """Test cases for the sparse matrix scoring backend."""
+
+    def test_compiled_matrix_shape(self, config, keyword_map, conditions):
+        compiled = compile_knowledge_base(conditions, keyword_map, config)
+        assert compiled.indptr.shape == (len(conditions) + 1,)
+        assert compiled.indptr[-1] == len(compiled.indices)
+        assert np.all(np.diff(compiled.indptr) >= 0)
+        assert len(compiled.column_weights) == compiled.column_lookup.max() + 1
+        assert compiled.bonus_indptr[-1] == len(compiled.bonus_indices)
+
+    def test_column_weights_follow_config(self, keyword_map, conditions):
+        custom = Config(WEIGHT_SYMPTOM=7.0)
+        compiled = compile_knowledge_base(conditions, keyword_map, custom)
+        symptom_col = compiled.column_lookup[0, keyword_map.keyword_ids["itch"]]
+        assert compiled.column_weights[symptom_col] == 7.0
+
+    def test_backend_selection(self, keyword_map, monkeypatch):
+        monkeypatch.delenv("SCORING_BACKEND", raising=False)
+        assert type(create_scoring_engine(Config(SCORING_BACKEND="index"), keyword_map)) is ScoringEngine
+        vectorized = create_scoring_engine(Config(SCORING_BACKEND="vectorized"), keyword_map)
+        assert isinstance(vectorized, VectorizedScoringEngine)
+        with pytest.raises(ValueError):
+            create_scoring_engine(Config(SCORING_BACKEND="unknown"), keyword_map)
+
+
+class TestConfigEnvironment:
+    """Test cases for environment variable overrides of the Config."""
+
+    def test_explicit_values_ignore_environment(self, keyword_map, conditions, monkeypatch):
+        monkeypatch.setenv("SCORING_BACKEND", "vectorized")
+        monkeypatch.setenv("KB_PARSE_WORKERS", "4")
+        config = Config(SCORING_BACKEND="index")
+        assert config.SCORING_BACKEND == "index"
+        assert config.KB_PARSE_WORKERS == 1
+        plan = compile_scoring_plan(config, keyword_map, conditions)
+        assert type(plan.engine) is ScoringEngine
+        assert plan.engine.config.SCORING_BACKEND == "index"
+
+    def test_from_env(self):
+        environ = {"SCORING_BACKEND": "vectorized", "KB_PARSE_WORKERS": "4",
+                   "KB_WATCH_INTERVAL_SECONDS": "0.5", "WEIGHT_AGE": "9"}
+        config = Config.from_env(environ)
+        assert config.SCORING_BACKEND == "vectorized"
+        assert config.KB_PARSE_WORKERS == 4
+        assert config.KB_WATCH_INTERVAL_SECONDS == 0.5
+        # Only the listed fields are read from the environment.
+        assert config.WEIGHT_AGE == Config().WEIGHT_AGE
+        assert Config.from_env(environ, SCORING_BACKEND="index").SCORING_BACKEND == "index"
+
+    def test_replace_keeps_explicit_paths(self):
+        config = Config(MODEL_PATH="/models/custom.tflite")
+        assert dataclasses.replace(config).MODEL_PATH == "/models/custom.tflite"
+        assert Config().CLASS_NAMES_PATH.endswith("class_names.txt")
+
+
+class TestMaxScorePruning:
+    """Test cases for MaxScore pruned top-k scoring."""
+
+    def test_skips_rows_that_cannot_rank(self):
+        weights = np.array([1.0, 4.0, 2.0])
+        rows = [np.array([0, 1, 2, 3]), np.array([0, 1]), np.array([1, 2])]
+
+        scores = max_score_top_k(weights, rows, 5, 1, None, np.array([], dtype=np.int64))
+
+        # Row 3 only has the light term and is never scored; row 1 is exact.
+        assert scores[3] == 0.0
+        assert scores[1] == 7.0
+        assert np.argmax(scores) == 1
+
+    def test_duplicate_rows_are_scored_exactly(self):
+        weights = np.array([4.0, 1.0])
+        rows = [np.array([0, 1]), np.array([2, 3])]
+        scores = max_score_top_k(weights, rows, 4, 1, None, np.array([3]))
+        assert scores[3] == 1.0
+        assert scores[2] == 0.0
+
+    @pytest.mark.parametrize("copies", [1, 20])
+    def test_matches_unpruned_ranking(self, keyword_map, conditions, copies):
+        """Pruned top-k equals full scoring, including ties and duplicate names."""
+        kb = [
+            dict(condition, name=f"{condition['name']} {copy}" if copy else condition["name"])
+            for copy in range(copies)
+            for condition in conditions
+        ]
+        pruned = VectorizedScoringEngine(Config(TOP_K_PRUNING_MIN_CONDITIONS=0), keyword_map)
+        pruned.build_index(kb)
+        full = ScoringEngine(Config(), keyword_map)
+        full.build_index(kb)
+        for patient in random_patients(keyword_map, conditions, 30, seed=9):
+            for limit, min_score in [(1, None), (10, None), (None, 6.0), (5, 9.0)]:
+                assert pruned.calculate_scores(patient, kb, limit, min_score) == (
+                    full.calculate_scores(patient, kb, limit, min_score)
+                )
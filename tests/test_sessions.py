@@ -0,0 +1,137 @@
+"""
+Test suite for incremental scoring sessions.
+Validates that field-by-field updates rank exactly like full scoring and the
+session store's LRU/TTL bounds.
+"""
+
+import random
+
+import pytest
+
+from api.core.config import Config
+from api.core.scoring_service import ScoringEngine
+from api.core.sessions import ScoringSession, SessionStore
+from api.core.vectorized_scoring import VectorizedScoringEngine
+
+from .reference_scoring import random_patients
+from .test_result_cache import FakeClock
+
+
+@pytest.fixture(params=[ScoringEngine, VectorizedScoringEngine])
+def engine(request, keyword_map, conditions):
+    scoring_engine = request.param(Config(), keyword_map)
+    scoring_engine.build_index(conditions)
+    return scoring_engine
+
+
+class TestScoringSession:
+    """Test cases for incremental updates."""
+
+    def test_field_by_field_matches_full_scoring(self, engine, keyword_map, conditions):
+        """Answering one field at a time ranks like scoring all answers at once."""
+        rng = random.Random(3)
+        for patient in random_patients(keyword_map, conditions, 25, seed=11):
+            session = ScoringSession("s")
+            answered = {}
+            for field, value in patient.items():
+                session.update(engine, conditions, {field: value})
+                answered[field] = value
+                if rng.random() < 0.4:
+                    assert session.ranking(engine, conditions) == (
+                        engine.calculate_scores(answered, conditions)
+                    )
+            assert session.ranking(engine, conditions, limit=5) == (
+                engine.calculate_scores(patient, conditions, limit=5)
+            )
+
+    def test_changing_and_removing_answers(self, engine, conditions):
+        session = ScoringSession("s")
+        session.update(engine, conditions, {"symptoms": ["Pain"], "location": ["Face"]})
+        session.update(engine, conditions, {"symptoms": ["Redness"], "location": None})
+
+        assert session.snapshot() == {"symptoms": ["Redness"]}
+        assert session.ranking(engine, conditions) == (
+            engine.calculate_scores({"symptoms": ["Redness"]}, conditions)
+        )
+
+    def test_rejected_update_leaves_session_unchanged(self, engine, conditions):
+        session = ScoringSession("s")
+        session.update(engine, conditions, {"symptoms": ["Pain"], "location": ["Face"]})
+        expected = session.ranking(engine, conditions)
+
+        with pytest.raises(AttributeError):
+            session.update(
+                engine, conditions, {"location": None, "symptoms": ["Redness", 3]}
+            )
+
+        assert session.snapshot() == {"symptoms": ["Pain"], "location": ["Face"]}
+        assert session.ranking(engine, conditions) == expected
+        # Answers stay scorable when the version changes.
+        subset = conditions[:20]
+        assert session.ranking(engine, subset) == engine.calculate_scores(
+            {"symptoms": ["Pain"], "location": ["Face"]}, subset
+        )
+
+    def test_partials_are_sparse(self, engine, conditions):
+        session = ScoringSession("s")
+        session.update(engine, conditions, {"symptoms": ["Pain"], "gender": "Female"})
+        for field, (rows, scores) in session._partials.items():
+            field_scores = engine.field_scores(field, session.answers[field], conditions)
+            assert dict(zip(rows.tolist(), scores.tolist())) == field_scores
+            assert len(rows) < len(conditions)
+
+    def test_rescored_after_knowledge_base_change(self, engine, conditions):
+        """Partial scores are rebuilt when the engine version changes."""
+        session = ScoringSession("s")
+        session.update(engine, conditions, {"symptoms": ["Pain"]})
+        subset = conditions[:20]
+        assert session.ranking(engine, subset) == (
+            engine.calculate_scores({"symptoms": ["Pain"]}, subset)
+        )
+
+
+class TestSessionStore:
+    """Test cases for session lifetime."""
+
+    def test_get_refreshes_idle_timeout(self):
+        clock = FakeClock()
+        store = SessionStore(max_sessions=10, ttl_seconds=10, clock=clock)
+        session = store.create()
+        clock.now = 8
+        assert store.get(session.session_id) is session
+        clock.now = 16
+        assert store.get(session.session_id) is session
+        clock.now = 27
+        assert store.get(session.session_id) is None
+        assert store.stats()["expirations"] == 1
+
+    def test_create_drops_expired_sessions(self):
+        clock = FakeClock()
+        store = SessionStore(max_sessions=10, ttl_seconds=10, clock=clock)
+        first, second = store.create(), store.create()
+        clock.now = 5
+        store.get(first.session_id)
+        clock.now = 12
+        store.create()
+        stats = store.stats()
+        assert stats["size"] == 2
+        assert stats["expirations"] == 1
+        assert store.get(first.session_id) is first
+        assert store.get(second.session_id) is None
+
+    def test_least_recently_used_is_evicted(self):
+        store = SessionStore(max_sessions=2, ttl_seconds=60, clock=FakeClock())
+        first, second = store.create(), store.create()
+        store.get(first.session_id)
+        store.create()
+
+        assert store.get(second.session_id) is None
+        assert store.get(first.session_id) is first
+        assert store.stats()["evictions"] == 1
+
+    def test_delete(self):
+        store = SessionStore(clock=FakeClock())
+        session = store.create()
+        assert store.delete(session.session_id)
+        assert not store.delete(session.session_id)
+        assert store.get(session.session_id) is None
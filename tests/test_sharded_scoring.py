@@ -0,0 +1,72 @@
+"""
+Test suite for process-pool sharded scoring and the bulk scoring command.
+Validates that merged per-shard results rank exactly like a single engine.
+"""
+
+import json
+
+import pytest
+from multiprocessing import shared_memory
+
+from api.bulk_score import bulk_score
+from api.core.config import Config
+from api.core.scoring_service import ScoringEngine
+from api.core.sharded_scoring import ShardedScorer
+
+from .reference_scoring import random_patients
+
+
+@pytest.fixture(scope="module")
+def scorer(keyword_map, conditions):
+    # Many small shards so duplicated names span several of them.
+    with ShardedScorer(Config(), keyword_map, conditions, num_workers=2, num_shards=7) as sharded:
+        yield sharded
+
+
+class TestShardedScorer:
+    """Test cases for ShardedScorer."""
+
+    @pytest.mark.parametrize("limit, min_score", [(None, None), (5, None), (None, 7.0), (3, 10.0)])
+    def test_matches_single_engine(self, scorer, keyword_map, conditions, limit, min_score):
+        engine = ScoringEngine(Config(), keyword_map)
+        engine.build_index(conditions)
+        patients = random_patients(keyword_map, conditions, 40, seed=21)
+        assert scorer.score_batch(patients, limit, min_score) == [
+            engine.calculate_scores(patient, conditions, limit, min_score)
+            for patient in patients
+        ]
+
+    def test_stream_keeps_input_order(self, scorer, keyword_map, conditions):
+        patients = random_patients(keyword_map, conditions, 25, seed=4)
+        streamed = list(scorer.score_stream(iter(patients), batch_size=10, limit=3))
+        assert streamed == scorer.score_batch(patients, limit=3)
+        assert scorer.score_batch([]) == []
+
+    def test_close_releases_shared_memory(self, keyword_map, conditions):
+        sharded = ShardedScorer(Config(), keyword_map, conditions, num_workers=1)
+        names = [block.name for block in sharded._blocks]
+        sharded.close()
+        for name in names:
+            with pytest.raises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+
+class TestBulkScore:
+    """Test cases for the offline bulk scoring command."""
+
+    def test_writes_one_result_per_line(self, tmp_path, keyword_map, conditions):
+        patients = random_patients(keyword_map, conditions, 12, seed=8)
+        answers = tmp_path / "answers.jsonl"
+        answers.write_text("".join(json.dumps(p) + "\n" for p in patients) + "\n")
+        output = tmp_path / "results.jsonl"
+
+        count = bulk_score(answers, output, workers=2, batch_size=5, limit=3)
+
+        lines = output.read_text().splitlines()
+        assert count == len(lines) == 12
+        engine = ScoringEngine(Config(), keyword_map)
+        engine.build_index(conditions)
+        for patient, line in zip(patients, lines):
+            suggestions = json.loads(line)["suggestions"]
+            expected = engine.calculate_scores(patient, conditions, limit=3)
+            assert [s["condition"] for s in suggestions] == [name for name, _ in expected]